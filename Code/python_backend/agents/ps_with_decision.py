@@ -1,6 +1,7 @@
 from langgraph.graph import StateGraph
 from langchain_core.runnables import RunnableLambda
 from utilities.gemini_llm import GeminiLLM
+from utilities.agent_runtime import instrumented
 from pydantic import BaseModel
 from typing import Optional, Dict
 
@@ -168,13 +169,13 @@ def layered_path(state):
 
 def get_pattern_selector_graph():
     builder = StateGraph(PatternSelectorState)
-    builder.add_node("extract", RunnableLambda(extract_info))
-    builder.add_node("microservices", RunnableLambda(microservices_path))
-    builder.add_node("monolith", RunnableLambda(monolith_path))
-    builder.add_node("layered", RunnableLambda(layered_path))
+    builder.add_node("extract", RunnableLambda(instrumented("extract", extract_info)))
+    builder.add_node("microservices", RunnableLambda(instrumented("microservices", microservices_path)))
+    builder.add_node("monolith", RunnableLambda(instrumented("monolith", monolith_path)))
+    builder.add_node("layered", RunnableLambda(instrumented("layered", layered_path)))
 
     builder.set_entry_point("extract")
-    builder.add_conditional_edges("extract", detect_structure_type, {
+    builder.add_conditional_edges("extract", instrumented("detect_structure", detect_structure_type), {
         "microservices": "microservices",
         "event": "microservices",
         "monolith": "monolith",
@@ -3,6 +3,8 @@ from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel
 from typing import Optional, Dict
 from utilities.gemini_llm import GeminiLLM
+from utilities.agent_runtime import instrumented
+from utilities.score_parser import extract_score
 
 llm = GeminiLLM()
 
@@ -81,13 +83,7 @@ def assess_alignment(state):
 # Step 2.5: Decide path based on assessment
 
 def route_based_on_alignment(state):
-    score_prompt = f"""
-    Extract a score from this text (0-100). Only return a number.
-    Text:
-    {state.assessment}
-    """
-    score_text = llm(score_prompt)
-    score = int(''.join(filter(str.isdigit, score_text)))
+    score = extract_score(state.assessment)
     return "enhancement" if score > 70 else "full_planning"
 
 # Step 3a: Minor enhancement path
@@ -212,12 +208,12 @@ def summarize_roadmap(state):
 # Build graph
 def get_target_planner_graph():
     builder = StateGraph(TargetPlannerState)
-    builder.add_node("extract", RunnableLambda(extract_components))
-    builder.add_node("assess", RunnableLambda(assess_alignment))
-    builder.add_node("enhance", RunnableLambda(suggest_enhancements))
-    builder.add_node("identify_gaps", RunnableLambda(identify_gaps))
-    builder.add_node("plan_roadmap", RunnableLambda(roadmap_planning))
-    builder.add_node("summarize_roadmap", RunnableLambda(summarize_roadmap))
+    builder.add_node("extract", RunnableLambda(instrumented("extract", extract_components)))
+    builder.add_node("assess", RunnableLambda(instrumented("assess", assess_alignment)))
+    builder.add_node("enhance", RunnableLambda(instrumented("enhance", suggest_enhancements)))
+    builder.add_node("identify_gaps", RunnableLambda(instrumented("identify_gaps", identify_gaps)))
+    builder.add_node("plan_roadmap", RunnableLambda(instrumented("plan_roadmap", roadmap_planning)))
+    builder.add_node("summarize_roadmap", RunnableLambda(instrumented("summarize_roadmap", summarize_roadmap)))
 
     builder.set_entry_point("extract")
     builder.add_edge("extract", "assess")
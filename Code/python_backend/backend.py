@@ -1,5 +1,5 @@
 from fastapi import FastAPI, HTTPException, Query
-import psycopg2
+from utilities.pg_pool import PgPool
 import os
 
 # Database connection details
@@ -9,26 +9,26 @@ DB_NAME = "postgres"
 DB_USER = "postgres"
 DB_PASSWORD = "mysecretpassword"
 
+# Shared connection pool; each call checks out a connection instead of opening a new one
+PG_POOL = PgPool(
+    minconn=1,
+    maxconn=int(os.getenv("PG_POOL_MAX", "10")),
+    host=DB_HOST,
+    port=DB_PORT,
+    dbname=DB_NAME,
+    user=DB_USER,
+    password=DB_PASSWORD
+)
+
 # Initialize FastAPI
 app = FastAPI()
 
 # Function to fetch asset details
 def get_asset_details(asset_id):
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
-    cur = conn.cursor()
-
     query = "SELECT * FROM assets WHERE asset_id = %s;"
-    cur.execute(query, (asset_id,))
-    results = cur.fetchall()
-
-    cur.close()
-    conn.close()
+    with PG_POOL.cursor() as cur:
+        cur.execute(query, (asset_id,))
+        results = cur.fetchall()
 
     if results:
         columns = ["asset_id", "asset_name", "asset_description", "asset_domain", "asset_capability", "asset_diagram_id"]  # Adjust based on your table schema
@@ -38,24 +38,13 @@ def get_asset_details(asset_id):
 
 # Function to list all assets matching partially the asset name
 def get_assets_by_name_pattern(asset_name_pattern):
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
-    cur = conn.cursor()
-
     query = "SELECT asset_id, asset_name FROM assets WHERE asset_name ILIKE %s;"
     print(query)
-    cur.execute(query, (asset_name_pattern,))  # Passing pattern as parameter
-    results = cur.fetchall()
+    with PG_POOL.cursor() as cur:
+        cur.execute(query, (asset_name_pattern,))  # Passing pattern as parameter
+        results = cur.fetchall()
     print(results)
 
-    cur.close()
-    conn.close()
-
     if results:
         columns = ["asset_id", "asset_name"]
         return [dict(zip(columns, row)) for row in results]  # Convert each row to a dictionary
@@ -64,21 +53,10 @@ def get_assets_by_name_pattern(asset_name_pattern):
 
 # Function to fetch diagram details
 def get_diagram_details(diagram_id):
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
-    cur = conn.cursor()
-
     query = "SELECT * FROM diagrams WHERE diagram_id = %s;"
-    cur.execute(query, (diagram_id,))
-    results = cur.fetchall()
-
-    cur.close()
-    conn.close()
+    with PG_POOL.cursor() as cur:
+        cur.execute(query, (diagram_id,))
+        results = cur.fetchall()
 
     if results:
         columns = ["diagram_id", "diagram_name", "diagram_mermaid_code"]
@@ -88,21 +66,10 @@ def get_diagram_details(diagram_id):
 
 # Function to fetch mermaid code from asset id
 def get_mermaid_code_for_asset(asset_id):
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
-    cur = conn.cursor()
-
     query = "SELECT diagram_mermaid_code FROM diagrams WHERE diagram_id = (SELECT asset_diagram_id FROM assets WHERE asset_id = %s);"
-    cur.execute(query, (asset_id,))
-    result = cur.fetchone() # Only one mermaid code expected
-
-    cur.close()
-    conn.close()
+    with PG_POOL.cursor() as cur:
+        cur.execute(query, (asset_id,))
+        result = cur.fetchone() # Only one mermaid code expected
 
     if result:
         columns = ["diagram_mermaid_code"]
@@ -112,21 +79,10 @@ def get_mermaid_code_for_asset(asset_id):
 
 # Function to fetch all assets of a particular domain and capability
 def get_assets_for_dom_cap(asset_domain, asset_capability):
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD
-    )
-    cur = conn.cursor()
-
     query = "SELECT asset_id, asset_diagram_id FROM assets WHERE asset_domain = %s AND asset_capability = %s;"
-    cur.execute(query, (asset_domain, asset_capability))
-    results = cur.fetchall()
-
-    cur.close()
-    conn.close()
+    with PG_POOL.cursor() as cur:
+        cur.execute(query, (asset_domain, asset_capability))
+        results = cur.fetchall()
 
     if results:
         columns = ["asset_id", "asset_diagram_id"]
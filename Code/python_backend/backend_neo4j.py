@@ -1,6 +1,10 @@
+import os
+
 from fastapi import FastAPI
 from neo4j import GraphDatabase
 
+from utilities.graph_snapshot import GraphSnapshot
+
 # Neo4j connection details
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
@@ -9,8 +13,19 @@ NEO4J_PASSWORD = "password123"
 app = FastAPI()
 
 class Neo4jConnector:
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, snapshot=False):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        # Optional in-memory CSR copy of the graph; Cypher is used while it is missing or stale
+        self.snapshot = GraphSnapshot(self.driver, max_age=int(os.getenv("GRAPH_SNAPSHOT_MAX_AGE", "300"))) if snapshot else None
+
+    def _from_snapshot(self, node_id, direction, depth, prefix):
+        """Unique nodes/relationships of the k-hop neighbourhood as one record shaped like the Cypher ones."""
+        if not self.snapshot or not self.snapshot.fresh() or not self.snapshot.contains(node_id):
+            return None
+        subgraph = self.snapshot.traverse(node_id, direction, depth)
+        nodes = subgraph["nodes"]
+        relationships = [(nodes[edge["source"]], edge["type"], nodes[edge["target"]]) for edge in subgraph["edges"].values()]
+        return [{f"{prefix}_nodes": list(nodes.values()), f"{prefix}_relationships": relationships}] if relationships else []
 
     def close(self):
         """Properly closes the Neo4j driver."""
@@ -18,6 +33,9 @@ class Neo4jConnector:
             self.driver.close()
 
     def get_upstream_nodes(self, node_id: str, depth: int):
+        from_snapshot = self._from_snapshot(node_id, "upstream", depth, "upstream")
+        if from_snapshot is not None:
+            return from_snapshot
         query = f"""
         MATCH path = (upstream)-[*1..{depth}]->(n {{id: $node_id}})
         RETURN nodes(path) AS upstream_nodes, relationships(path) AS upstream_relationships
@@ -27,6 +45,9 @@ class Neo4jConnector:
             return [record.data() for record in result]
 
     def get_downstream_nodes(self, node_id: str, depth: int):
+        from_snapshot = self._from_snapshot(node_id, "downstream", depth, "downstream")
+        if from_snapshot is not None:
+            return from_snapshot
         query = f"""
         MATCH path = (n {{id: $node_id}})-[*1..{depth}]->(downstream)
         RETURN nodes(path) AS downstream_nodes, relationships(path) AS downstream_relationships
@@ -36,6 +57,9 @@ class Neo4jConnector:
             return [record.data() for record in result]
 
     def get_allstream_nodes(self, node_id: str, depth: int):
+        from_snapshot = self._from_snapshot(node_id, "both", depth, "allstream")
+        if from_snapshot is not None:
+            return from_snapshot
         query = f"""
         MATCH path = (upstream)-[*1..{depth}]-(downstream {{id: $node_id}})
         RETURN nodes(path) AS allstream_nodes, relationships(path) AS allstream_relationships
@@ -125,7 +149,16 @@ class Neo4jConnector:
             return data if data else {"error": "No upstream data found"}
 
     '''
-neo4j_connector = Neo4jConnector(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+neo4j_connector = Neo4jConnector(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                                 snapshot=os.getenv("GRAPH_SNAPSHOT", "false").lower() == "true")
+
+@app.on_event("startup")
+def load_graph_snapshot():
+    if neo4j_connector.snapshot:
+        try:
+            neo4j_connector.snapshot.load()
+        except Exception as e:
+            print("[ERROR] Graph snapshot load:", e)
 
 @app.get("/query")
 def query_graph(node_id: str, type: str, depth: int):
@@ -0,0 +1,83 @@
+import argparse
+import os
+import random
+import time
+
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+from utilities.graph_writer import store_graph, store_graph_rowwise, ensure_graph_schema
+
+# Compares the UNWIND bulk writer with the previous per-row writer on synthetic diagrams.
+# Needs a running Neo4j; every benchmark diagram is deleted again afterwards.
+# Usage: python benchmark_graph_writer.py --edges 1000 10000
+
+load_dotenv()
+
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password123")
+
+INTERFACE_TYPES = ["API", "EVENT", "BATCH", "REALTIME", "FILE"]
+
+
+def synthetic_diagram(edge_count, seed=42):
+    rng = random.Random(seed)
+    node_count = max(edge_count // 4, 2)
+    nodes = [
+        {"id": f"APP{i:05d}", "name": f"Application {i}", "display_name": f"APP{i:05d}: Application {i}",
+         "group": f"Group {i % 20}"}
+        for i in range(node_count)
+    ]
+    edges = []
+    for _ in range(edge_count):
+        src, tgt = rng.sample(range(node_count), 2)
+        label = rng.choice(INTERFACE_TYPES)
+        edges.append({"source": f"APP{src:05d}", "target": f"APP{tgt:05d}", "label": label,
+                      "reflink": f"https://www.others-stargaze-url.com/APP{src:05d}-APP{tgt:05d}"})
+    return nodes, edges
+
+
+def run(driver, writer, diagram_id, nodes, edges):
+    start = time.perf_counter()
+    with driver.session() as session:
+        session.execute_write(writer, diagram_id, nodes, edges)
+    return time.perf_counter() - start
+
+
+def cleanup(driver, diagram_id):
+    with driver.session() as session:
+        session.run(
+            "MATCH (n:Node {diagram_id: $diagram_id}) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 1000 ROWS",
+            diagram_id=diagram_id,
+        ).consume()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--edges", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    ensure_graph_schema(driver)
+
+    print(f"{'edges':>8} {'row-wise s':>11} {'bulk s':>8} {'speedup':>8}")
+    try:
+        for edge_count in args.edges:
+            nodes, edges = synthetic_diagram(edge_count)
+            timings = {}
+            for name, writer in [("rowwise", store_graph_rowwise), ("bulk", store_graph)]:
+                diagram_id = f"BENCH_{name}_{edge_count}"
+                cleanup(driver, diagram_id)
+                try:
+                    timings[name] = run(driver, writer, diagram_id, nodes, edges)
+                finally:
+                    cleanup(driver, diagram_id)
+            print(f"{edge_count:>8} {timings['rowwise']:>11.2f} {timings['bulk']:>8.2f} "
+                  f"{timings['rowwise'] / timings['bulk']:>7.1f}x")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
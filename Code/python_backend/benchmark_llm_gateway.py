@@ -0,0 +1,61 @@
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_stub_server import start_stub
+from utilities.llm_gateway import LLMGateway, LLMError, text_body
+
+# Drives utilities/llm_gateway.py against the local Gemini stub: a burst of requests with
+# transient failures, checking that retries absorb them and the concurrency limits hold.
+# Usage: python benchmark_llm_gateway.py --requests 200 --concurrency 32 --limit 8 --fail-rate 0.2
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="client threads")
+    parser.add_argument("--limit", type=int, default=8, help="gateway max_concurrency")
+    parser.add_argument("--route-limit", type=int, default=4, help="concurrency limit of the 'upload' route")
+    parser.add_argument("--rate", type=float, default=0.0, help="gateway requests per second (0 = unlimited)")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.2)
+    parser.add_argument("--stream", action="store_true", help="use streamGenerateContent")
+    args = parser.parse_args()
+
+    server, stub = start_stub(latency=args.latency, fail_rate=args.fail_rate, seed=7)
+    gateway = LLMGateway(
+        api_key="stub", base_url=f"http://127.0.0.1:{server.server_port}/v1beta",
+        max_concurrency=args.limit, route_limits={"upload": args.route_limit},
+        rate_per_second=args.rate, burst=args.limit, max_retries=6, backoff_base=0.01, backoff_max=0.2,
+    )
+
+    def call(i):
+        route = "upload" if i % 2 else "chat"
+        try:
+            if args.stream:
+                for _ in gateway.stream(route, "stub-model", text_body(f"request {i}")):
+                    pass
+            else:
+                gateway.generate(route, "stub-model", text_body(f"request {i}"))
+            return True
+        except LLMError:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(call, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    ok = sum(results)
+    print(f"{ok}/{args.requests} succeeded in {elapsed:.2f}s ({args.requests / elapsed:.1f} req/s)")
+    print(f"stub: {stub.requests} requests, {stub.failures} injected failures, "
+          f"max in flight {stub.max_in_flight} (limit {args.limit})")
+    print(json.dumps(gateway.stats(), indent=2))
+    if stub.max_in_flight > args.limit:
+        raise SystemExit("Concurrency limit exceeded")
+
+
+if __name__ == "__main__":
+    main()
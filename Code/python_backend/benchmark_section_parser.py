@@ -0,0 +1,76 @@
+import argparse
+import glob
+import json
+import re
+import time
+
+from utilities.section_parser import parse_output_text, parse_stream
+
+# Measures parser throughput on the recorded Gemini responses and on synthetic
+# large diagrams built by repeating the Applications and Complexity sections.
+# Usage: python benchmark_section_parser.py --apps 40 200 1000 --chunk 256
+
+
+def load_responses():
+    texts = []
+    for filename in sorted(glob.glob("new_test_response_core_asset_*.json")):
+        with open(filename, "r") as f:
+            result = json.load(f)
+        texts.append(result["candidates"][0]["content"]["parts"][0]["text"])
+    return texts
+
+
+def synthesize(text, app_count):
+    """Repeats the application blocks and complexity rows until there are app_count of each."""
+    sections = re.split(r"(\*\*.*?\*\*)", text)
+    out = []
+    for i, part in enumerate(sections):
+        if i and sections[i - 1] == "**Applications**":
+            blocks = re.split(r"(?=-\s*Title:)", part.strip())[1:]
+            part = "\n" + "\n".join(blocks[n % len(blocks)].rstrip() for n in range(app_count)) + "\n\n"
+        elif i and "System Complexity Table" in sections[i - 1]:
+            lines = part.strip().splitlines()
+            header, rows = lines[:2], lines[2:]
+            part = "\n" + "\n".join(header + [rows[n % len(rows)] for n in range(app_count)]) + "\n\n"
+        out.append(part)
+    return "".join(out)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, nargs="+", default=[40, 200, 1000])
+    parser.add_argument("--chunk", type=int, default=256, help="chunk size for the streaming run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    responses = load_responses()
+    if not responses:
+        print("No new_test_response_core_asset_*.json files found")
+        return
+
+    cases = [("recorded", responses)]
+    for count in args.apps:
+        cases.append((f"{count} apps", [synthesize(text, count) for text in responses]))
+
+    print(f"{'case':<12} {'MB':>8} {'one-shot MB/s':>14} {'stream MB/s':>12}")
+    for name, texts in cases:
+        size_mb = sum(len(t.encode()) for t in texts) / 1e6
+        chunked = [[t[i:i + args.chunk] for i in range(0, len(t), args.chunk)] for t in texts]
+
+        one_shot = timed(lambda: [parse_output_text(t) for t in texts], args.repeat)
+        streamed = timed(lambda: [parse_stream(chunks) for chunks in chunked], args.repeat)
+
+        print(f"{name:<12} {size_mb:>8.2f} {size_mb / one_shot:>14.1f} {size_mb / streamed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
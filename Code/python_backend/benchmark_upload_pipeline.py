@@ -0,0 +1,329 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# End-to-end ingestion throughput without Gemini or live stores. Recorded responses
+# (new_test_response_core_asset_*.json) are replayed through the LLM provider layer, Postgres and
+# Neo4j are in-process stand-ins with a configurable round-trip latency, and Chroma runs in memory
+# with the real embedder (or a hash embedder with --hash-embedder). Uploads go through /upload/ with FastAPI's TestClient,
+# so parsing, parse_mermaid, the fan-out and every store write run as in production. A bulk level
+# runs the same recordings through run_bulk_ingest (the engine behind /bulk_upload/) in batches.
+# Results are compared with a stored baseline; any regression beyond --tolerance exits non-zero.
+# Usage: python benchmark_upload_pipeline.py --concurrency 1 4 16 --uploads 64 --bulk-diagrams 512
+#        python benchmark_upload_pipeline.py --save-baseline
+
+BASELINE_FILE = "benchmark_upload_baseline.json"
+RECORDINGS = "new_test_response_core_asset_*.json"
+
+# p95 increases smaller than this are noise, whatever the ratio
+MIN_REGRESSION_MS = 5.0
+
+
+# --- Store stand-ins --- #
+
+class StandInCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.connection = self  # psycopg2.extras.execute_values reads cursor.connection.encoding
+        self.encoding = "UTF8"
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        time.sleep(self.pool.latency)
+        with self.pool.lock:
+            self.pool.statements += 1
+
+    def mogrify(self, template, args):
+        return repr(args).encode()
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+
+class StandInPgPool:
+    """Accepts PgPool's arguments; checkout is bounded by maxconn like the real pool."""
+
+    latency_ms = 1.0
+
+    def __init__(self, minconn=1, maxconn=10, **kwargs):
+        self.latency = self.latency_ms / 1000
+        self.maxconn = maxconn
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.lock = threading.Lock()
+        self.statements = 0
+        self.checkouts = 0
+
+    @contextmanager
+    def cursor(self):
+        with self._slots:
+            with self.lock:
+                self.checkouts += 1
+            yield StandInCursor(self)
+
+    def stats(self):
+        return {"maxconn": self.maxconn, "checkouts": self.checkouts, "statements": self.statements}
+
+    def close(self):
+        pass
+
+
+class StandInResult:
+    def __iter__(self):
+        return iter(())
+
+    def consume(self):
+        return None
+
+    def single(self):
+        return None
+
+    def data(self):
+        return []
+
+
+class StandInSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, *args, **kwargs):
+        time.sleep(self.driver.latency)
+        with self.driver.lock:
+            self.driver.statements += 1
+        return StandInResult()
+
+    def execute_write(self, fn, *args, **kwargs):
+        with self.driver.lock:
+            self.driver.transactions += 1
+        return fn(self, *args, **kwargs)
+
+    execute_read = execute_write
+
+
+class StandInDriver:
+    latency_ms = 2.0
+
+    def __init__(self, *args, **kwargs):
+        self.latency = self.latency_ms / 1000
+        self.lock = threading.Lock()
+        self.statements = 0
+        self.transactions = 0
+
+    def session(self, **kwargs):
+        return StandInSession(self)
+
+    def close(self):
+        pass
+
+
+def load_app(args, workdir):
+    """Imports the backend with replayed LLM responses and the store stand-ins in place."""
+    os.environ.update({
+        "LLM_DEFAULT_PROVIDER": "replay",
+        "LLM_REPLAY_PATH": os.path.abspath(args.recordings),
+        "CHROMA_CLIENT": "ephemeral",
+        "UPLOAD_STREAMING": "true" if args.streaming else "false",
+        "RESPONSE_CACHE_DB": os.path.join(workdir, "response_cache.db"),
+        "UPLOAD_JOB_DB": os.path.join(workdir, "upload_jobs.db"),
+        "AGENT_MEMO_DB": os.path.join(workdir, "agent_memo.db"),
+        "STORE_ROLLBACK_LOG": os.path.join(workdir, "store_rollbacks.jsonl"),
+        "BULK_JOB_DB": os.path.join(workdir, "bulk_jobs.db"),
+        "BULK_CHECKPOINT_DB": os.path.join(workdir, "bulk_checkpoints.db"),
+        "BULK_BATCH_SIZE": str(args.bulk_batch_size),
+        "CHAT_GRAPH_LOOKUP": "false",
+        "GRAPH_SNAPSHOT": "false",
+    })
+    if args.hash_embedder:
+        # Read by final_chromadb_upload before it builds the embedder, so the model is never loaded
+        os.environ["CHROMA_EMBEDDER"] = "hash"
+    StandInPgPool.latency_ms = args.pg_ms
+    StandInDriver.latency_ms = args.neo4j_ms
+
+    import neo4j
+    import utilities.pg_pool
+    utilities.pg_pool.PgPool = StandInPgPool
+    neo4j.GraphDatabase.driver = StandInDriver
+
+    import final_backend_upload as backend
+    return backend
+
+
+# --- Measurement --- #
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    pick = lambda p: round(values[min(int(p * len(values)), len(values) - 1)], 1)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+def synthetic_image(i):
+    # Distinct bytes per upload, so the replay provider spreads uploads over all recordings
+    return hashlib.sha256(str(i).encode()).digest() * 1500
+
+
+def run_level(client, concurrency, uploads):
+    totals, stages, failures = [], {}, []
+    lock = threading.Lock()
+
+    def upload(i):
+        start = time.perf_counter()
+        response = client.post(
+            "/upload/",
+            files={"image": (f"diagram_{i}.png", synthetic_image(i), "image/png")},
+            data={"diagram_name": f"BENCH-{i:05d}", "asset_id": f"APP{i % 9 + 1:03d}", "use_cache": "false"},
+        )
+        elapsed = 1000 * (time.perf_counter() - start)
+        with lock:
+            if response.status_code != 200:
+                failures.append(response.text[:200])
+                return
+            totals.append(elapsed)
+            for stage, seconds in response.json().get("timings", {}).items():
+                stages.setdefault(stage, []).append(1000 * seconds)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(upload, range(uploads)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "uploads": uploads,
+        "failures": len(failures),
+        "failure_sample": failures[:3],
+        "diagrams_per_sec": round(len(totals) / elapsed, 2),
+        "total_ms": percentiles(totals),
+        "stages_ms": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def run_bulk(backend, recordings, diagrams, workdir):
+    """Ingests diagrams recorded responses through run_bulk_ingest via a manifest; total_ms is per batch."""
+    pattern = os.path.join(recordings, "*.json") if os.path.isdir(recordings) else recordings
+    files = sorted(os.path.abspath(path) for path in glob.glob(pattern))
+    manifest = os.path.join(workdir, f"bulk_manifest_{diagrams}.json")
+    with open(manifest, "w") as f:
+        json.dump([{"diagram_name": f"BULK-{i:05d}", "asset_id": f"APP{i % 9 + 1:03d}", "response": files[i % len(files)]}
+                   for i in range(diagrams)], f)
+
+    batches = []
+    summary = backend.run_bulk_ingest(manifest, run_id=f"bench_{time.time_ns()}",
+                                      on_stage=lambda stage, seconds: batches.append(1000 * seconds))
+    return {
+        "uploads": diagrams,
+        "failures": summary["failed"],
+        "failure_sample": [error["error"][:200] for error in summary["errors"][:3]],
+        "diagrams_per_sec": summary["diagrams_per_sec"],
+        "total_ms": percentiles(batches),
+        "stages_ms": {},
+    }
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for level, result in results.items():
+        base = baseline.get(level)
+        if not base:
+            continue
+        label = f"c={level}" if level.isdigit() else level
+        if result["diagrams_per_sec"] < base["diagrams_per_sec"] * (1 - tolerance):
+            found.append(f"{label}: {result['diagrams_per_sec']} diagrams/s vs baseline {base['diagrams_per_sec']}")
+        pairs = [("total", result["total_ms"], base["total_ms"])] + [
+            (stage, result["stages_ms"].get(stage, {}), stats) for stage, stats in base["stages_ms"].items()
+        ]
+        for name, current, previous in pairs:
+            if not current or not previous:
+                continue
+            if current["p95"] > previous["p95"] * (1 + tolerance) and current["p95"] - previous["p95"] > MIN_REGRESSION_MS:
+                found.append(f"{label} {name}: p95 {current['p95']}ms vs baseline {previous['p95']}ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--uploads", type=int, default=64, help="uploads per concurrency level")
+    parser.add_argument("--recordings", default=RECORDINGS, help="glob or directory of recorded Gemini responses")
+    parser.add_argument("--pg-ms", type=float, default=1.0, help="stand-in Postgres latency per statement")
+    parser.add_argument("--neo4j-ms", type=float, default=2.0, help="stand-in Neo4j latency per statement")
+    parser.add_argument("--hash-embedder", action="store_true", help="skip the sentence-transformer model")
+    parser.add_argument("--streaming", action="store_true", help="use the streaming extraction path")
+    parser.add_argument("--bulk-diagrams", type=int, default=256, help="diagrams for the bulk level (0 skips it)")
+    parser.add_argument("--bulk-batch-size", type=int, default=50)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    if not glob.glob(os.path.join(args.recordings, "*.json") if os.path.isdir(args.recordings) else args.recordings):
+        sys.exit(f"No recorded responses match {args.recordings}")
+
+    from fastapi.testclient import TestClient
+
+    with tempfile.TemporaryDirectory() as workdir:
+        backend = load_app(args, workdir)
+        client = TestClient(backend.app)
+
+        run_level(client, 1, 2)  # warm-up: imports, embedder, first Chroma adds
+        results = {}
+        for concurrency in args.concurrency:
+            result = run_level(client, concurrency, args.uploads)
+            results[str(concurrency)] = result
+            stages = ", ".join(f"{stage} p95 {stats['p95']}ms" for stage, stats in result["stages_ms"].items())
+            print(f"c={concurrency:<3} {result['diagrams_per_sec']:>7} diagrams/s  total p50 {result['total_ms'].get('p50')}ms "
+                  f"p95 {result['total_ms'].get('p95')}ms  failures {result['failures']}  [{stages}]")
+            for sample in result["failure_sample"]:
+                print(f"    failed: {sample}")
+
+        if args.bulk_diagrams:
+            result = run_bulk(backend, args.recordings, args.bulk_diagrams, workdir)
+            results["bulk"] = result
+            print(f"bulk  {result['diagrams_per_sec']:>7} diagrams/s  batch of {args.bulk_batch_size} p50 "
+                  f"{result['total_ms'].get('p50')}ms p95 {result['total_ms'].get('p95')}ms  failures {result['failures']}")
+            for sample in result["failure_sample"]:
+                print(f"    failed: {sample}")
+
+        print(f"Postgres stand-in: {backend.PG_POOL.stats()}")
+
+    if any(result["failures"] for result in results.values()):
+        sys.exit("Uploads failed")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "save_baseline"}, "results": results},
+                      f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)["results"]
+    found = regressions(results, baseline, args.tolerance)
+    for line in found:
+        print(f"REGRESSION {line}")
+    if found:
+        sys.exit(1)
+    print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Bulk ingestion from the command line, with the same engine and stores as POST /bulk_upload/.
+# source is a directory of diagram images and/or saved Gemini responses (paired by file stem,
+# e.g. new_test_response_core_asset_APP003.json) or a JSON/JSONL manifest, see utilities/bulk_ingest.py.
+# An interrupted run resumes where it stopped when started again with the same source (or --run-id).
+# Usage: python bulk_ingest.py ./diagrams --batch-size 100 --parse-workers 8
+#        python bulk_ingest.py manifest.jsonl --restart
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="directory or manifest (.json / .jsonl)")
+    parser.add_argument("--batch-size", type=int, help="diagrams per store write (default BULK_BATCH_SIZE)")
+    parser.add_argument("--parse-workers", type=int, help="parse processes (default one per CPU)")
+    parser.add_argument("--extract-workers", type=int, help="concurrent image extractions")
+    parser.add_argument("--write-workers", type=int, help="concurrent batch writes")
+    parser.add_argument("--run-id", help="checkpoint run id (default derived from source)")
+    parser.add_argument("--restart", action="store_true", help="forget the checkpoint and ingest everything again")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        sys.exit(f"{args.source} not found")
+
+    # The backend reads its worker settings from the environment at import
+    for option, variable in [("parse_workers", "BULK_PARSE_WORKERS"), ("extract_workers", "BULK_EXTRACT_WORKERS"),
+                             ("write_workers", "BULK_WRITE_WORKERS"), ("batch_size", "BULK_BATCH_SIZE")]:
+        if getattr(args, option) is not None:
+            os.environ[variable] = str(getattr(args, option))
+
+    import final_backend_upload as backend
+    from utilities.bulk_ingest import run_id_for
+
+    # The schema bootstrap the app runs at startup; a fresh database has no diagram_artifacts,
+    # interface_edges or corpus_version table until these run
+    backend.bootstrap_graph_schema()
+    backend.AUTOCOMPLETE.migrate()
+    backend.migrate_arch_views()
+    backend.migrate_corpus_version()
+    backend.bootstrap_interface_rollup()
+
+    run_id = args.run_id or run_id_for(args.source)
+    if args.restart:
+        backend.bulk_checkpoint.reset(run_id)
+
+    started = time.perf_counter()
+
+    def progress(stage, seconds):
+        print(f"[{time.perf_counter() - started:8.1f}s] {stage} ({seconds:.2f}s)")
+
+    try:
+        summary = backend.run_bulk_ingest(args.source, run_id=run_id, batch_size=backend.BULK_BATCH_SIZE,
+                                          on_stage=progress)
+    finally:
+        backend.PG_POOL.close()
+        backend.driver.close()
+
+    print(json.dumps(summary, indent=2))
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+from final_chromadb_upload import embedder, diagram_collection, app_collection, complexity_collection
+from utilities.retrieval import Retriever, RetrievalRouter, infer_collection
+
+# Offline recall/cost evaluation of the /chat/ retrieval modes (no LLM calls).
+# Needs the Chroma store loaded with the ARCH-00x diagrams (and Neo4j for --graph).
+# Usage: python eval_retrieval.py --eval-set retrieval_eval_set.json --graph
+
+load_dotenv()
+
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password123")
+
+COLLECTIONS = {
+    "architecture_diagrams": diagram_collection,
+    "architecture_applications": app_collection,
+    "architecture_complexity": complexity_collection,
+}
+
+
+def diagram_names():
+    """diagram_id -> diagram_name, so graph documents (which only carry diagram_id) can be scored too."""
+    metadatas = diagram_collection.get(include=["metadatas"])["metadatas"]
+    return {meta["diagram_id"]: meta["diagram_name"] for meta in metadatas if meta}
+
+
+def run_mode(mode, retriever, router, question, query_embedding):
+    if mode == "keyword":
+        collection = COLLECTIONS[infer_collection(question)]
+        docs, stats = retriever.retrieve(collection, question, query_embedding=query_embedding)
+        return docs, stats, 1
+    docs, stats = router.retrieve(question, query_embedding=query_embedding, use_graph=(mode == "router+graph"))
+    return docs, stats, len(COLLECTIONS)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eval-set", default="retrieval_eval_set.json")
+    parser.add_argument("--graph", action="store_true", help="also evaluate the router with the Neo4j neighbourhood lookup")
+    parser.add_argument("--token-budget", type=int, default=6000)
+    args = parser.parse_args()
+
+    with open(args.eval_set) as f:
+        eval_set = json.load(f)
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD)) if args.graph else None
+    retriever = Retriever(token_budget=args.token_budget)
+    router = RetrievalRouter(COLLECTIONS, retriever, driver=driver)
+    names = diagram_names()
+    modes = ["keyword", "router"] + (["router+graph"] if args.graph else [])
+
+    totals = {mode: {"recall": 0.0, "tokens": 0, "docs": 0, "queries": 0, "seconds": 0.0} for mode in modes}
+    try:
+        for item in eval_set:
+            question, expected = item["question"], set(item["expected"])
+            query_embedding = embedder([question])[0]
+            if hasattr(query_embedding, "tolist"):
+                query_embedding = query_embedding.tolist()
+
+            row = []
+            for mode in modes:
+                start = time.perf_counter()
+                docs, stats, queries = run_mode(mode, retriever, router, question, query_embedding)
+                elapsed = time.perf_counter() - start
+
+                found = {names.get(doc["metadata"].get("diagram_id"), doc["metadata"].get("diagram_name")) for doc in docs}
+                recall = len(expected & found) / len(expected)
+                totals[mode]["recall"] += recall
+                totals[mode]["tokens"] += stats["context_tokens"]
+                totals[mode]["docs"] += stats["documents_used"]
+                totals[mode]["queries"] += queries
+                totals[mode]["seconds"] += elapsed
+                row.append(f"{mode}={recall:.2f}/{stats['context_tokens']}t")
+            print(f"{question[:60]:<60} {'  '.join(row)}")
+    finally:
+        if driver:
+            driver.close()
+
+    n = len(eval_set)
+    print()
+    print(f"{'mode':<14} {'recall':>7} {'avg tokens':>11} {'avg docs':>9} {'queries':>8} {'avg ms':>8}")
+    for mode, total in totals.items():
+        print(f"{mode:<14} {total['recall'] / n:>7.2f} {total['tokens'] / n:>11.0f} {total['docs'] / n:>9.1f} "
+              f"{total['queries'] / n:>8.1f} {1000 * total['seconds'] / n:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,46 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Query
+from fastapi import FastAPI, UploadFile, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import base64
 import os
-import psycopg2
 from uuid import uuid4
 import requests
 from neo4j import GraphDatabase
-from final_chromadb_upload import client, store_diagram_summary, store_application, store_complexity_entry
+from psycopg2.extras import execute_values
+from final_chromadb_upload import (client, embedder, store_diagram_bundle, store_diagram_bundles,
+                                  delete_diagram_documents, delete_diagrams_documents,
+                                  diagram_collection, app_collection, complexity_collection)
 import re
 from dotenv import load_dotenv
 import json
-import chromadb
-import google.generativeai as genai
-from typing import List, Dict, Set, Tuple
 from bs4 import BeautifulSoup
 from fastapi.responses import StreamingResponse
 from agents.tp_with_decision import get_target_planner_graph
 from agents.ps_with_decision import get_pattern_selector_graph
-import json
+from utilities.agent_runtime import AgentRun, stream_agents
+from utilities.llm_gateway import LLMError, shared_gateway, text_of, usage_of, text_body
+from utilities.llm_providers import shared_providers
+from utilities.agent_memo import AgentMemo
+from utilities.gemini_llm import GeminiLLM
+from utilities.job_queue import JobQueue, DONE as JOB_DONE, FAILED as JOB_FAILED
+from utilities.response_cache import ResponseCache, prompt_version
+from utilities.section_parser import SECTION_KINDS, empty_sections, parse_stream
+from utilities.mermaid_parser import parse_mermaid
+from utilities.bulk_ingest import BulkCheckpoint, BulkIngestor, discover, run_id_for, within
+from utilities.store_fanout import StoreWriter, FanOut, FanOutError, fan_out
+from utilities.graph_writer import store_graph, ensure_graph_schema
+from utilities.pg_pool import PgPool
+from utilities.autocomplete import AutocompleteService
+from utilities.arch_view import ArchViewStore, save_artifacts, save_artifacts_many
+from utilities import interface_rollup, corpus_version
+from utilities.graph_traversal import traverse, edge_rows, TraversalCache
+from utilities.graph_snapshot import GraphSnapshot
+from utilities.session_store import MemorySessionStore, SqliteSessionStore
+from utilities.retrieval import Retriever, RetrievalRouter, CrossEncoderReranker, infer_collection
+from utilities.semantic_cache import SemanticCache
+from utilities.sse import until_disconnected
+import time
+from collections import deque
 
 # Load API Key from .env
 load_dotenv()
@@ -28,9 +50,23 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "password123"
-PG_CONN = psycopg2.connect(
+PG_POOL = PgPool(
+    minconn=int(os.getenv("PG_POOL_MIN", "2")),
+    maxconn=int(os.getenv("PG_POOL_MAX", "20")),
+    statement_timeout_ms=int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "30000")),
     host="localhost", dbname="postgres", user="postgres", password="mysecretpassword"
 )
+UPLOAD_JOB_DB = os.getenv("UPLOAD_JOB_DB", "upload_jobs.db")
+UPLOAD_JOB_WORKERS = int(os.getenv("UPLOAD_JOB_WORKERS", "2"))
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "gemini_response_cache.db")
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", "256"))
+UPLOAD_STREAMING = os.getenv("UPLOAD_STREAMING", "false").lower() == "true"
+STORE_TIMEOUTS = {
+    "postgres": float(os.getenv("POSTGRES_WRITE_TIMEOUT", "30")),
+    "neo4j": float(os.getenv("NEO4J_WRITE_TIMEOUT", "60")),
+    "chroma": float(os.getenv("CHROMA_WRITE_TIMEOUT", "120")),
+}
+STORE_ROLLBACK_LOG = os.getenv("STORE_ROLLBACK_LOG", "store_rollbacks.jsonl")
 
 # FastAPI Setup
 app = FastAPI()
@@ -40,27 +76,43 @@ app.add_middleware(
 
 driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
 
-# Global chat memory dictionary
-chat_memory = {}  # Format: {session_id: "previous conversation text"}
-
-# Max characters of conversation to retain per session (adjust as needed)
-MAX_HISTORY_LENGTH = 4000
+@app.on_event("startup")
+def bootstrap_graph_schema():
+    try:
+        ensure_graph_schema(driver)
+    except Exception as e:
+        print("[ERROR] Neo4j schema bootstrap:", e)
 
-# --- Upload Section --- #
+# Prefix indexes for the autocomplete endpoints (falls back to SQL until loaded)
+AUTOCOMPLETE = AutocompleteService(PG_POOL, refresh_seconds=int(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", "300")))
 
-@app.post("/upload/")
-def upload_image(image: UploadFile, diagram_name: str = Form(...), asset_id: str = Form(...)):
+@app.on_event("startup")
+def load_autocomplete():
     try:
+        AUTOCOMPLETE.migrate()
+        AUTOCOMPLETE.load()
+    except Exception as e:
+        print("[ERROR] Autocomplete load:", e)
 
-        # Image to base64
-        img_b64 = base64.b64encode(image.file.read()).decode()
+# Max characters of conversation to retain per session (adjust as needed)
+MAX_HISTORY_LENGTH = int(os.getenv("MAX_HISTORY_LENGTH", "4000"))
+
+# Chat memory: "memory" keeps sessions per worker, "sqlite" shares them across uvicorn workers
+CHAT_SESSION_BACKEND = os.getenv("CHAT_SESSION_BACKEND", "memory").lower()
+CHAT_SESSION_OPTIONS = dict(
+    ttl_seconds=int(os.getenv("CHAT_SESSION_TTL_SECONDS", str(24 * 3600))),
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", "1000")),
+    token_budget=MAX_HISTORY_LENGTH // 4,
+)
+if CHAT_SESSION_BACKEND == "sqlite":
+    chat_memory = SqliteSessionStore(os.getenv("CHAT_SESSION_DB", "chat_sessions.db"), **CHAT_SESSION_OPTIONS)
+else:
+    chat_memory = MemorySessionStore(**CHAT_SESSION_OPTIONS)
 
-        # Set default value if asset_id is empty
-        if asset_id.strip() == "":
-            asset_id = "APP001"
+# --- Upload Section --- #
 
-        # Structured Gemini Prompt
-        prompt = """
+# Structured Gemini Prompt
+UPLOAD_PROMPT = """
         You are an expert Enterprise Architect. Analyze the provided system architecture diagram. From the diagram, extract the following:
 
         1. **Mermaid** (The code must follow these specific formatting rules:
@@ -226,200 +278,548 @@ def upload_image(image: UploadFile, diagram_name: str = Form(...), asset_id: str
         The output must contain one clearly separated block per application, using the structure shown. No additional commentary or formatting is needed beyond the required fields.
 """
 
-        # Gemini API Call
-        gemini_resp = requests.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-pro:generateContent",
-            headers={"Content-Type": "application/json"},
-            params={"key": GEMINI_API_KEY},
-            json={
-                "contents": [
-                    {
-                        "role": "user",
-                        "parts": [
-                            {"text": prompt},
-                            {"inline_data": {"mime_type": "image/png", "data": img_b64}}
-                        ]
-                    }
+# Shared by uploads, chat and the agents: client reuse, concurrency/rate limits and retries
+llm_gateway = shared_gateway()
+# Provider per route (Gemini, local llama.cpp/Ollama or recorded replay), see LLM_ROUTES
+llm_providers = shared_providers()
+
+# Cache of extraction responses keyed by image hash and prompt version
+response_cache = ResponseCache(RESPONSE_CACHE_DB, max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024)
+UPLOAD_PROMPT_VERSION = prompt_version(llm_providers.describe("upload"), UPLOAD_PROMPT)
+
+def gemini_request_body(img_b64: str) -> dict:
+    return {
+        "contents": [
+            {
+                "role": "user",
+                "parts": [
+                    {"text": UPLOAD_PROMPT},
+                    {"inline_data": {"mime_type": "image/png", "data": img_b64}}
                 ]
-            },
-        )
-        
-        result = gemini_resp.json()
+            }
+        ]
+    }
 
-        '''
-        filename = f"new_test_response_core_asset_{asset_id}.json"
-        with open(filename, "w") as f:
-            json.dump(result, f, indent=2)
-        
-        with open("new_test_response_core_asset_APP001.json", "r") as f:
-            result = json.load(f)
-        '''
-
-        # print('loaded')
-
-        if "candidates" not in result:
-            raise HTTPException(status_code=500, detail=result)
-
-        output_text = result["candidates"][0]["content"]["parts"][0]["text"]
-
-        # Example response chunks
-        sections = re.split(r"\*\*(.*?)\*\*", output_text)
-
-        # Parse Response
-        mermaid = ""
-        summary = ""
-        description = ""
-        applications = []
-        complexity_table = []
-        pros = []
-        cons = []
-        class_diagram = ""
-        data_model = ""
-
-        for i, section in enumerate(sections):
-            if section.strip().lower() == "mermaid":
-                mermaid_code = sections[i + 1].strip()
-                mermaid = clean_mermaid_code(mermaid_code)
-                # print('mermaid done')
-            elif section.strip().lower() == "summary":
-                summary = sections[i + 1].strip()
-                # print('summary done')
-            elif section.strip().lower() == "description":
-                description = sections[i + 1].strip()
-                # print('description done')
-            elif section.strip().lower() == "applications":
-                apps_text = sections[i + 1].strip()
-                app_blocks = re.split(r"-\s*Title:", apps_text)
-
-                for block in app_blocks[1:]:
-                    lines = block.strip().split("\n")
-                    title = lines[0].strip()
-                    system_code = lines[1].replace("System Code:", "").strip()
-                    group = lines[2].replace("Group:", "").strip()
-                    relationships = [
-                        line.strip("- ").strip()
-                        for line in lines[4:]
-                        if line.strip().startswith("-")
-                    ]
-
-                    applications.append({
-                        "title": title,
-                        "system_code": system_code,
-                        "group": group,
-                        "relationships": relationships
-                    })
-                    # print('application done')
-            elif "System Complexity Table" in section:
-                table_text = sections[i + 1].strip()
-                rows = table_text.splitlines()[2:]  # Skip header lines
-
-                for row in rows:
-                    cols = [col.strip() for col in row.split("|") if col.strip()]
-                    if len(cols) == 3:
-                        complexity_table.append({
-                            "component": cols[0],
-                            "complexity": cols[1],
-                            "reason": cols[2]
-                        })
-                # print('complexity done')
-            elif section.strip().lower() == "pros":
-                raw_pros = sections[i + 1].strip()
-                pros = [
-                    line.lstrip("- ").strip()
-                    for line in raw_pros.splitlines()
-                    if line.strip().startswith("-")
-                ]
-                # print('pros done')
-            elif section.strip().lower() == "cons":
-                raw_cons = sections[i + 1].strip()
-                cons = [
-                    line.lstrip("- ").strip()
-                    for line in raw_cons.splitlines()
-                    if line.strip().startswith("-")
-                ]
-                # print('cons done')
-            elif section.strip().lower() == "class diagram (mermaid)":
-                classdiagram = sections[i + 1].strip()
-                class_diagram = clean_class_diagram(classdiagram)
-                print('class diagram done')
-            elif section.strip().lower() == "data model (mermaid erd)":
-                datamodel = sections[i + 1].strip()
-                data_model = clean_data_model(datamodel)
-                print('data model done')
-
-        # Store Mermaid to PostgreSQL
-        diagram_id = f"DIAGRAM_{str(uuid4())[:8]}"
-        with PG_CONN.cursor() as cur:
+def extract_with_gemini(img_b64: str) -> str:
+    """Sends the diagram image to Gemini and returns the raw response text."""
+    try:
+        result = llm_providers.generate("upload", gemini_request_body(img_b64))
+    except LLMError as e:
+        raise HTTPException(status_code=500, detail=e.detail)
+
+    '''
+    filename = f"new_test_response_core_asset_{asset_id}.json"
+    with open(filename, "w") as f:
+        json.dump(result, f, indent=2)
+
+    with open("new_test_response_core_asset_APP001.json", "r") as f:
+        result = json.load(f)
+    '''
+
+    if "candidates" not in result:
+        raise HTTPException(status_code=500, detail=result)
+
+    return result["candidates"][0]["content"]["parts"][0]["text"]
+
+def gemini_stream_text(route: str, body: dict):
+    """
+    Yields response text chunk by chunk via streamGenerateContent (SSE).
+    Closing the generator closes the HTTP stream, which cancels generation upstream.
+    """
+    try:
+        for result in llm_providers.stream(route, body):
+            if "candidates" not in result:
+                raise HTTPException(status_code=500, detail=result)
+            for part in result["candidates"][0].get("content", {}).get("parts", []):
+                if "text" in part:
+                    yield part["text"]
+    except LLMError as e:
+        raise HTTPException(status_code=500, detail=e.detail)
+
+def stream_extract_with_gemini(img_b64: str):
+    """Same as extract_with_gemini, but yields the response text chunk by chunk."""
+    yield from gemini_stream_text("upload", gemini_request_body(img_b64))
+
+
+def run_upload_pipeline(image_bytes: bytes, diagram_name: str, asset_id: str, on_stage=None, use_cache: bool = True,
+                        diagram_id: str = None):
+    """
+    Runs the full ingestion for one diagram image: Gemini extraction, section parsing
+    and the Postgres / Neo4j / Chroma writes. on_stage(stage, seconds) is called after each stage.
+    With use_cache, a previously extracted response for the same image and prompt is replayed.
+    diagram_id is generated unless given (upload jobs fix it up front so a re-run reuses it).
+    """
+    timings = {}
+
+    def record(stage, seconds):
+        timings[stage] = round(seconds, 3)
+        if on_stage:
+            on_stage(stage, seconds)
+
+    def mark(stage, started):
+        record(stage, time.perf_counter() - started)
+        return time.perf_counter()
+
+    t = time.perf_counter()
+
+    # Set default value if asset_id is empty
+    if asset_id.strip() == "":
+        asset_id = "APP001"
+
+    diagram_id = diagram_id or f"DIAGRAM_{str(uuid4())[:8]}"
+    parsed = empty_sections()
+    graph = {}  # nodes / edges, once the mermaid section is in
+    previous_asset = {}
+
+    # Store Mermaid to PostgreSQL
+    def write_postgres():
+        # Single transaction: committed by the pool on success, rolled back on error
+        with PG_POOL.cursor() as cur:
             cur.execute(
                 "INSERT INTO DIAGRAMS (diagram_id, diagram_mermaid_code, diagram_name, diagram_class_code, diagram_data_model) VALUES (%s, %s, %s, %s, %s)",
-                (diagram_id, mermaid, diagram_name, class_diagram, data_model),
+                (diagram_id, parsed["mermaid"], diagram_name, parsed["class_diagram"], parsed["data_model"]),
             )
-            PG_CONN.commit()
 
-            cur.execute("SELECT * FROM ASSETS WHERE asset_id = %s", (asset_id,))
-            if cur.fetchone():
+            # Parsed sections, so /get_arch_code doesn't re-derive them per view
+            save_artifacts(cur, diagram_id, diagram_name, {
+                **{kind: parsed[kind] for kind in ("summary", "description", "pros", "cons", "complexity_table")},
+                "nodes": graph["nodes"],
+                "edges": graph["edges"],
+            })
+
+            cur.execute("SELECT asset_diagram_id, asset_domain, asset_capability FROM ASSETS WHERE asset_id = %s", (asset_id,))
+            row = cur.fetchone()
+            if row:
+                previous_asset["diagram_id"] = row[0]
                 cur.execute("UPDATE ASSETS SET asset_diagram_id = %s WHERE asset_id = %s", (diagram_id, asset_id))
             else:
                 cur.execute(
                     "INSERT INTO ASSETS (asset_id, asset_diagram_id, asset_name, asset_description) VALUES (%s, %s, '', '')",
                     (asset_id, diagram_id),
                 )
-            PG_CONN.commit()
-        # print('pgsql done')
 
-        # Store Mermaid to Neo4j
-        nodes, edges = parse_mermaid(mermaid)
-        # print('neo4j entered')
+            # Keep the per-asset interface_type counts current
+            interface_rollup.record_diagram_edges(cur, diagram_id, graph["edges"])
+
+        # Committed; make the new names searchable right away
+        AUTOCOMPLETE.on_upload(diagram_name, asset_id, *(row[1:] if row else ()))
+
+    def rollback_postgres():
+        with PG_POOL.cursor() as cur:
+            if "diagram_id" in previous_asset:
+                cur.execute("UPDATE ASSETS SET asset_diagram_id = %s WHERE asset_id = %s AND asset_diagram_id = %s",
+                            (previous_asset["diagram_id"], asset_id, diagram_id))
+            else:
+                cur.execute("DELETE FROM ASSETS WHERE asset_id = %s AND asset_diagram_id = %s", (asset_id, diagram_id))
+            interface_rollup.remove_diagram_edges(cur, diagram_id)
+            cur.execute("DELETE FROM diagram_artifacts WHERE diagram_id = %s", (diagram_id,))
+            cur.execute("DELETE FROM DIAGRAMS WHERE diagram_id = %s", (diagram_id,))
+            corpus_version.bump(cur)
+
+    # Store Mermaid to Neo4j
+    def write_neo4j():
         with driver.session() as session:
-            session.execute_write(store_graph, diagram_id, nodes, edges)
-        # print('neo4j done')
-
-        # Store diagram-level doc
-        store_diagram_summary(diagram_id, diagram_name, summary, description, pros, cons)
-        # print('vector db for diagram done')
-
-        # Store each application separately
-        for app in applications:
-            store_application({
-                "title": app["title"],
-                "system_code": app["system_code"],
-                "group": app["group"],
-                "relationships": app["relationships"],
+            session.execute_write(store_graph, diagram_id, graph["nodes"], graph["edges"])
+
+    def rollback_neo4j():
+        with driver.session() as session:
+            session.run("MATCH (n:Node {diagram_id: $diagram_id}) DETACH DELETE n", diagram_id=diagram_id)
+
+    # Store diagram, application and complexity docs to Chroma in one batch per collection
+    def write_chroma():
+        store_diagram_bundle(
+            {
                 "diagram_id": diagram_id,
-                "diagram_name": diagram_name
-            })
-        # print('vector db for applications done')
+                "diagram_name": diagram_name,
+                **{kind: parsed[kind] for kind in ("summary", "description", "pros", "cons")},
+            },
+            parsed["applications"],
+            parsed["complexity_table"]
+        )
 
-        # Store complexity data
-        for entry in complexity_table:
-            store_complexity_entry(diagram_id, diagram_name, entry['component'], entry['complexity'], entry['reason'])
-        # print('vector db for complexity done')
+    # The three stores are independent, so they are written concurrently. Each one starts as soon as
+    # the sections it needs are parsed: with UPLOAD_STREAMING, Neo4j (mermaid only) and Chroma (everything
+    # up to Cons) are written while the class diagram and ERD are still being generated.
+    pending = [
+        (StoreWriter("neo4j", write_neo4j, rollback_neo4j, timeout=STORE_TIMEOUTS["neo4j"]), {"mermaid"}),
+        (StoreWriter("chroma", write_chroma, lambda: delete_diagram_documents(diagram_id),
+                     timeout=STORE_TIMEOUTS["chroma"]),
+         {"summary", "description", "applications", "complexity_table", "pros", "cons"}),
+        (StoreWriter("postgres", write_postgres, rollback_postgres, timeout=STORE_TIMEOUTS["postgres"]),
+         set(SECTION_KINDS) - {"applications"}),
+    ]
+    stores = FanOut(on_stage=record, rollback_log=STORE_ROLLBACK_LOG,
+                    context={"diagram_id": diagram_id, "diagram_name": diagram_name, "asset_id": asset_id})
+    closed = set()
+
+    def start_ready(everything=False):
+        for entry in list(pending):
+            writer, needs = entry
+            if everything or needs <= closed:
+                pending.remove(entry)
+                stores.start(writer)
+
+    def on_section(event):
+        parsed[event.kind] = event.value
+        closed.add(event.kind)
+        if event.kind == "mermaid":
+            graph["nodes"], graph["edges"] = parse_mermaid(event.value)
+        start_ready()
+
+    def parse(chunks):
+        parse_stream(chunks, on_section)
+        # A section the model left out stays empty, as before
+        graph.setdefault("nodes", [])
+        graph.setdefault("edges", [])
+        start_ready(everything=True)
+
+    cache_key = ResponseCache.key(image_bytes, UPLOAD_PROMPT_VERSION)
+    output_text = response_cache.get(cache_key) if use_cache else None
 
-        return {
-            "diagram_id": diagram_id,
-            "mermaid_code": mermaid,
-            "summary": summary,
-            "description": description,
-            "nodes": nodes,
-            "edges": edges,
-            "complexity_table": complexity_table,
-            "pros": pros,
-            "cons": cons,
-            "class_diagram": class_diagram,
-            "data_model": data_model
-        }
+    try:
+        if output_text is not None:
+            t = mark("extract_cached", t)
+            parse([output_text])
+            t = mark("parse", t)
+        elif UPLOAD_STREAMING:
+            # Sections are parsed as they arrive, so parsing and the store writes overlap the model call
+            chunks = []
+
+            def collect():
+                for chunk in stream_extract_with_gemini(base64.b64encode(image_bytes).decode()):
+                    chunks.append(chunk)
+                    yield chunk
+
+            parse(collect())
+            response_cache.put(cache_key, "".join(chunks))
+            t = mark("extract", t)
+        else:
+            # Image to base64
+            img_b64 = base64.b64encode(image_bytes).decode()
+            output_text = extract_with_gemini(img_b64)
+            response_cache.put(cache_key, output_text)
+            t = mark("extract", t)
+            parse([output_text])
+            t = mark("parse", t)
+    except BaseException:
+        # The response broke off after some stores had started; undo what they wrote
+        stores.abort()
+        raise
+
+    try:
+        stores.join()
+    except FanOutError as e:
+        raise HTTPException(status_code=500, detail={"error": str(e), "failures": e.failures, "rollback": e.rollback})
+
+    # Cached chat answers predate this diagram and are now stale
+    bump_corpus_version()
+    ARCH_VIEWS.on_upload(diagram_name, diagram_id)
+    traversal_cache.clear()
+    if GRAPH_SNAPSHOT:
+        GRAPH_SNAPSHOT.mark_stale()
+
+    return {
+        "diagram_id": diagram_id,
+        "mermaid_code": parsed["mermaid"],
+        "summary": parsed["summary"],
+        "description": parsed["description"],
+        "nodes": graph["nodes"],
+        "edges": graph["edges"],
+        "complexity_table": parsed["complexity_table"],
+        "pros": parsed["pros"],
+        "cons": parsed["cons"],
+        "class_diagram": parsed["class_diagram"],
+        "data_model": parsed["data_model"],
+        "timings": timings
+    }
+
+
+@app.post("/upload/")
+def upload_image(image: UploadFile, diagram_name: str = Form(...), asset_id: str = Form(...),
+                 async_job: bool = Form(False), use_cache: bool = Form(True)):
+    try:
+        image_bytes = image.file.read()
+
+        # Job-based ingestion: queue the work and return the job id right away
+        if async_job:
+            payload = {"diagram_name": diagram_name, "asset_id": asset_id, "use_cache": use_cache,
+                       "diagram_id": f"DIAGRAM_{str(uuid4())[:8]}"}
+            job_id = upload_jobs.submit("upload", payload, image_bytes)
+            return {"job_id": job_id, "status": "queued"}
+
+        return run_upload_pipeline(image_bytes, diagram_name, asset_id, use_cache=use_cache)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# --- Upload Jobs --- #
+
+def run_upload_job(payload, blob, on_stage):
+    return run_upload_pipeline(blob, payload["diagram_name"], payload["asset_id"], on_stage=on_stage,
+                               use_cache=payload.get("use_cache", True), diagram_id=payload.get("diagram_id"))
+
+def discard_partial_upload(payload):
+    """
+    Removes whatever an interrupted upload job wrote before its re-run writes the same diagram_id
+    again. The asset row is left alone: the re-run points it at this diagram_id anyway.
+    """
+    diagram_id = payload.get("diagram_id")
+    if not diagram_id:
+        return  # queued before jobs carried their diagram_id
+    with PG_POOL.cursor() as cur:
+        interface_rollup.remove_diagram_edges(cur, diagram_id)
+        cur.execute("DELETE FROM diagram_artifacts WHERE diagram_id = %s", (diagram_id,))
+        cur.execute("DELETE FROM DIAGRAMS WHERE diagram_id = %s", (diagram_id,))
+        corpus_version.bump(cur)
+    with driver.session() as session:
+        session.run("MATCH (n:Node {diagram_id: $diagram_id}) DETACH DELETE n", diagram_id=diagram_id).consume()
+    delete_diagram_documents(diagram_id)
+
+upload_jobs = JobQueue(UPLOAD_JOB_DB, run_upload_job, max_workers=UPLOAD_JOB_WORKERS, recover=discard_partial_upload)
+
+@app.on_event("startup")
+def start_upload_jobs():
+    upload_jobs.start()
+
+@app.on_event("shutdown")
+def stop_upload_jobs():
+    upload_jobs.shutdown()
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = upload_jobs.get(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job
+
+@app.get("/jobs/{job_id}/events")
+def stream_job(job_id: str):
+    if not upload_jobs.get(job_id):
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+
+    def event_stream():
+        last = None
+        while True:
+            job = upload_jobs.get(job_id)
+            state = (job["status"], len(job["stages"]))
+            if state != last:
+                last = state
+                yield f"data: {json.dumps({'status': job['status'], 'stages': job['stages']})}\n\n"
+            if job["status"] in (JOB_DONE, JOB_FAILED):
+                yield f"data: {json.dumps({'result': job['result'], 'error': job['error']})}\n\n"
+                break
+            time.sleep(0.5)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.get("/pg_pool_stats")
+def pg_pool_stats():
+    return PG_POOL.stats()
+
+@app.on_event("shutdown")
+def close_pg_pool():
+    PG_POOL.close()
+
+@app.get("/upload/cache_stats")
+def upload_cache_stats():
+    return response_cache.stats()
+
+
+# --- Bulk ingestion --- #
+
+BULK_JOB_DB = os.getenv("BULK_JOB_DB", "bulk_jobs.db")
+BULK_CHECKPOINT_DB = os.getenv("BULK_CHECKPOINT_DB", "bulk_checkpoints.db")
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "50"))
+BULK_PARSE_WORKERS = int(os.getenv("BULK_PARSE_WORKERS", "0")) or None  # 0: one per CPU
+BULK_EXTRACT_WORKERS = int(os.getenv("BULK_EXTRACT_WORKERS", "4"))
+BULK_WRITE_WORKERS = int(os.getenv("BULK_WRITE_WORKERS", "2"))
+BULK_STORE_TIMEOUT = float(os.getenv("BULK_STORE_TIMEOUT", "600"))
+# /bulk_upload/ only reads sources under this directory; the CLI can read anywhere
+BULK_UPLOAD_ROOT = os.path.realpath(os.getenv("BULK_UPLOAD_ROOT", "bulk_uploads"))
+
+bulk_checkpoint = BulkCheckpoint(BULK_CHECKPOINT_DB)
+
+def extract_for_bulk(item):
+    """Response text for an item that only has an image; goes through the upload response cache."""
+    with open(item["image"], "rb") as f:
+        image_bytes = f.read()
+    cache_key = ResponseCache.key(image_bytes, UPLOAD_PROMPT_VERSION)
+    output_text = response_cache.get(cache_key)
+    if output_text is None:
+        output_text = extract_with_gemini(base64.b64encode(image_bytes).decode())
+        response_cache.put(cache_key, output_text)
+    return output_text
+
+def write_bulk_batch(diagrams):
+    """
+    Writes a batch of parsed diagrams like run_upload_pipeline writes one: a single Postgres
+    transaction, a single Neo4j transaction and one Chroma add per collection for the whole batch,
+    fanned out concurrently. If any store fails, the batch is rolled back everywhere.
+    """
+    diagram_ids = [d["diagram_id"] for d in diagrams]
+    # When a batch holds several diagrams of one asset, the last one wins as with sequential uploads
+    latest = {d["asset_id"]: d["diagram_id"] for d in diagrams}
+    previous_assets = {}
+    new_assets = []
+
+    def write_postgres():
+        with PG_POOL.cursor() as cur:
+            execute_values(
+                cur,
+                "INSERT INTO DIAGRAMS (diagram_id, diagram_mermaid_code, diagram_name, diagram_class_code, diagram_data_model) VALUES %s",
+                [(d["diagram_id"], d["parsed"]["mermaid"], d["diagram_name"], d["parsed"]["class_diagram"],
+                  d["parsed"]["data_model"]) for d in diagrams],
+            )
+            save_artifacts_many(cur, [
+                (d["diagram_id"], d["diagram_name"], {
+                    **{field: d["parsed"][field] for field in ("summary", "description", "pros", "cons", "complexity_table")},
+                    "nodes": d["nodes"],
+                    "edges": d["edges"],
+                })
+                for d in diagrams
+            ])
+
+            cur.execute("SELECT asset_id, asset_diagram_id, asset_domain, asset_capability FROM ASSETS WHERE asset_id = ANY(%s)",
+                        (list(latest),))
+            assets = {row[0]: row[1:] for row in cur.fetchall()}
+            previous_assets.update({asset_id: row[0] for asset_id, row in assets.items()})
+            updates = [(asset_id, diagram_id) for asset_id, diagram_id in latest.items() if asset_id in assets]
+            inserts = [(asset_id, diagram_id, "", "") for asset_id, diagram_id in latest.items() if asset_id not in assets]
+            if updates:
+                execute_values(
+                    cur,
+                    "UPDATE ASSETS SET asset_diagram_id = v.diagram_id FROM (VALUES %s) AS v (asset_id, diagram_id) WHERE ASSETS.asset_id = v.asset_id",
+                    updates,
+                )
+            if inserts:
+                execute_values(cur, "INSERT INTO ASSETS (asset_id, asset_diagram_id, asset_name, asset_description) VALUES %s", inserts)
+                new_assets.extend(row[0] for row in inserts)
+
+            for d in diagrams:
+                interface_rollup.record_diagram_edges(cur, d["diagram_id"], d["edges"])
+
+        for d in diagrams:
+            AUTOCOMPLETE.on_upload(d["diagram_name"], d["asset_id"], *assets.get(d["asset_id"], (None,))[1:])
+
+    def rollback_postgres():
+        with PG_POOL.cursor() as cur:
+            restore = [(asset_id, previous, latest[asset_id]) for asset_id, previous in previous_assets.items()]
+            if restore:
+                execute_values(
+                    cur,
+                    "UPDATE ASSETS SET asset_diagram_id = v.previous FROM (VALUES %s) AS v (asset_id, previous, diagram_id) "
+                    "WHERE ASSETS.asset_id = v.asset_id AND ASSETS.asset_diagram_id = v.diagram_id",
+                    restore,
+                )
+            if new_assets:
+                cur.execute("DELETE FROM ASSETS WHERE asset_id = ANY(%s) AND asset_diagram_id = ANY(%s)", (new_assets, diagram_ids))
+            for diagram_id in diagram_ids:
+                interface_rollup.remove_diagram_edges(cur, diagram_id)
+            cur.execute("DELETE FROM diagram_artifacts WHERE diagram_id = ANY(%s)", (diagram_ids,))
+            cur.execute("DELETE FROM DIAGRAMS WHERE diagram_id = ANY(%s)", (diagram_ids,))
+            corpus_version.bump(cur)
+
+    def write_neo4j():
+        def store_batch(tx):
+            for d in diagrams:
+                store_graph(tx, d["diagram_id"], d["nodes"], d["edges"])
+
+        with driver.session() as session:
+            session.execute_write(store_batch)
+
+    def rollback_neo4j():
+        with driver.session() as session:
+            session.run("MATCH (n:Node) WHERE n.diagram_id IN $diagram_ids DETACH DELETE n", diagram_ids=diagram_ids)
+
+    def write_chroma():
+        store_diagram_bundles([
+            (
+                {"diagram_id": d["diagram_id"], "diagram_name": d["diagram_name"],
+                 **{field: d["parsed"][field] for field in ("summary", "description", "pros", "cons")}},
+                d["parsed"]["applications"],
+                d["parsed"]["complexity_table"],
+            )
+            for d in diagrams
+        ])
+
+    fan_out(
+        [
+            StoreWriter("postgres", write_postgres, rollback_postgres, timeout=BULK_STORE_TIMEOUT),
+            StoreWriter("neo4j", write_neo4j, rollback_neo4j, timeout=BULK_STORE_TIMEOUT),
+            StoreWriter("chroma", write_chroma, lambda: delete_diagrams_documents(diagram_ids), timeout=BULK_STORE_TIMEOUT),
+        ],
+        rollback_log=STORE_ROLLBACK_LOG,
+        context={"bulk_batch": diagram_ids},
+    )
+
+    bump_corpus_version()
+    for d in diagrams:
+        ARCH_VIEWS.on_upload(d["diagram_name"], d["diagram_id"])
+    traversal_cache.clear()
+    if GRAPH_SNAPSHOT:
+        GRAPH_SNAPSHOT.mark_stale()
+
+def run_bulk_ingest(source, run_id=None, batch_size=BULK_BATCH_SIZE, on_stage=None, root=None):
+    """
+    Ingests every diagram under source (a directory or manifest, see utilities.bulk_ingest.discover).
+    Items already done in run_id (default: derived from source) are skipped, so re-running resumes.
+    With root, files outside it are refused.
+    """
+    ingestor = BulkIngestor(extract_for_bulk, write_bulk_batch, bulk_checkpoint, batch_size=batch_size,
+                            parse_workers=BULK_PARSE_WORKERS, extract_workers=BULK_EXTRACT_WORKERS,
+                            write_workers=BULK_WRITE_WORKERS)
+    return ingestor.run(discover(source, root), run_id or run_id_for(source), on_progress=on_stage)
+
+def run_bulk_job(payload, blob, on_stage):
+    return run_bulk_ingest(payload["source"], batch_size=payload["batch_size"], on_stage=on_stage,
+                           root=BULK_UPLOAD_ROOT)
+
+# Bulk runs are long and already parallel inside, so they are queued one at a time
+bulk_jobs = JobQueue(BULK_JOB_DB, run_bulk_job, max_workers=1)
+
+@app.on_event("startup")
+def start_bulk_jobs():
+    bulk_jobs.start()
+
+@app.on_event("shutdown")
+def stop_bulk_jobs():
+    bulk_jobs.shutdown()
+
+@app.post("/bulk_upload/")
+def bulk_upload(source: str = Form(...), restart: bool = Form(False), batch_size: int = Form(BULK_BATCH_SIZE)):
+    """
+    Queues a bulk ingestion of a directory or manifest under BULK_UPLOAD_ROOT (source is relative
+    to it). Re-posting the same source resumes it; restart=true forgets its checkpoint and ingests
+    everything again.
+    """
+    source = os.path.realpath(os.path.join(BULK_UPLOAD_ROOT, source))
+    if not within(BULK_UPLOAD_ROOT, source):
+        return JSONResponse(status_code=403, content={"error": "source must be inside the bulk upload directory"})
+    if not os.path.exists(source):
+        return JSONResponse(status_code=404, content={"error": "source not found"})
+    run_id = run_id_for(source)
+    if restart:
+        bulk_checkpoint.reset(run_id)
+    job_id = bulk_jobs.submit("bulk_upload", {"source": source, "batch_size": batch_size})
+    return {"job_id": job_id, "run_id": run_id, "status": "queued"}
+
+@app.get("/bulk_upload/{job_id}")
+def get_bulk_job(job_id: str):
+    job = bulk_jobs.get(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return {**job, "progress": bulk_checkpoint.summary(run_id_for(job["payload"]["source"]))}
+
+
 # --- Upload via Confluence URL --- #
 
 CONFLUENCE_API_TOKEN = os.getenv("CONFLUENCE_API_TOKEN")
 CONFLUENCE_EMAIL = os.getenv("CONFLUENCE_EMAIL")
 
 @app.post("/process_confluence/")
-def process_confluence_page(diagram_name: str = Form(...), asset_id: str = Form(...), confluence_url: str = Form(...)):
+def process_confluence_page(diagram_name: str = Form(...), asset_id: str = Form(...), confluence_url: str = Form(...),
+                            use_cache: bool = Form(True)):
     try:
 
         # Set default value if asset_id is empty
@@ -484,353 +884,8 @@ def process_confluence_page(diagram_name: str = Form(...), asset_id: str = Form(
         if "image" not in content_type:
             raise HTTPException(status_code=500, detail="Downloaded content is not an image")
 
-        img_b64 = base64.b64encode(image_response.content).decode()
-
-        # Step 5: Send to Gemini (Your Full Structured Prompt)
-        prompt = """
-        You are an expert Enterprise Architect. Analyze the provided system architecture diagram. From the diagram, extract the following:
-
-        1. **Mermaid** (The code must follow these specific formatting rules:
-        - DO NOT include word Mermaid or ```mermaid or other wrappers in the output. The code block should start with graph TD (instead of Mermaid title)
-        - Include a comment line with the group name before each subgraph, e.g., %% Digital Channels.
-        - The subgraph name itself must be in double quotes, e.g., subgraph "Digital Channels".
-        - Application node definitions must not have double quotes around the title, e.g., PBCP[Private Banking Client Portal].
-        - Include a %% Connections comment before listing the relationships.
-        - Relationships between systems must be represented in [Source System Code] -->|[Relationship Type]| [Target System Code] format. For example: APP001 -->|API| APP002.
-        - Remove any special characters like - or hyphen from the relationship type in [Source System Code] -->|[Relationship Type]| [Target System Code].
-        - Exclude <br> or </br> tags from the code.)
-        2. **Summary** (max 50 words)
-        3. **Description** (max 200 words)
-        4. **Applications List**, for each:
-           - Title
-           - Application node
-           - Application Group/Category
-           - Relationships with other components in natural language and should include source application node and target application node. 
-        
-        5. **System Complexity Table** showing:
-           - Component Name  
-           - Complexity Score (Low/Medium/High)  
-           - Reason for Complexity (e.g., Many integrations, legacy tech, critical path dependency)  
-        
-        6. **Pros** of this architecture considering scalability, maintainability, security, and integration complexity. Don't include **bold** markers in the result. Output should be like:
-        **Pros**
-        - Scalability: ...
-        - Maintainability: ...
-        7. **Cons** of this architecture considering scalability, maintainability, security, and integration complexity. Don't include **bold** markers in the result. Output should be like:
-        **Cons**
-        - Scalability: ...
-        - Integration Complexity: ...
-        8. **Class Diagram (Mermaid)**: The code must represent each application component from the diagram as a distinct class.
-            -   DO NOT include Mermaid or mermaid or other wrappers in the output. The code block should start with classDiagram.
-            -   Use Mermaid-compatible syntax only:
-                -   No quotes around relationship labels or cardinalities
-                -   No data types like `string`, `int`, `datetime`, etc. — only use attribute names
-                -   No visibility modifiers like `+` or `-`
-                -   No types (e.g., `string x`) in attributes
-                -   Format each class with just attribute names and method names:
-                    ```
-                    class ClassName {
-                        attribute1
-                        attribute2
-                        method1()
-                        method2()
-                    }
-                    ```
-            -   For each class:
-                -   Include 2–3 realistic **attribute names** (but no types)
-                -   Include 2–3 realistic **method names** with `()` (no input args needed)
-            -   Define relationships using Mermaid’s syntax:
-                -   ClassA --> ClassB : label
-            -   Do not use quotes around labels or class names.
-            -   Avoid unsupported features like generics, inheritance, or modifiers.
-            -   **ONLY** use standard ASCII space characters (` `) and newline characters (`\n`) for indentation and separation. **DO NOT** use non-breaking spaces or any other invisible control characters.
-            -   **Example Class Diagram Output Format:**
-                ```
-                classDiagram
-                    class ExampleApp {
-                        appName
-                        version
-                        init()
-                        shutdown()
-                    }
-                    class DataService {
-                        dataEndpoint
-                        status
-                        fetchData()
-                        updateData()
-                    }
-                    ExampleApp --> DataService : uses
-                ```
-        9. **Data Model (Mermaid ERD)**: Generate a production-level data model using Mermaid `erDiagram` syntax.
-            -   Use only Mermaid-compatible syntax.
-            -   Start with: `erDiagram`
-            -   Define **at least 10–15 entities** that cover the architecture:
-                -   Core business domains (Customer, Account, Identity, CRM, Transactions)
-                -   Integration & messaging (EventLog, ApiCalls)
-                -   Audit & Logging (AuditLog, DataLineage, SessionLog)
-                -   Governance & compliance (DataPolicy, QualityIssue)
-                -   System Configuration & Metadata
-            -   For each entity:
-                -   Use 3–6 attributes.
-                -   Use only `string` or `int` data types (represent datetime/boolean/float as `string`).
-                -   Do NOT use arrays, JSON, blob, or object.
-                -   Use only `CamelCase` or `PascalCase` for names — no underscores or quotes.
-            -   For relationships:
-                -   Use valid Mermaid cardinalities: `||--||`, `||--o{`, `}o--||`, `}o--o{`
-                -   Relationship labels **MUST NOT** contain spaces (e.g., use `: belongsTo` or `: tracksConfig` instead of `: belongs to` or `: tracks`). Use `camelCase` or `PascalCase` for multi-word labels.
-                -   Do NOT use quotes around labels (e.g., use `: owns` not `: "owns"`).
-            -   Include realistic audit fields where applicable:
-                -   `createdAt`, `updatedAt`, `createdBy`, `status`
-            -   Output must be valid Mermaid `erDiagram` and renderable without modification.
-            -   Ensure broad functional coverage: include entities related to user sessions, customer segmentation, master data, integration events, API tracking, data quality, and governance.
-            -   Use consistent naming and domain-driven terminology.
-            -   **ONLY** use standard ASCII space characters (` `) and newline characters (`\n`) for indentation and separation. **DO NOT** use non-breaking spaces or any other invisible control characters.
-            -   **Example Data Model (Mermaid ERD) Output Format:**
-                ```
-                erDiagram
-                    User {
-                        int UserID PK
-                        string Username
-                        string Email
-                        string CreatedAt
-                    }
-                    Product {
-                        int ProductID PK
-                        string ProductName
-                        string Price
-                        string Status
-                    }
-                    Order {
-                        int OrderID PK
-                        int UserID FK
-                        string OrderDate
-                        string TotalAmount
-                        string OrderStatus
-                    }
-                    User ||--o{ Order : places
-                    Product }o--|| Order : includes
-                ```
-        
-        Format your response as:
-        
-        **Mermaid**  
-        (The Mermaid code block should start here, without a title)
-        ...  
-        
-        **Summary**  
-        ...  
-        
-        **Description**  
-        ...  
-        
-        **Applications**  
-        - Title: ...  
-        - System Code: ...  
-        - Group: ...  
-        - Relationships:  
-          - ...  
-        
-        **System Complexity Table**  
-        | Component      | Complexity | Reason                       |  
-        |----------------|------------|------------------------------|  
-        | API Gateway    | High       | Central integration point    |  
-        | Identity Mgmt  | Medium     | Moderate coupling            |  
-        
-        **Pros**  
-        - ...  
-        
-        **Cons**  
-        - ...  
-        
-        **Class Diagram (Mermaid)** 
-        (The Class Diagram Mermaid code block)
-        ...
-        
-        **Data Model (Mermaid ERD)** 
-        (The Data Model Mermaid ERD code block)
-        ...
-        
-        The output must contain one clearly separated block per application, using the structure shown. No additional commentary or formatting is needed beyond the required fields.
-        """
-
-        # Gemini API Call
-        gemini_resp = requests.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-pro:generateContent",
-            headers={"Content-Type": "application/json"},
-            params={"key": GEMINI_API_KEY},
-            json={
-                "contents": [
-                    {
-                        "role": "user",
-                        "parts": [
-                            {"text": prompt},
-                            {"inline_data": {"mime_type": "image/png", "data": img_b64}}
-                        ]
-                    }
-                ]
-            },
-        )
-
-        result = gemini_resp.json()
-
-        '''
-
-        with open("new_test_response_core_asset_APP001.json", "r") as f:
-            result = json.load(f)
-
-        '''
-
-        if "candidates" not in result:
-            raise HTTPException(status_code=500, detail=result)
-
-        output_text = result["candidates"][0]["content"]["parts"][0]["text"]
-
-        # Example response chunks
-        sections = re.split(r"\*\*(.*?)\*\*", output_text)
-
-        # Parse Response
-        mermaid = ""
-        summary = ""
-        description = ""
-        applications = []
-        complexity_table = []
-        pros = []
-        cons = []
-        class_diagram = ""
-        data_model = ""
-
-        for i, section in enumerate(sections):
-            if section.strip().lower() == "mermaid":
-                mermaid_code = sections[i + 1].strip()
-                mermaid = clean_mermaid_code(mermaid_code)
-                # print('mermaid done')
-            elif section.strip().lower() == "summary":
-                summary = sections[i + 1].strip()
-                # print('summary done')
-            elif section.strip().lower() == "description":
-                description = sections[i + 1].strip()
-                # print('description done')
-            elif section.strip().lower() == "applications":
-                apps_text = sections[i + 1].strip()
-                app_blocks = re.split(r"-\s*Title:", apps_text)
-
-                for block in app_blocks[1:]:
-                    lines = block.strip().split("\n")
-                    title = lines[0].strip()
-                    system_code = lines[1].replace("System Code:", "").strip()
-                    group = lines[2].replace("Group:", "").strip()
-                    relationships = [
-                        line.strip("- ").strip()
-                        for line in lines[4:]
-                        if line.strip().startswith("-")
-                    ]
-
-                    applications.append({
-                        "title": title,
-                        "system_code": system_code,
-                        "group": group,
-                        "relationships": relationships
-                    })
-                    # print('application done')
-            elif "System Complexity Table" in section:
-                table_text = sections[i + 1].strip()
-                rows = table_text.splitlines()[2:]  # Skip header lines
-
-                for row in rows:
-                    cols = [col.strip() for col in row.split("|") if col.strip()]
-                    if len(cols) == 3:
-                        complexity_table.append({
-                            "component": cols[0],
-                            "complexity": cols[1],
-                            "reason": cols[2]
-                        })
-                # print('complexity done')
-            elif section.strip().lower() == "pros":
-                raw_pros = sections[i + 1].strip()
-                pros = [
-                    line.lstrip("- ").strip()
-                    for line in raw_pros.splitlines()
-                    if line.strip().startswith("-")
-                ]
-                # print('pros done')
-            elif section.strip().lower() == "cons":
-                raw_cons = sections[i + 1].strip()
-                cons = [
-                    line.lstrip("- ").strip()
-                    for line in raw_cons.splitlines()
-                    if line.strip().startswith("-")
-                ]
-                # print('cons done')
-            elif section.strip().lower() == "class diagram (mermaid)":
-                classdiagram = sections[i + 1].strip()
-                class_diagram = clean_class_diagram(classdiagram)
-                # print('class diagram done')
-            elif section.strip().lower() == "data model (mermaid erd)":
-                datamodel = sections[i + 1].strip()
-                data_model = clean_data_model(datamodel)
-                # print('data model done')
-
-        # Store Mermaid to PostgreSQL
-        diagram_id = f"DIAGRAM_{str(uuid4())[:8]}"
-        with PG_CONN.cursor() as cur:
-            cur.execute(
-                "INSERT INTO DIAGRAMS (diagram_id, diagram_mermaid_code, diagram_name, diagram_class_code, diagram_data_model) VALUES (%s, %s, %s, %s, %s)",
-                (diagram_id, mermaid, diagram_name, class_diagram, data_model),
-            )
-            PG_CONN.commit()
-
-            cur.execute("SELECT * FROM ASSETS WHERE asset_id = %s", (asset_id,))
-            if cur.fetchone():
-                cur.execute("UPDATE ASSETS SET asset_diagram_id = %s WHERE asset_id = %s", (diagram_id, asset_id))
-            else:
-                cur.execute(
-                    "INSERT INTO ASSETS (asset_id, asset_diagram_id, asset_name, asset_description) VALUES (%s, %s, '', '')",
-                    (asset_id, diagram_id),
-                )
-            PG_CONN.commit()
-        # print('pgsql done')
-
-        # Store Mermaid to Neo4j
-        nodes, edges = parse_mermaid(mermaid)
-        # print('neo4j entered')
-        with driver.session() as session:
-            session.execute_write(store_graph, diagram_id, nodes, edges)
-        # print('neo4j done')
-
-        # Store diagram-level doc
-        store_diagram_summary(diagram_id, diagram_name, summary, description, pros, cons)
-        # print('vector db for diagram done')
-
-        # Store each application separately
-        for app in applications:
-            store_application({
-                "title": app["title"],
-                "system_code": app["system_code"],
-                "group": app["group"],
-                "relationships": app["relationships"],
-                "diagram_id": diagram_id,
-                "diagram_name": diagram_name
-            })
-        # print('vector db for applications done')
-
-        # Store complexity data
-        for entry in complexity_table:
-            store_complexity_entry(diagram_id, diagram_name, entry['component'], entry['complexity'], entry['reason'])
-        # print('vector db for complexity done')
-
-        return {
-            "diagram_id": diagram_id,
-            "mermaid_code": mermaid,
-            "summary": summary,
-            "description": description,
-            "nodes": nodes,
-            "edges": edges,
-            "complexity_table": complexity_table,
-            "pros": pros,
-            "cons": cons,
-            "class_diagram": class_diagram,
-            "data_model": data_model
-        }
+        # Step 5: Send to Gemini and store the results
+        return run_upload_pipeline(image_response.content, diagram_name, asset_id, use_cache=use_cache)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -840,41 +895,41 @@ def process_confluence_page(diagram_name: str = Form(...), asset_id: str = Form(
 
 # Architecture name partial search
 @app.get("/get_arch_names")
-def autocomplete_arch_names(q: str = Query(..., min_length=3)):
-    with PG_CONN.cursor() as cur:
-        cur.execute("SELECT DISTINCT diagram_name FROM diagrams WHERE diagram_name ILIKE %s", (f"{q}%",))
+def autocomplete_arch_names(q: str = Query(..., min_length=3), limit: int = Query(20, ge=1, le=50)):
+    if AUTOCOMPLETE.ready():
+        return {"results": [name for name, _ in AUTOCOMPLETE.search("arch_names", q, limit)]}
+
+    with PG_POOL.cursor() as cur:
+        cur.execute(
+            "SELECT diagram_name FROM (SELECT DISTINCT diagram_name FROM diagrams WHERE diagram_name ILIKE %s) d "
+            "ORDER BY length(diagram_name), lower(diagram_name) LIMIT %s",
+            (f"{q}%", limit),
+        )
         rows = cur.fetchall()
         matches = [row[0] for row in rows if row[0]]
-        PG_CONN.commit()
     return {"results": matches}
 
 # Updating for more content in view #
-@app.get("/get_arch_code")
-def get_arch_code(arch_name: str = Query(...)):
-
-    with PG_CONN.cursor() as cur:
-        cur.execute("SELECT diagram_mermaid_code, diagram_class_code, diagram_data_model FROM diagrams WHERE diagram_name = %s ORDER BY UPDATED_AT DESC", (arch_name,))
-        result = cur.fetchone()
-
-        if not result:
-            return JSONResponse(status_code=404, content={"error": "No diagram found with this name"})
-
-        # For Summary, Description, Pros, Cons
-        coll = client.get_collection(name='architecture_diagrams')
-        results = coll.get(
-            where={"diagram_name": arch_name},
-            include=["documents", "metadatas"]
-        )
-
-        for doc in results["documents"]:
-            if not isinstance(doc, str):
-                continue  # Skip if somehow not a string
-
-            # Robust, section-based extraction using non-greedy matching
-            pattern = re.compile(
-                r"Summary:\s*(.*?)Diagram Name:\s*(.*?)\s*Description:\s*(.*?)\s*Pros:\s*(.*?)\s*Cons:\s*(.*)",
-                re.DOTALL | re.IGNORECASE
-            )
+def legacy_arch_view(arch_name: str, mermaid_code: str) -> dict:
+    """Re-derives the parsed sections from Chroma for diagrams uploaded before diagram_artifacts existed."""
+    summary, description, pros, cons = "", "", [], []
+
+    # For Summary, Description, Pros, Cons
+    coll = client.get_collection(name='architecture_diagrams')
+    results = coll.get(
+        where={"diagram_name": arch_name},
+        include=["documents", "metadatas"]
+    )
+
+    # Robust, section-based extraction using non-greedy matching
+    pattern = re.compile(
+        r"Summary:\s*(.*?)Diagram Name:\s*(.*?)\s*Description:\s*(.*?)\s*Pros:\s*(.*?)\s*Cons:\s*(.*)",
+        re.DOTALL | re.IGNORECASE
+    )
+
+    for doc in results["documents"]:
+        if not isinstance(doc, str):
+            continue  # Skip if somehow not a string
 
         match = pattern.search(doc)
         if match:
@@ -887,127 +942,195 @@ def get_arch_code(arch_name: str = Query(...)):
             cons_list = re.findall(r'([A-Za-z\s]+?):\s*(.*?)(?=\n[A-Za-z\s]+?:|\Z)', raw_cons, re.DOTALL)
             cons = [f"{title.strip()}: {desc.strip()}" for title, desc in cons_list]
 
-        # For System Complexity Table
-        coll = client.get_collection(name='architecture_complexity')
-        results = coll.get(
-            where={"diagram_name": arch_name},
-            include=["documents", "metadatas"]
-        )
-
-        complexity_table = []
-        # Regex to extract component, complexity, reason
+    # For System Complexity Table
+    coll = client.get_collection(name='architecture_complexity')
+    results = coll.get(
+        where={"diagram_name": arch_name},
+        include=["documents", "metadatas"]
+    )
 
-        pattern = re.compile(
-            r"Component:\s*(.*?)\s*Diagram Name:\s*.*?Complexity:\s*(.*?)\s*Reason:\s*(.*)",
-            re.DOTALL | re.IGNORECASE
-        )
-
-        for doc in results["documents"]:
-            match = pattern.search(doc)
-            if match:
-                component = match.group(1).strip()
-                complexity = match.group(2).strip()
-                reason = match.group(3).strip()
-
-                complexity_table.append({
-                    "component": component,
-                    "complexity": complexity,
-                    "reason": reason
-                })
+    complexity_table = []
+    # Regex to extract component, complexity, reason
 
-        # For nodes and edges
-        nodes, edges = parse_mermaid(result[0])
+    pattern = re.compile(
+        r"Component:\s*(.*?)\s*Diagram Name:\s*.*?Complexity:\s*(.*?)\s*Reason:\s*(.*)",
+        re.DOTALL | re.IGNORECASE
+    )
 
-        return {
-            "arch_name": arch_name,
-            "mermaid_code": result[0],
-            "summary": summary,
-            "description": description,
-            "nodes": nodes,
-            "edges": edges,
-            "complexity_table": complexity_table,
-            "pros": pros,
-            "cons": cons,
-            "class_diagram": result[1],
-            "data_model": result[2]
-        }
+    for doc in results["documents"]:
+        match = pattern.search(doc)
+        if match:
+            complexity_table.append({
+                "component": match.group(1).strip(),
+                "complexity": match.group(2).strip(),
+                "reason": match.group(3).strip()
+            })
 
-# --- Chat Section with simple RAM based chat history --- #
+    # For nodes and edges
+    nodes, edges = parse_mermaid(mermaid_code)
+
+    return {
+        "summary": summary,
+        "description": description,
+        "pros": pros,
+        "cons": cons,
+        "complexity_table": complexity_table,
+        "nodes": nodes,
+        "edges": edges,
+    }
+
+# Architecture views, cached per (diagram name, diagram_id)
+ARCH_VIEWS = ArchViewStore(
+    PG_POOL,
+    legacy_view=legacy_arch_view,
+    max_entries=int(os.getenv("ARCH_VIEW_CACHE_ENTRIES", "256")),
+    version_ttl=int(os.getenv("ARCH_VIEW_VERSION_TTL", "30")),
+)
 
-def infer_collection(prompt: str) -> str:
-    prompt_lower = prompt.lower()
+@app.on_event("startup")
+def migrate_arch_views():
+    try:
+        ARCH_VIEWS.migrate()
+    except Exception as e:
+        print("[ERROR] diagram_artifacts migration:", e)
 
-    if any(keyword in prompt_lower for keyword in ["complexity", "risk", "rationale", "complex"]):
-        return "architecture_complexity"
+@app.get("/get_arch_code")
+def get_arch_code(arch_name: str = Query(...)):
+    view = ARCH_VIEWS.get(arch_name)
+    if view is None:
+        return JSONResponse(status_code=404, content={"error": "No diagram found with this name"})
+    return view
+
+@app.get("/get_arch_code/cache_stats")
+def arch_view_cache_stats():
+    return ARCH_VIEWS.stats()
+
+# --- Chat Section with bounded session history --- #
+
+# Retrieval stage: only close, de-duplicated documents are packed into the prompt
+retriever = Retriever(
+    max_distance=float(os.getenv("CHAT_MAX_DISTANCE", "1.2")),
+    token_budget=int(os.getenv("CHAT_CONTEXT_TOKENS", "6000")),
+    reranker=CrossEncoderReranker(os.getenv("CHAT_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"))
+    if os.getenv("CHAT_RERANK", "false").lower() == "true" else None,
+)
 
-    elif any(keyword in prompt_lower for keyword in ["application", "app", "asset", "integration", "relationship", "upstream", "downstream", "connection"]):
-        return "architecture_applications"
+# "router" queries all three collections and fuses the results; "keyword" uses infer_collection's single pick
+CHAT_RETRIEVAL_MODE = os.getenv("CHAT_RETRIEVAL_MODE", "router").lower()
+ROUTER_SCOPE = "all_collections"
+router = RetrievalRouter(
+    {
+        "architecture_diagrams": diagram_collection,
+        "architecture_applications": app_collection,
+        "architecture_complexity": complexity_collection,
+    },
+    retriever,
+    driver=driver if os.getenv("CHAT_GRAPH_LOOKUP", "true").lower() == "true" else None,
+)
 
-    elif any(keyword in prompt_lower for keyword in ["diagram", "cons", "pros", "summary", "description", "architecture", "design"]):
-        return "architecture_diagrams"
+# Semantic answer cache: near-identical questions against the same collection reuse the answer
+answer_cache = SemanticCache(
+    embedder,
+    threshold=float(os.getenv("CHAT_CACHE_THRESHOLD", "0.92")),
+    max_entries=int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "2000")),
+    ttl_seconds=int(os.getenv("CHAT_CACHE_TTL_SECONDS", str(24 * 3600))),
+    version_source=lambda: read_corpus_version(),
+    version_ttl=float(os.getenv("CHAT_CACHE_VERSION_TTL", "2")),
+)
 
-    else:
-        return "architecture_diagrams"
+# Shared corpus version: uploads, bulk batches and rollbacks bump it, every worker's cache compares it
+@app.on_event("startup")
+def migrate_corpus_version():
+    try:
+        with PG_POOL.cursor() as cur:
+            corpus_version.migrate(cur)
+    except Exception as e:
+        print("[ERROR] Corpus version migration:", e)
 
-# Config
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+def read_corpus_version():
+    with PG_POOL.cursor() as cur:
+        return corpus_version.read(cur)
 
-# Gemini Model
-model = genai.GenerativeModel("gemini-2.5-pro")
+def bump_corpus_version():
+    try:
+        with PG_POOL.cursor() as cur:
+            corpus_version.bump(cur)
+    except Exception as e:
+        print("[ERROR] Corpus version bump:", e)
+    answer_cache.refresh_version()
 
 @app.post("/generate_session/")
 def generate_session():
     """Generates a new session_id for chat tab."""
     session_id = str(uuid4())
-    chat_memory[session_id] = ""
+    chat_memory.create(session_id)
     return {"session_id": session_id}
 
 @app.post("/reset_session/")
 def reset_session(session_id: str = Form(...)):
     """Resets memory for the provided session_id."""
-    if session_id in chat_memory:
-        chat_memory[session_id] = ""
+    if chat_memory.reset(session_id):
         return {"message": f"Session {session_id} has been cleared."}
     return {"error": "Session ID not found."}
 
-@app.post("/chat/")
-def chat(query: str = Form(...), session_id: str = Form(...)):
-    try:
-        # Validate collection input
-        valid_collections = [
-            "architecture_diagrams",
-            "architecture_applications",
-            "architecture_complexity"
-        ]
+def clean_chat_answer(answer: str) -> str:
+    # Clean answer if it starts and ends with triple backticks
+    if answer.startswith("```") and answer.endswith("```"):
+        # Remove the triple backticks
+        answer = answer.strip('`').strip()
+
+        # If it starts with 'mermaid', remove that too
+        if answer.lower().startswith('mermaid'):
+            answer = answer[len('mermaid'):].strip()
+    return answer
+
+def prepare_chat_turn(query: str, session_id: str, use_cache: bool) -> dict:
+    """Validation, cache lookup, retrieval and prompt building shared by /chat/ and /chat/stream."""
+    # Validate collection input
+    valid_collections = [
+        "architecture_diagrams",
+        "architecture_applications",
+        "architecture_complexity"
+    ]
 
-        if session_id not in chat_memory:
-            return {"error": "Invalid session_id. Generate one first."}
+    if not chat_memory.exists(session_id):
+        return {"error": "Invalid session_id. Generate one first."}
 
-            # Auto-select collection
-        collection = infer_collection(query)
+    # Auto-select collection (the router searches all of them)
+    collection = ROUTER_SCOPE if CHAT_RETRIEVAL_MODE == "router" else infer_collection(query)
 
-        if collection not in valid_collections:
-            return {"error": "Failed to infer collection."}
+    if collection not in valid_collections + [ROUTER_SCOPE]:
+        return {"error": "Failed to infer collection."}
 
-        # Retrieve past conversation (if any)
-        context_text = chat_memory.get(session_id, "")
+    # Retrieve past conversation (if any)
+    context_text = chat_memory.history(session_id)
 
-        coll = client.get_collection(name=collection)
+    # Cached answers are keyed on the question alone, so only turns without history may use them:
+    # a follow-up ("what about its cons?") means something different in every conversation.
+    # use_cache=False skips the lookup; the fresh answer still replaces the cached one
+    cacheable = not context_text
+    version = answer_cache.current_version() if cacheable else None
+    query_vector = answer_cache.embed_query(query)
+    cached = answer_cache.get(collection, query_vector, version) if use_cache and cacheable else None
+    if cached:
+        return {"cached": cached}
 
-        search_res = coll.query(
-            query_texts=[query],
-            n_results=150,
-            include=["metadatas", "documents"]
-        )
+    if collection == ROUTER_SCOPE:
+        docs, retrieval_stats = router.retrieve(query, query_embedding=query_vector.tolist())
+        topic = "architecture"
+    else:
+        coll = client.get_collection(name=collection)
+        docs, retrieval_stats = retriever.retrieve(coll, query, query_embedding=query_vector.tolist())
+        topic = collection.replace('_', ' ')
 
-        results = []
-        for doc, meta in zip(search_res["documents"][0], search_res["metadatas"][0]):
-            results.append(f"{meta.get('source', '')}: {doc}")
+    results = []
+    for cand in docs:
+        results.append(f"{cand['metadata'].get('source', '')}: {cand['document']}")
 
-        context_docs = "\n\n".join(results) if results else "No relevant documents found."
+    context_docs = "\n\n".join(results) if results else "No relevant documents found."
 
-        full_prompt = f"""
-You are an expert system assistant. Based on the following {collection.replace('_', ' ')} information, answer the question clearly:
+    full_prompt = f"""
+You are an expert system assistant. Based on the following {topic} information, answer the question clearly:
 
 **Conversation so far:**
 {context_text}
@@ -1018,95 +1141,209 @@ You are an expert system assistant. Based on the following {collection.replace('
 **Question:** {query}
 """
 
-        response = model.generate_content(full_prompt)
-        answer = response.text.strip() if hasattr(response, 'text') else "Error processing response."
+    return {
+        "collection": collection,
+        "query_vector": query_vector,
+        "docs": docs,
+        "retrieval": retrieval_stats,
+        "prompt": full_prompt,
+        "cacheable": cacheable,
+        "corpus_version": version,
+    }
+
+def complete_chat_turn(turn: dict, session_id: str, query: str, answer: str, cacheable: bool = True):
+    # Update memory (older turns are summarised once the session exceeds its token budget)
+    chat_memory.append(session_id, query, answer)
+
+    if cacheable and turn.get("cacheable"):
+        answer_cache.put(turn["collection"], turn["query_vector"], query, answer, turn["corpus_version"])
+
+@app.post("/chat/")
+def chat(query: str = Form(...), session_id: str = Form(...), use_cache: bool = Form(True)):
+    try:
+        turn = prepare_chat_turn(query, session_id, use_cache)
+        if "error" in turn:
+            return {"error": turn["error"]}
+
+        if "cached" in turn:
+            cached = turn["cached"]
+            complete_chat_turn(turn, session_id, query, cached["answer"])
+            return {
+                "response": cached["answer"],
+                "cache": {"hit": True, "similarity": cached["similarity"], "matched_query": cached["query"]},
+            }
 
-        # Clean answer if it starts and ends with triple backticks
-        if answer.startswith("```") and answer.endswith("```"):
-            # Remove the triple backticks
-            answer = answer.strip('`').strip()
+        response = llm_providers.generate("chat", text_body(turn["prompt"]))
+        answered = "candidates" in response
+        answer = text_of(response).strip() if answered else "Error processing response."
+        answer = clean_chat_answer(answer)
 
-            # If it starts with 'mermaid', remove that too
-            if answer.lower().startswith('mermaid'):
-                answer = answer[len('mermaid'):].strip()
+        complete_chat_turn(turn, session_id, query, answer, cacheable=answered)
 
-        # Update memory
-        chat_memory[session_id] = context_text + f"\n\nQ: {query}\nA: {answer}"
+        retrieval_stats = turn["retrieval"]
+        retrieval_stats["prompt_tokens"] = usage_of(response)["prompt_tokens"]
 
-        return {"response": answer}
+        return {"response": answer, "retrieval": retrieval_stats, "cache": {"hit": False}}
 
     except Exception as e:
         return {"error": str(e)}
 
+# Time-to-first-token of recent /chat/stream requests, in ms
+chat_ttft_ms = deque(maxlen=int(os.getenv("CHAT_TTFT_WINDOW", "500")))
+chat_stream_cancelled = 0
+
+@app.post("/chat/stream")
+def chat_stream(request: Request, query: str = Form(...), session_id: str = Form(...), use_cache: bool = Form(True)):
+    """Same as /chat/, but streams the answer as SSE 'token' events and ends with a 'done' event."""
+    started = time.perf_counter()
+    try:
+        turn = prepare_chat_turn(query, session_id, use_cache)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    if "error" in turn:
+        return JSONResponse(status_code=400, content={"error": turn["error"]})
+
+    def event_stream():
+        global chat_stream_cancelled
+
+        if "cached" in turn:
+            cached = turn["cached"]
+            complete_chat_turn(turn, session_id, query, cached["answer"])
+            chat_ttft_ms.append(1000 * (time.perf_counter() - started))
+            yield f"data: {json.dumps({'token': cached['answer']})}\n\n"
+            cache_info = {"hit": True, "similarity": cached["similarity"], "matched_query": cached["query"]}
+            yield f"data: {json.dumps({'done': True, 'response': cached['answer'], 'cache': cache_info})}\n\n"
+            return
+
+        yield f"data: {json.dumps({'retrieval': turn['retrieval']})}\n\n"
+
+        tokens = []
+        ttft = None
+        upstream = gemini_stream_text("chat", text_body(turn["prompt"]))
+        try:
+            for text in upstream:
+                if ttft is None:
+                    ttft = 1000 * (time.perf_counter() - started)
+                    chat_ttft_ms.append(ttft)
+                tokens.append(text)
+                yield f"data: {json.dumps({'token': text})}\n\n"
+        except GeneratorExit:
+            # Client disconnected: close the Gemini stream so generation stops upstream, and skip the memory update
+            upstream.close()
+            chat_stream_cancelled += 1
+            raise
+        except HTTPException as e:
+            yield f"data: {json.dumps({'error': e.detail})}\n\n"
+            return
+
+        answer = clean_chat_answer("".join(tokens).strip())
+        complete_chat_turn(turn, session_id, query, answer)
+        timings = {
+            "ttft_ms": round(ttft, 1) if ttft else None,
+            "total_ms": round(1000 * (time.perf_counter() - started), 1),
+        }
+        yield f"data: {json.dumps({'done': True, 'response': answer, 'cache': {'hit': False}, **timings})}\n\n"
+
+    return StreamingResponse(until_disconnected(request, event_stream()), media_type="text/event-stream")
+
+@app.get("/chat/stream_stats")
+def chat_stream_stats():
+    samples = sorted(chat_ttft_ms)
+    def percentile(p):
+        return round(samples[min(int(p * len(samples)), len(samples) - 1)], 1) if samples else None
+    return {
+        "samples": len(samples),
+        "ttft_p50_ms": percentile(0.50),
+        "ttft_p95_ms": percentile(0.95),
+        "cancelled": chat_stream_cancelled,
+    }
+
+@app.get("/chat/cache_stats")
+def chat_cache_stats():
+    return answer_cache.stats()
+
+# Per-route LLM requests, retries, queue depth and latency histograms (uploads, chat, agents)
+@app.get("/llm/stats")
+def llm_stats():
+    return {"providers": llm_providers.assignments(), "routes": llm_gateway.stats()}
+
 # --- Domain and Capabilities section --- #
 
-def fetch_asset_ids(domain: str, capability: str) -> List[str]:
-    with PG_CONN.cursor() as cur:
-        cur.execute("SELECT asset_id FROM assets WHERE asset_domain = %s AND asset_capability = %s", (domain,capability))
-        result = cur.fetchall()
-        PG_CONN.commit()
-        return [row[0] for row in result]
+def fetch_asset_ids(domain: str, capability: str):
+    with PG_POOL.cursor() as cur:
+        cur.execute("SELECT asset_id FROM assets WHERE asset_domain = %s AND asset_capability = %s", (domain, capability))
+        return [row[0] for row in cur.fetchall()]
 
-# Used r.interface_type instead type(r) due to sample data. May need to update with final data.
-def get_interface_type_counts(asset_ids: List[str]) -> List[Dict[str, int]]:
-    query = """
-    MATCH (a)-[r]->(b)
-    WHERE a.id IN $ids AND r.interface_type IS NOT NULL
-    RETURN r.interface_type AS type, COUNT(DISTINCT a.id + '_' + b.id + '_' + r.interface_type) AS count
-    """
-    with driver.session() as session:
-        result = session.run(query, ids=asset_ids)
-        return [{record["type"]: record["count"]} for record in result]
+@app.on_event("startup")
+def bootstrap_interface_rollup():
+    try:
+        with PG_POOL.cursor() as cur:
+            interface_rollup.migrate(cur)
+            # First start after the rollup was introduced: seed it from the existing graph
+            cur.execute("SELECT EXISTS (SELECT 1 FROM interface_edges)")
+            if not cur.fetchone()[0]:
+                interface_rollup.sync_edges_from_graph(cur, driver)
+                interface_rollup.rebuild_rollup(cur)
+    except Exception as e:
+        print("[ERROR] Interface rollup bootstrap:", e)
 
 # Used r.interface_type instead type(r) due to sample data. May need to update with final data.
-def get_relationships_by_interface_type(asset_ids: List[str], interface_type: str) -> List[Dict[str, str]]:
-    query = """
-    MATCH (a)-[r]->(b)
-    WHERE a.id IN $ids AND r.interface_type = $interface_type
-    RETURN a.id AS from_node, a.name AS source_name, b.name AS target_name, b.id AS to_node, r.interface_type AS interface_type
-    """
-    unique_edges: Set[Tuple[str, str, str, str, str]] = set()
-    with driver.session() as session:
-        result = session.run(query, ids=asset_ids, interface_type=interface_type)
+# No label: uploaded :Node diagrams and the :Application graph both match. Neo4j de-duplicates and pages.
+RELATIONSHIPS_BY_INTERFACE_QUERY = """
+MATCH (a)-[r]->(b)
+WHERE a.id IN $ids AND r.interface_type = $interface_type
+WITH DISTINCT a.id AS from_node, a.name AS source_name, b.id AS to_node, b.name AS target_name,
+     r.interface_type AS interface_type
+RETURN from_node, source_name, to_node, target_name, interface_type
+ORDER BY from_node, to_node, source_name, target_name
+SKIP $offset LIMIT $limit
+"""
+
+def stream_relationships_by_interface_type(session, result, offset: int, limit: int):
+    """Yields the JSON response piece by piece: {"results": [...], "next_offset": int | null}; closes session."""
+    try:
+        yield '{"results": ['
+        count, has_more = 0, False
         for record in result:
-            edge = (
-                record["from_node"],
-                record["source_name"],
-                record["to_node"],
-                record["target_name"],
-                record["interface_type"]
-            )
-            if edge not in unique_edges:
-                unique_edges.add(edge)
-    return [
-        {
-            "from_node": from_node,
-            "source_name": source_name,
-            "to_node": to_node,
-            "target_name": target_name,
-            "interface_type": itype
-        }
-        for (from_node, source_name, to_node, target_name, itype) in unique_edges
-    ]
+            if count == limit:
+                has_more = True
+                break
+            yield ("," if count else "") + json.dumps(record.data())
+            count += 1
+        yield f'], "next_offset": {json.dumps(offset + count if has_more else None)}}}'
+    finally:
+        session.close()
 
 # Domain partial search
 @app.get("/get_domains")
-def autocomplete_domain(q: str = Query(..., min_length=3)):
-    with PG_CONN.cursor() as cur:
-        cur.execute("SELECT DISTINCT asset_domain FROM assets WHERE asset_domain ILIKE %s", (f"{q}%",))
+def autocomplete_domain(q: str = Query(..., min_length=3), limit: int = Query(20, ge=1, le=50)):
+    if AUTOCOMPLETE.ready():
+        return {"results": [name for name, _ in AUTOCOMPLETE.search("domains", q, limit)]}
+
+    with PG_POOL.cursor() as cur:
+        cur.execute(
+            "SELECT asset_domain FROM (SELECT DISTINCT asset_domain FROM assets WHERE asset_domain ILIKE %s) a "
+            "ORDER BY length(asset_domain), lower(asset_domain) LIMIT %s",
+            (f"{q}%", limit),
+        )
         rows = cur.fetchall()
         matches = [row[0] for row in rows if row[0]]
-        PG_CONN.commit()
     return {"results": matches}
 
 # Capability partial search
 @app.get("/get_capabilities")
-def autocomplete_capability(q: str = Query(..., min_length=3)):
-    with PG_CONN.cursor() as cur:
-        cur.execute("SELECT DISTINCT asset_capability FROM assets WHERE asset_capability ILIKE %s", (f"{q}%",))
+def autocomplete_capability(q: str = Query(..., min_length=3), limit: int = Query(20, ge=1, le=50)):
+    if AUTOCOMPLETE.ready():
+        return {"results": [name for name, _ in AUTOCOMPLETE.search("capabilities", q, limit)]}
+
+    with PG_POOL.cursor() as cur:
+        cur.execute(
+            "SELECT asset_capability FROM (SELECT DISTINCT asset_capability FROM assets WHERE asset_capability ILIKE %s) a "
+            "ORDER BY length(asset_capability), lower(asset_capability) LIMIT %s",
+            (f"{q}%", limit),
+        )
         rows = cur.fetchall()
         matches = [row[0] for row in rows if row[0]]
-        PG_CONN.commit()
     return {"results": matches}
 
 # Get count per interface
@@ -1115,76 +1352,125 @@ def interface_summary(domain: str, capability: str):
     try:
         if not domain or not capability:
             return {"results": []}
-        asset_ids = fetch_asset_ids(domain, capability)
-        if not asset_ids:
-            return {"results": []}
-        summary = get_interface_type_counts(asset_ids)
-        return summary
+        # Rollup maintained by uploads and rebuild_interface_rollup.py, joined to the current asset domains
+        with PG_POOL.cursor() as cur:
+            summary = interface_rollup.interface_counts(cur, domain, capability)
+        return summary if summary else {"results": []}
     except Exception as e:
         print("[ERROR] /get_interface_type_counts:", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Get relationships by interface type
 @app.get("/get_nodes_by_d_c_interface")
-def get_nodes_by_d_c_interface(domain: str = Query(...), capability: str = Query(...), interface_type: str = Query(...)):
+def get_nodes_by_d_c_interface(domain: str = Query(...), capability: str = Query(...), interface_type: str = Query(...),
+                               offset: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000)):
     try:
         asset_ids = fetch_asset_ids(domain, capability)
-        if not asset_ids:
-            raise HTTPException(status_code=404, detail="No assets found for given domain and capability.")
-        results = get_relationships_by_interface_type(asset_ids, interface_type)
-        return {"results": results}
     except Exception as e:
         print("[ERROR] /get_nodes_by_d_c_interface:", e)
         raise HTTPException(status_code=500, detail=str(e))
+    if not asset_ids:
+        raise HTTPException(status_code=404, detail="No assets found for given domain and capability.")
+
+    # Run the query and wait for its first page before streaming, so failures still get a 500
+    session = driver.session(fetch_size=500)
+    try:
+        result = session.run(RELATIONSHIPS_BY_INTERFACE_QUERY, ids=asset_ids, interface_type=interface_type,
+                             offset=offset, limit=limit + 1)
+        result.peek()
+    except Exception as e:
+        session.close()
+        print("[ERROR] /get_nodes_by_d_c_interface:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        stream_relationships_by_interface_type(session, result, offset, limit),
+        media_type="application/json",
+    )
 
 # --- Application connection explorer --- #
 
-@app.get("/query")
-def query_graph(node_id: str = Query(...), type: str = Query("Upstream"), depth: int = Query(1)):
-    with driver.session() as session:
-        if type.lower() == "upstream":
-            cypher = f"""
-                MATCH path = (start {{id: $node_id}})<-[*1..{depth}]-(end)
-                RETURN DISTINCT path
-            """
-        elif type.lower() == "downstream":
-            cypher = f"""
-                MATCH path = (start {{id: $node_id}})-[*1..{depth}]->(end)
-                RETURN DISTINCT path
-            """
-        elif type.lower() == "both":
-            cypher = f"""
-                MATCH path = (start {{id: $node_id}})-[*1..{depth}]-(end)
-                RETURN DISTINCT path
-            """
-        else:
-            return {"results": []}
+# Server-side caps for the explorer traversal
+GRAPH_MAX_DEPTH = int(os.getenv("GRAPH_MAX_DEPTH", "6"))
+GRAPH_MAX_NODES = int(os.getenv("GRAPH_MAX_NODES", "2000"))
+GRAPH_MAX_EDGES = int(os.getenv("GRAPH_MAX_EDGES", "10000"))
+GRAPH_TIMEOUT_SECONDS = float(os.getenv("GRAPH_TIMEOUT_SECONDS", "5"))
 
-        results = session.run(cypher, node_id=node_id)
-        response = []
-        for record in results:
-            path = record["path"]
-            for rel in path.relationships:
-                response.append({
-                    "n": dict(rel.start_node),
-                    "r": [dict(rel.start_node), rel.type, dict(rel.end_node), {"reflink": rel.get("reflink")}],
-                    "m": dict(rel.end_node)
-                })
+# Recent traversals, so paging through one doesn't re-run it
+traversal_cache = TraversalCache()
+
+# Optional in-memory CSR copy of the graph; /query falls back to Cypher while it is stale
+GRAPH_SNAPSHOT = (GraphSnapshot(driver, max_age=int(os.getenv("GRAPH_SNAPSHOT_MAX_AGE", "300")))
+                  if os.getenv("GRAPH_SNAPSHOT", "false").lower() == "true" else None)
+
+@app.on_event("startup")
+def load_graph_snapshot():
+    if GRAPH_SNAPSHOT:
+        try:
+            GRAPH_SNAPSHOT.load()
+        except Exception as e:
+            print("[ERROR] Graph snapshot load:", e)
 
-        return {"results": response}
+@app.get("/graph_snapshot_stats")
+def graph_snapshot_stats():
+    return GRAPH_SNAPSHOT.stats() if GRAPH_SNAPSHOT else {"loaded": False, "enabled": False}
+
+@app.get("/query")
+def query_graph(node_id: str = Query(...), type: str = Query("Upstream"), depth: int = Query(1, ge=1),
+                offset: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=5000)):
+    direction = type.lower()
+    if direction not in ("upstream", "downstream", "both"):
+        return {"results": []}
+    depth = min(depth, GRAPH_MAX_DEPTH)
+
+    # BFS with a visited set: every node and edge appears once, however many paths reach it
+    key = (node_id, direction, depth)
+    cached = traversal_cache.get(key)
+    if cached is None:
+        if GRAPH_SNAPSHOT and GRAPH_SNAPSHOT.fresh() and GRAPH_SNAPSHOT.contains(node_id):
+            subgraph = GRAPH_SNAPSHOT.traverse(node_id, direction, depth, max_nodes=GRAPH_MAX_NODES,
+                                               max_edges=GRAPH_MAX_EDGES)
+            source = "snapshot"
+        else:
+            subgraph = traverse(driver, node_id, direction, depth, max_nodes=GRAPH_MAX_NODES,
+                                max_edges=GRAPH_MAX_EDGES, timeout=GRAPH_TIMEOUT_SECONDS)
+            source = "cypher"
+        cached = (subgraph, edge_rows(subgraph), source)
+        traversal_cache.put(key, cached)
+    subgraph, rows, source = cached
+
+    end = offset + limit
+    return {
+        "results": rows[offset:end],
+        "next_offset": end if end < len(rows) else None,
+        "total_edges": len(rows),
+        "total_nodes": len(subgraph["nodes"]),
+        "depth": depth,
+        "depth_reached": subgraph["depth_reached"],
+        "truncated": subgraph["truncated"],
+        "source": source,
+    }
 
 @app.get("/search_assets")
-def search_assets(q: str = Query(..., min_length=3)):
-    with PG_CONN.cursor() as cur:
-        cur.execute("SELECT asset_id, asset_domain, asset_capability FROM assets WHERE asset_id ILIKE %s", (f"{q}%",))
+def search_assets(q: str = Query(..., min_length=3), limit: int = Query(20, ge=1, le=50)):
+    if AUTOCOMPLETE.ready():
+        return {"results": [
+            {"id": asset_id, "domain": info["domain"], "capability": info["capability"]}
+            for asset_id, info in AUTOCOMPLETE.search("assets", q, limit)
+        ]}
+
+    with PG_POOL.cursor() as cur:
+        cur.execute(
+            "SELECT asset_id, asset_domain, asset_capability FROM assets WHERE asset_id ILIKE %s "
+            "ORDER BY length(asset_id), lower(asset_id) LIMIT %s",
+            (f"{q}%", limit),
+        )
         result = cur.fetchall()
         matches = [{"id": row[0], "domain": row[1], "capability": row[2]} for row in result]
-        PG_CONN.commit()
     return {"results": matches}
 
 @app.get("/diagram_info")
 def get_diagram_info(node_id: str = Query(...)):
-    with PG_CONN.cursor() as cur:
+    with PG_POOL.cursor() as cur:
         cur.execute("SELECT asset_diagram_id FROM assets WHERE asset_id = %s", (node_id,))
         result = cur.fetchone()
         if not result:
@@ -1207,262 +1493,98 @@ def get_diagram_info(node_id: str = Query(...)):
 target_graph = get_target_planner_graph()
 pattern_graph = get_pattern_selector_graph()
 
-# Target Planner Stream #
-@app.post("/agent/target-planner/stream")
-def run_target_planner_stream(arch_name: str = Form(...)):
-    with PG_CONN.cursor() as cur:
-        cur.execute("SELECT diagram_mermaid_code FROM diagrams WHERE diagram_name = %s ORDER BY UPDATED_AT DESC",
-                    (arch_name,))
-        result = cur.fetchone()
-
-        if not result:
-            return JSONResponse(status_code=404, content={"error": "No diagram found with this name"})
-
-        mermaid_code = result[0]
-        target_goals = "Improve Modularity, Adopt Microservices, Enable CI/CD, Add Observability, Improve Security, Improve System Resilience"
-
-        def event_stream():
-            for event in target_graph.stream({
-                "mermaid_code": mermaid_code,
-                "target_goals": target_goals
-            }):
-                thoughts = event.get("thoughts", {})
-                for step, reasoning in thoughts.items():
-                    yield f"data: {json.dumps({'thinking': {'step': step, 'reasoning': reasoning}})}\n\n"
+# Step outputs are memoised per (step version, step input), so reopening an unchanged architecture replays instantly
+agent_memo = AgentMemo(
+    os.getenv("AGENT_MEMO_DB", "agent_memo.db"),
+    namespace=llm_providers.fingerprint("agent", GeminiLLM.model_name),
+    max_entries=int(os.getenv("AGENT_MEMO_MAX_ENTRIES", "5000")),
+    ttl_seconds=int(os.getenv("AGENT_MEMO_TTL_SECONDS", str(7 * 24 * 3600))),
+)
 
-                # Then stream actual results (excluding 'thoughts')
-                for k, v in event.items():
-                    if k != "thoughts":
-                        yield f"data: {json.dumps({k: v})}\n\n"
+TARGET_GOALS = "Improve Modularity, Adopt Microservices, Enable CI/CD, Add Observability, Improve Security, Improve System Resilience"
 
-        return StreamingResponse(event_stream(), media_type="text/event-stream")
 
-# Pattern Selector Stream #
-@app.post("/agent/pattern-selector/stream")
-def run_pattern_selector(arch_name: str = Form(...)):
-    with PG_CONN.cursor() as cur:
+def latest_mermaid_code(arch_name):
+    with PG_POOL.cursor() as cur:
         cur.execute("SELECT diagram_mermaid_code FROM diagrams WHERE diagram_name = %s ORDER BY UPDATED_AT DESC",
                     (arch_name,))
         result = cur.fetchone()
+    return result[0] if result else None
 
-        if not result:
-            return JSONResponse(status_code=404, content={"error": "No diagram found with this name"})
-
-        mermaid_code = result[0]
-
-        def event_stream():
-            for event in pattern_graph.stream({"mermaid_code": mermaid_code}):
-                # First stream reasoning (if present)
-                thoughts = event.get("thoughts", {})
-                for step, reasoning in thoughts.items():
-                    yield f"data: {json.dumps({'thinking': {'step': step, 'reasoning': reasoning}})}\n\n"
-
-                # Then stream actual results (excluding 'thoughts')
-                for k, v in event.items():
-                    if k != "thoughts":
-                        yield f"data: {json.dumps({k: v})}\n\n"
-
-        return StreamingResponse(event_stream(), media_type="text/event-stream")
-
-# --- Utilities --- #
 
-def clean_mermaid_code(raw: str) -> str:
-    lines = raw.strip().splitlines()
-    if lines[0].strip().startswith("```"):  # First line is ```mermaid or similar
-        lines = lines[1:]
-    if lines and lines[-1].strip().startswith("```"):  # Last line is ```
-        lines = lines[:-1]
-    return "\n".join(lines).strip()
+def agent_inputs(mermaid_code):
+    return {
+        "target_planner": (target_graph, {"mermaid_code": mermaid_code, "target_goals": TARGET_GOALS}),
+        "pattern_selector": (pattern_graph, {"mermaid_code": mermaid_code}),
+    }
 
-def clean_class_diagram(raw: str) -> str:
-    """
-    Cleans and extracts the class diagram code from the raw model output.
-    It specifically removes Markdown code fences (```classDiagram and ```)
-    and replaces non-breaking spaces with standard spaces.
-    Ensures 'classDiagram' is the very first line of the output.
-    """
-    lines = raw.strip().splitlines()
-    cleaned_lines = []
-    in_code_block = False
-
-    # Identify the start of the classDiagram code block.
-    # We look for "```classDiagram" or a generic "```mermaid".
-    # The actual "classDiagram" keyword should be the *first line* of the content.
-    start_delimiter_found = False
-
-    for line in lines:
-        stripped_line = line.strip()
-
-        if not in_code_block:
-            # Look for the start of the code block
-            if stripped_line.startswith("```classDiagram"):
-                in_code_block = True
-                start_delimiter_found = True
-                continue  # Skip the fence line
-            elif stripped_line.startswith("```mermaid"):  # Fallback for generic mermaid block
-                # If we detect generic 'mermaid' block, we'll try to find 'classDiagram' inside
-                in_code_block = True
-                continue  # Skip the fence line
-        else:
-            # We are inside a code block
-            if stripped_line == "```":
-                in_code_block = False
-                break  # Found the end of the code block, stop processing
-            else:
-                # Replace non-breaking spaces (\xa0) and ensure ASCII characters
-                clean_line = line.replace('\xa0', ' ').encode('ascii', 'ignore').decode('ascii')
-                cleaned_lines.append(clean_line)
-
-    final_output = "\n".join(cleaned_lines).strip()
-
-    # Ensure 'classDiagram' is the absolute first line of the mermaid content
-    if not final_output.startswith("classDiagram"):
-        # If the model didn't put it on the first line after the fence, add it.
-        # This handles cases where model might output something like:
-        # ```classDiagram
-        #    class MyClass { ... }
-        # where 'classDiagram' is part of the fence and not the first content line.
-        return f"classDiagram\n{final_output}"
-
-    return final_output
 
-
-def clean_data_model(raw: str) -> str:
+def agent_event_stream(agents, tag_agent=False, refresh=False):
     """
-    Cleans and extracts the ER diagram code from the raw model output.
-    It specifically removes Markdown code fences (```erDiagram and ```)
-    and replaces non-breaking spaces with standard spaces.
-    Ensures 'erDiagram' is the very first line of the output.
+    SSE for one or more agent graphs run concurrently (utilities.agent_runtime.stream_agents).
+    Node updates keep their original shape. While a node runs its LLM output is forwarded as
+    {"thinking": {step, delta}} (an empty delta as soon as it starts), and when it finishes it sends
+    {"metrics": {step, latency_ms, llm_calls, deduped, prompt_tokens, output_tokens, cached}}.
+    With tag_agent every payload carries "agent" so the client can tell the graphs apart.
+    refresh=True re-runs every step instead of replaying memoised outputs.
+    Closing it cancels the graphs and their in-flight LLM streams.
     """
-    lines = raw.strip().splitlines()
-    cleaned_lines = []
-    in_code_block = False
-
-    # Identify the start of the erDiagram code block.
-    start_delimiter_found = False
-
-    for line in lines:
-        stripped_line = line.strip()
-
-        if not in_code_block:
-            # Look for the start of the code block
-            if stripped_line.startswith("```erDiagram"):
-                in_code_block = True
-                start_delimiter_found = True
-                continue  # Skip the fence line
-            elif stripped_line.startswith("```mermaid"):  # Fallback for generic mermaid block
-                in_code_block = True
-                continue  # Skip the fence line
-        else:
-            # We are inside a code block
-            if stripped_line == "```":
-                in_code_block = False
-                break  # Found the end of the code block, stop processing
+    events = stream_agents(agents, AgentRun(memo=agent_memo, refresh=refresh))
+    try:
+        for agent, kind, payload in events:
+            tag = {"agent": agent} if tag_agent else {}
+            if kind == "delta":
+                yield f"data: {json.dumps({**tag, 'thinking': payload})}\n\n"
+            elif kind == "metrics":
+                yield f"data: {json.dumps({**tag, 'metrics': payload})}\n\n"
+            elif kind == "error":
+                yield f"data: {json.dumps({**tag, 'error': payload})}\n\n"
             else:
-                # Replace non-breaking spaces (\xa0) and ensure ASCII characters
-                clean_line = line.replace('\xa0', ' ').encode('ascii', 'ignore').decode('ascii')
-                cleaned_lines.append(clean_line)
-
-    final_output = "\n".join(cleaned_lines).strip()
-
-    # Ensure 'erDiagram' is the absolute first line of the mermaid content
-    if not final_output.startswith("erDiagram"):
-        return f"erDiagram\n{final_output}"
-
-    return final_output
-
-def extract_between(text, start, end):
-    return text.split(start, 1)[-1].split(end, 1)[0]
+                # First stream reasoning (if present)
+                thoughts = payload.get("thoughts", {})
+                for step, reasoning in thoughts.items():
+                    yield f"data: {json.dumps({**tag, 'thinking': {'step': step, 'reasoning': reasoning}})}\n\n"
 
+                # Then stream actual results (excluding 'thoughts')
+                for k, v in payload.items():
+                    if k != "thoughts":
+                        yield f"data: {json.dumps({**tag, k: v})}\n\n"
+    finally:
+        events.close()
 
-import re
 
-def parse_mermaid(mermaid_code):
-    nodes = []
-    edges = []
-    current_group = None
-
-    for line in mermaid_code.splitlines():
-        line = line.strip()
-
-        # Detect subgraph group
-        if line.lower().startswith("subgraph"):
-            match = re.match(r'subgraph\s+"?(.*?)"?$', line, re.IGNORECASE)
-            if match:
-                current_group = match.group(1).strip()
-
-        # Detect node definitions
-        elif "[" in line and "]" in line:
-            node_match = re.match(r'(\w+)\s*\[\s*(.*?)\s*\]', line)
-            if node_match:
-                node_id = node_match.group(1).strip()
-                label_text = node_match.group(2).strip()
-
-                # Remove system code from label if present, extract clean name
-                name = label_text.replace(node_id, "").strip()
-                display_name = f"{node_id}: {label_text}"
-
-                nodes.append({
-                    "id": node_id,
-                    "name": name,
-                    "display_name": display_name,
-                    "group": current_group or "Unknown"
-                })
+# Target Planner Stream #
+@app.post("/agent/target-planner/stream")
+def run_target_planner_stream(request: Request, arch_name: str = Form(...), refresh: bool = Form(False)):
+    mermaid_code = latest_mermaid_code(arch_name)
+    if not mermaid_code:
+        return JSONResponse(status_code=404, content={"error": "No diagram found with this name"})
 
-        # Detect edges
-        elif "-->" in line:
-            edge_match = re.match(r'(\w+)\s*-->\s*\|\s*(.*?)\s*\|\s*(\w+)', line)
-            if edge_match:
-                src = edge_match.group(1).strip()
-                label = edge_match.group(2).strip()
-                tgt = edge_match.group(3).strip()
-
-                # If label is empty or only spaces, default to 'UNKNOWN'
-                if not label:
-                    label = "UNKNOWN"
-
-                    # Normalize label for checking (case-insensitive)
-                    label_upper = label.upper()
-
-                    # Determine the correct base URL based on label
-                    if label_upper == "API":
-                        base_url = "https://www.api-stargaze-url.com"
-                    elif label_upper == "EVENT":
-                        base_url = "https://www.event-stargaze-url.com"
-                    else:
-                        base_url = "https://www.others-stargaze-url.com"
-
-                    # Build reflink
-                    reflink = f"{base_url}/{src}-{tgt}"
-
-                    edges.append({
-                        "source": src,
-                        "target": tgt,
-                        "label": label,
-                        "reflink": reflink
-                    })
-
-    return nodes, edges
-
-
-def store_graph(tx, diagram_id, nodes, edges):
-    for node in nodes:
-        tx.run(
-            """
-            MERGE (n:Node {id: $id, diagram_id: $diagram_id})
-            SET n.display_name = $display_name, n.name = $name, n.group = $group
-            """,
-            id=node["id"],
-            diagram_id=diagram_id,
-            display_name=node["display_name"],
-            name=node.get("name", ""),
-            group=node.get("group", "")
-        )
+    agents = {"target_planner": agent_inputs(mermaid_code)["target_planner"]}
+    return StreamingResponse(until_disconnected(request, agent_event_stream(agents, refresh=refresh)),
+                             media_type="text/event-stream")
 
-    for edge in edges:
-        tx.run(
-            f"MATCH (a:Node {{id: $src, diagram_id: $diagram_id}}), (b:Node {{id: $tgt, diagram_id: $diagram_id}}) "
-            f"MERGE (a)-[r:{edge['label'].upper()}]->(b)"
-            f"SET r.interface_type = $interface_type, r.reflink = $reflink",
-            src=edge["source"], tgt=edge["target"], diagram_id=diagram_id, interface_type=edge['label'].upper(), reflink=edge['reflink']
-        )
+# Pattern Selector Stream #
+@app.post("/agent/pattern-selector/stream")
+def run_pattern_selector(request: Request, arch_name: str = Form(...), refresh: bool = Form(False)):
+    mermaid_code = latest_mermaid_code(arch_name)
+    if not mermaid_code:
+        return JSONResponse(status_code=404, content={"error": "No diagram found with this name"})
+
+    agents = {"pattern_selector": agent_inputs(mermaid_code)["pattern_selector"]}
+    return StreamingResponse(until_disconnected(request, agent_event_stream(agents, refresh=refresh)),
+                             media_type="text/event-stream")
+
+# Both agents on the same diagram, run concurrently with identical prompts sent once #
+@app.post("/agent/analyze/stream")
+def run_agents_stream(request: Request, arch_name: str = Form(...), refresh: bool = Form(False)):
+    mermaid_code = latest_mermaid_code(arch_name)
+    if not mermaid_code:
+        return JSONResponse(status_code=404, content={"error": "No diagram found with this name"})
+
+    events = agent_event_stream(agent_inputs(mermaid_code), tag_agent=True, refresh=refresh)
+    return StreamingResponse(until_disconnected(request, events), media_type="text/event-stream")
+
+@app.get("/agent/memo_stats")
+def agent_memo_stats():
+    return agent_memo.stats()
@@ -1,15 +1,42 @@
+import hashlib
+import os
+
 import chromadb
+from chromadb.api.types import EmbeddingFunction
 from chromadb.utils import embedding_functions
 
-client = chromadb.HttpClient(host="localhost", port=8000)
-embedder = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+# CHROMA_CLIENT=ephemeral keeps the collections in process memory (benchmarks, offline runs)
+if os.getenv("CHROMA_CLIENT", "http").lower() == "ephemeral":
+    client = chromadb.EphemeralClient()
+else:
+    client = chromadb.HttpClient(host="localhost", port=8000)
+
+
+class HashEmbeddingFunction(EmbeddingFunction):
+    """Cheap deterministic 384-d vectors (the size all-MiniLM-L6-v2 produces), with no model to load."""
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            digest = hashlib.sha256(text.encode()).digest()
+            vectors.append([digest[i % 32] / 255.0 for i in range(384)])
+        return vectors
+
+
+# CHROMA_EMBEDDER=hash takes the embedding model out of benchmark runs; decided before anything
+# imports embedder, so the chat caches and retrieval get the same function
+if os.getenv("CHROMA_EMBEDDER", "sentence-transformer").lower() == "hash":
+    embedder = HashEmbeddingFunction()
+else:
+    embedder = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
 
-# Get/create collections
+# Get/create collections once; the handles are reused for every write
 diagram_collection = client.get_or_create_collection(name="architecture_diagrams", embedding_function=embedder)
 app_collection = client.get_or_create_collection(name="architecture_applications", embedding_function=embedder)
+complexity_collection = client.get_or_create_collection(name="architecture_complexity", embedding_function=embedder)
 
 
-def store_diagram_summary(diagram_id, diagram_name, summary, description, pros, cons):
+def diagram_document(diagram_id, diagram_name, summary, description, pros, cons):
     content = f"""Summary: {summary}
     Diagram Name: {diagram_name}
     Description: {description}
@@ -26,14 +53,10 @@ def store_diagram_summary(diagram_id, diagram_name, summary, description, pros,
         "type": "diagram"
     }
 
-    diagram_collection.add(
-        documents=[content],
-        metadatas=[metadata],
-        ids=[f"diagram_{diagram_id}"]
-    )
+    return f"diagram_{diagram_id}", content, metadata
 
 
-def store_application(app_data):
+def application_document(app_data):
     content = f"""Title: {app_data['title']}
 System Code: {app_data['system_code']}
 Group: {app_data['group']}
@@ -49,14 +72,10 @@ Relationships:
         "type": "application"
     }
 
-    app_collection.add(
-        documents=[content],
-        metadatas=[metadata],
-        ids=[f"app_{app_data['system_code']}_{app_data['diagram_id']}"]
-    )
+    return f"app_{app_data['system_code']}_{app_data['diagram_id']}", content, metadata
 
 
-def store_complexity_entry(diagram_id, diagram_name, component, complexity, reason):
+def complexity_document(diagram_id, diagram_name, component, complexity, reason):
     content = f"""Component: {component}
 Diagram Name: {diagram_name}
 Complexity: {complexity}
@@ -71,12 +90,86 @@ Reason: {reason}
         "type": "complexity"
     }
 
-    complexity_collection = client.get_or_create_collection(
-        name="architecture_complexity", embedding_function=embedder
-    )
+    return f"complexity_{diagram_id}_{component}", content, metadata
+
+
+def store_diagram_summary(diagram_id, diagram_name, summary, description, pros, cons):
+    doc_id, content, metadata = diagram_document(diagram_id, diagram_name, summary, description, pros, cons)
+    diagram_collection.add(documents=[content], metadatas=[metadata], ids=[doc_id])
+
+
+def store_application(app_data):
+    doc_id, content, metadata = application_document(app_data)
+    app_collection.add(documents=[content], metadatas=[metadata], ids=[doc_id])
+
+
+def store_complexity_entry(diagram_id, diagram_name, component, complexity, reason):
+    doc_id, content, metadata = complexity_document(diagram_id, diagram_name, component, complexity, reason)
+    complexity_collection.add(documents=[content], metadatas=[metadata], ids=[doc_id])
+
+
+def store_diagram_bundle(diagram, applications, complexity_rows):
+    """
+    Stores the diagram summary, its applications and its complexity rows in one go:
+    all documents are embedded in a single batched encode and each collection gets one add call.
+    diagram holds diagram_id, diagram_name, summary, description, pros and cons;
+    applications and complexity_rows are the parsed upload sections.
+    """
+    store_diagram_bundles([(diagram, applications, complexity_rows)])
+
 
-    complexity_collection.add(
-        documents=[content],
-        metadatas=[metadata],
-        ids=[f"complexity_{diagram_id}_{component}"]
-    )
\ No newline at end of file
+def store_diagram_bundles(bundles):
+    """Same as store_diagram_bundle for a list of (diagram, applications, complexity_rows), e.g. a bulk batch."""
+    batches = {
+        diagram_collection.name: (diagram_collection, []),
+        app_collection.name: (app_collection, []),
+        complexity_collection.name: (complexity_collection, []),
+    }
+    for diagram, applications, complexity_rows in bundles:
+        diagram_id = diagram["diagram_id"]
+        diagram_name = diagram["diagram_name"]
+        batches[diagram_collection.name][1].append(diagram_document(
+            diagram_id, diagram_name, diagram["summary"], diagram["description"], diagram["pros"], diagram["cons"]
+        ))
+        batches[app_collection.name][1].extend(
+            application_document({**app, "diagram_id": diagram_id, "diagram_name": diagram_name})
+            for app in applications
+        )
+        batches[complexity_collection.name][1].extend(
+            complexity_document(diagram_id, diagram_name, row["component"], row["complexity"], row["reason"])
+            for row in complexity_rows
+        )
+
+    # Chroma rejects duplicate ids within one add; keep the first like repeated single adds did
+    for name, (collection, docs) in batches.items():
+        unique = {}
+        for doc in docs:
+            unique.setdefault(doc[0], doc)
+        batches[name] = (collection, list(unique.values()))
+
+    texts = [content for _, docs in batches.values() for _, content, _ in docs]
+    embeddings = embedder(texts) if texts else []
+
+    offset = 0
+    for collection, docs in batches.values():
+        if not docs:
+            continue
+        collection.add(
+            ids=[doc_id for doc_id, _, _ in docs],
+            documents=[content for _, content, _ in docs],
+            metadatas=[metadata for _, _, metadata in docs],
+            embeddings=embeddings[offset:offset + len(docs)],
+        )
+        offset += len(docs)
+
+
+def delete_diagram_documents(diagram_id):
+    # Removes every document stored for a diagram (used to undo a failed upload)
+    delete_diagrams_documents([diagram_id])
+
+
+def delete_diagrams_documents(diagram_ids):
+    # Same for several diagrams at once (used to undo a failed bulk batch)
+    where = {"diagram_id": diagram_ids[0]} if len(diagram_ids) == 1 else {"diagram_id": {"$in": list(diagram_ids)}}
+    for collection in [diagram_collection, app_collection, complexity_collection]:
+        collection.delete(where=where)
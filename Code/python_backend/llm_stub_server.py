@@ -0,0 +1,166 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Gemini REST API (generateContent / streamGenerateContent with alt=sse) and
+# an OpenAI-compatible /v1/chat/completions (as served by llama.cpp and Ollama), with configurable
+# latency and transient failures for exercising utilities/llm_gateway.py and utilities/llm_providers.py.
+# Point the backend at it with GEMINI_BASE_URL=http://localhost:8089/v1beta
+# or LLM_DEFAULT_PROVIDER=local LOCAL_LLM_URL=http://localhost:8089/v1
+# Usage: python llm_stub_server.py --port 8089 --latency 0.5 --fail-rate 0.2
+
+PATH_RE = re.compile(r"^/v1beta/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$")
+OPENAI_PATH = "/v1/chat/completions"
+
+
+def prompt_text(body):
+    return "\n".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+
+
+def openai_prompt_text(body):
+    texts = []
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        else:
+            texts.extend(part.get("text", "") for part in content or [])
+    return "\n".join(texts)
+
+
+def response_chunk(text, usage=None):
+    chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+    if usage:
+        chunk["usageMetadata"] = usage
+    return chunk
+
+
+class StubState:
+    def __init__(self, latency=0.0, fail_rate=0.0, fail_status=429, chunks=8, respond=None, seed=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.chunks = chunks
+        self.respond = respond or (lambda model, prompt: f"Stub response from {model} for {len(prompt)} characters.")
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _sse(self, payloads):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for delay, payload in payloads:
+                time.sleep(delay)
+                self.wfile.write(f"data: {payload}\r\n\r\n".encode())
+                self.wfile.flush()
+            self.close_connection = True
+
+        def _pieces(self, text):
+            size = max(len(text) // state.chunks, 1)
+            return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+        def do_POST(self):
+            path = self.path.split("?", 1)[0]
+            match = PATH_RE.match(path)
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not match and path != OPENAI_PATH:
+                return self._json(404, {"error": {"code": 404, "message": "Not found"}})
+
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                fail = state.rng.random() < state.fail_rate
+                if fail:
+                    state.failures += 1
+            try:
+                if fail:
+                    return self._json(state.fail_status, {"error": {"code": state.fail_status, "message": "stub failure"}})
+
+                if not match:
+                    return self._openai(body)
+
+                prompt = prompt_text(body)
+                text = state.respond(match["model"], prompt)
+                usage = {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4}
+                if match["method"] == "generateContent":
+                    time.sleep(state.latency)
+                    return self._json(200, response_chunk(text, usage))
+
+                pieces = self._pieces(text)
+                self._sse(
+                    (state.latency / len(pieces), json.dumps(response_chunk(piece, usage if i == len(pieces) - 1 else None)))
+                    for i, piece in enumerate(pieces)
+                )
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+        def _openai(self, body):
+            prompt = openai_prompt_text(body)
+            text = state.respond(body.get("model", ""), prompt)
+            usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}
+            if not body.get("stream"):
+                time.sleep(state.latency)
+                return self._json(200, {"choices": [{"message": {"role": "assistant", "content": text}}], "usage": usage})
+
+            pieces = self._pieces(text)
+            chunks = [(state.latency / len(pieces), json.dumps({"choices": [{"delta": {"content": piece}}]}))
+                      for piece in pieces]
+            self._sse(chunks + [(0, json.dumps({"choices": [], "usage": usage})), (0, "[DONE]")])
+
+    return Handler
+
+
+def start_stub(port=0, **options):
+    """Starts the stub on a background thread; returns (server, state). server.server_port has the port."""
+    state = StubState(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--fail-status", type=int, default=429)
+    args = parser.parse_args()
+
+    server, _ = start_stub(args.port, latency=args.latency, fail_rate=args.fail_rate, fail_status=args.fail_status)
+    print(f"Gemini stub listening on http://127.0.0.1:{server.server_port}/v1beta")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ from bs4 import BeautifulSoup
 from fastapi.responses import StreamingResponse
 from agents.tp_with_decision import get_target_planner_graph
 from agents.ps_with_decision import get_pattern_selector_graph
+from utilities.section_parser import parse_output_text
 import json
 
 # Load API Key from .env
@@ -454,90 +455,17 @@ def bulk_upload_image():
 
             output_text = result["candidates"][0]["content"]["parts"][0]["text"]
 
-            # Example response chunks
-            sections = re.split(r"\*\*(.*?)\*\*", output_text)
-
-            # Parse Response
-            mermaid = ""
-            summary = ""
-            description = ""
-            applications = []
-            complexity_table = []
-            pros = []
-            cons = []
-            class_diagram = ""
-            data_model = ""
-
-            for i, section in enumerate(sections):
-                if section.strip().lower() == "mermaid":
-                    mermaid_code = sections[i + 1].strip()
-                    mermaid = clean_mermaid_code(mermaid_code)
-                    print('mermaid done')
-                elif section.strip().lower() == "summary":
-                    summary = sections[i + 1].strip()
-                    print('summary done')
-                elif section.strip().lower() == "description":
-                    description = sections[i + 1].strip()
-                    print('description done')
-                elif section.strip().lower() == "applications":
-                    apps_text = sections[i + 1].strip()
-                    app_blocks = re.split(r"-\s*Title:", apps_text)
-
-                    for block in app_blocks[1:]:
-                        lines = block.strip().split("\n")
-                        title = lines[0].strip()
-                        system_code = lines[1].replace("System Code:", "").strip()
-                        group = lines[2].replace("Group:", "").strip()
-                        relationships = [
-                            line.strip("- ").strip()
-                            for line in lines[4:]
-                            if line.strip().startswith("-")
-                        ]
-
-                        applications.append({
-                            "title": title,
-                            "system_code": system_code,
-                            "group": group,
-                            "relationships": relationships
-                        })
-                        print('application done')
-                elif "System Complexity Table" in section:
-                    table_text = sections[i + 1].strip()
-                    rows = table_text.splitlines()[2:]  # Skip header lines
-
-                    for row in rows:
-                        cols = [col.strip() for col in row.split("|") if col.strip()]
-                        if len(cols) == 3:
-                            complexity_table.append({
-                                "component": cols[0],
-                                "complexity": cols[1],
-                                "reason": cols[2]
-                            })
-                    print('complexity done')
-                elif section.strip().lower() == "pros":
-                    raw_pros = sections[i + 1].strip()
-                    pros = [
-                        line.lstrip("- ").strip()
-                        for line in raw_pros.splitlines()
-                        if line.strip().startswith("-")
-                    ]
-                    print('pros done')
-                elif section.strip().lower() == "cons":
-                    raw_cons = sections[i + 1].strip()
-                    cons = [
-                        line.lstrip("- ").strip()
-                        for line in raw_cons.splitlines()
-                        if line.strip().startswith("-")
-                    ]
-                    print('cons done')
-                elif section.strip().lower() == "class diagram (mermaid)":
-                    classdiagram = sections[i + 1].strip()
-                    class_diagram = clean_class_diagram(classdiagram)
-                    print('class diagram done')
-                elif section.strip().lower() == "data model (mermaid erd)":
-                    datamodel = sections[i + 1].strip()
-                    data_model = clean_data_model(datamodel)
-                    print('data model done')
+            parsed = parse_output_text(output_text)
+            mermaid = parsed["mermaid"]
+            summary = parsed["summary"]
+            description = parsed["description"]
+            applications = parsed["applications"]
+            complexity_table = parsed["complexity_table"]
+            pros = parsed["pros"]
+            cons = parsed["cons"]
+            class_diagram = parsed["class_diagram"]
+            data_model = parsed["data_model"]
+            print('parsing done')
 
             # Store Mermaid to PostgreSQL
             diagram_id = f"DIAGRAM_{str(uuid4())[:8]}"
@@ -0,0 +1,47 @@
+import argparse
+import os
+
+import psycopg2
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+from utilities import interface_rollup
+
+# Recomputes the (asset, interface_type) rollup behind /get_interface_type_counts.
+# Run with --from-graph after loading the :Application graph (load_neo4j_data.py) or cleaning Neo4j:
+# it reloads interface_edges from Neo4j first. The counts read domains from assets, so editing
+# them (load_pgsql_data.py) needs no rebuild.
+# Usage: python rebuild_interface_rollup.py [--from-graph]
+
+load_dotenv()
+
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password123")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--from-graph", action="store_true", help="reload interface_edges from Neo4j before rebuilding")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(host="localhost", dbname="postgres", user="postgres", password="mysecretpassword")
+    try:
+        with conn, conn.cursor() as cur:
+            interface_rollup.migrate(cur)
+            if args.from_graph:
+                driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+                try:
+                    print("edges loaded from Neo4j:", interface_rollup.sync_edges_from_graph(cur, driver))
+                finally:
+                    driver.close()
+            interface_rollup.rebuild_rollup(cur)
+            cur.execute("SELECT COUNT(*), COALESCE(SUM(edge_count), 0) FROM interface_rollup")
+            rows, edges = cur.fetchone()
+        print(f"Rollup rebuilt: {rows} (asset, interface_type) rows covering {edges} edges")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
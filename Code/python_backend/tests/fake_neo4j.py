@@ -0,0 +1,77 @@
+import re
+
+
+class FakeGraph:
+    """
+    In-memory stand-in for a Neo4j driver, answering the graph queries of utilities/ by their shape.
+    Node labels in a query's MATCH pattern are honoured, so a query that only matches :Node
+    finds nothing in an :Application graph, as it would on a server.
+    """
+
+    def __init__(self):
+        self.nodes = {}  # elementId -> (label, props)
+        self.rels = {}  # elementId -> (source, target, type, props)
+
+    def node(self, label, **props):
+        key = f"n{len(self.nodes)}"
+        self.nodes[key] = (label, props)
+        return key
+
+    def rel(self, source, target, rel_type, **props):
+        key = f"r{len(self.rels)}"
+        self.rels[key] = (source, target, rel_type, props)
+        return key
+
+    def session(self, **kwargs):
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _matches(self, text, var, key):
+        label = re.search(r"\(%s(?::(\w+))?" % var, text).group(1)
+        return label is None or self.graph.nodes[key][0] == label
+
+    def run(self, query, **params):
+        text = getattr(query, "text", query)
+        nodes, rels = self.graph.nodes, self.graph.rels
+
+        if "AS diagram_id" in text:  # interface_rollup.GRAPH_EDGES_QUERY
+            return [
+                {"diagram_id": nodes[a][1].get("diagram_id"), "source_id": nodes[a][1].get("id"),
+                 "target_id": nodes[b][1].get("id"), "interface_type": props["interface_type"]}
+                for a, b, _, props in rels.values()
+                if props.get("interface_type") is not None and self._matches(text, "a", a) and self._matches(text, "b", b)
+            ]
+        if "$node_id" in text:  # graph_traversal.START_QUERY
+            return [{"key": key, "props": props} for key, (_, props) in nodes.items()
+                    if props.get("id") == params["node_id"] and self._matches(text, "n", key)]
+        if "$frontier" in text:  # graph_traversal.EXPAND_QUERIES
+            out, inward = "]->" in text, "<-[" in text
+            records = []
+            for rel_key, (source, target, rel_type, props) in rels.items():
+                for a, b, forward in ((source, target, True), (target, source, False)):
+                    if a not in params["frontier"] or (out and not forward) or (inward and forward):
+                        continue
+                    if self._matches(text, "a", a) and self._matches(text, "b", b):
+                        records.append({"rel_key": rel_key, "rel_type": rel_type, "rel_props": props,
+                                        "source": source, "target": target, "key": b, "props": nodes[b][1]})
+            return records[:params["limit"]]
+        if "elementId(r) AS key" in text:  # graph_snapshot.EDGES_QUERY
+            return [{"key": key, "source": a, "target": b, "type": rel_type, "props": props}
+                    for key, (a, b, rel_type, props) in rels.items()
+                    if self._matches(text, "a", a) and self._matches(text, "b", b)]
+        if "elementId(n) AS key" in text:  # graph_snapshot.NODES_QUERY
+            return [{"key": key, "props": props} for key, (_, props) in nodes.items() if self._matches(text, "n", key)]
+        raise AssertionError(f"FakeGraph can't answer {text}")
@@ -0,0 +1,88 @@
+# Run from Code/python_backend: python -m pytest tests
+import threading
+import time
+
+from fake_neo4j import FakeGraph, FakeSession
+from utilities.graph_snapshot import GraphSnapshot
+from utilities.graph_traversal import traverse
+
+
+def application_graph():
+    graph = FakeGraph()
+    portal = graph.node("Application", id="APP001", name="Portal")
+    orders = graph.node("Application", id="APP002", name="Orders")
+    billing = graph.node("Application", id="APP003", name="Billing")
+    graph.rel(portal, orders, "REST")
+    graph.rel(orders, billing, "MQ")
+    graph.rel(portal, billing, "REST")
+    return graph
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_snapshot_answers_like_cypher_for_application_nodes():
+    graph = application_graph()
+    snapshot = GraphSnapshot(graph)
+    snapshot.load()
+    for direction in ("upstream", "downstream", "both"):
+        assert snapshot.traverse("APP002", direction, depth=2) == traverse(graph, "APP002", direction, depth=2)
+
+
+def test_nodes_outside_the_snapshot_are_not_contained():
+    snapshot = GraphSnapshot(application_graph(), label="Node")
+    snapshot.load()
+    assert snapshot.fresh()
+    assert not snapshot.contains("APP001")
+
+    snapshot = GraphSnapshot(application_graph())
+    snapshot.load()
+    assert snapshot.contains("APP001")
+    assert not snapshot.contains("APP404")
+
+
+class GatedGraph(FakeGraph):
+    """Holds the first background reload after it has read the nodes, until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.reading = threading.Event()
+        self.release = threading.Event()
+        self.gated = False
+
+    def session(self, **kwargs):
+        return GatedSession(self)
+
+
+class GatedSession(FakeSession):
+    def run(self, query, **params):
+        graph = self.graph
+        records = super().run(query, **params)
+        if "elementId(r) AS key" in query and graph.gated:
+            graph.gated = False
+            graph.reading.set()
+            graph.release.wait(5)
+        return records
+
+
+def test_change_during_a_reload_is_picked_up():
+    graph = GatedGraph()
+    graph.node("Application", id="APP001", name="Portal")
+    snapshot = GraphSnapshot(graph)
+    snapshot.load()
+
+    graph.gated = True
+    snapshot.mark_stale()  # first upload: reload starts and reads the nodes
+    assert graph.reading.wait(5)
+    graph.node("Application", id="APP002", name="Orders")
+    snapshot.mark_stale()  # second upload lands while that reload is still running
+    graph.release.set()
+
+    assert wait_for(lambda: snapshot.contains("APP002")), "the reload missed the second upload"
+    assert wait_for(snapshot.fresh)
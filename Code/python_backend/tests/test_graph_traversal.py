@@ -0,0 +1,57 @@
+# Run from Code/python_backend: python -m pytest tests
+import pytest
+
+from fake_neo4j import FakeGraph
+from utilities.graph_traversal import edge_rows, traverse
+
+
+@pytest.fixture
+def application_graph():
+    # Shaped like load_neo4j_data.py: :Application nodes, relationship type = interface
+    graph = FakeGraph()
+    portal = graph.node("Application", id="APP001", name="Portal")
+    orders = graph.node("Application", id="APP002", name="Orders")
+    billing = graph.node("Application", id="APP003", name="Billing")
+    ledger = graph.node("Application", id="APP004", name="Ledger")
+    graph.rel(portal, orders, "REST", reflink="https://wiki/portal-orders")
+    graph.rel(orders, billing, "MQ")
+    graph.rel(billing, ledger, "SFTP")
+    graph.rel(portal, billing, "REST")
+    return graph
+
+
+def names(subgraph):
+    return sorted(props["name"] for props in subgraph["nodes"].values())
+
+
+def test_downstream_of_an_application_node(application_graph):
+    subgraph = traverse(application_graph, "APP002", "downstream", depth=2)
+    assert names(subgraph) == ["Billing", "Ledger", "Orders"]
+    assert [edge["type"] for edge in subgraph["edges"].values()] == ["MQ", "SFTP"]
+    assert subgraph["depth_reached"] == 2
+
+
+def test_upstream_visits_each_node_and_edge_once(application_graph):
+    subgraph = traverse(application_graph, "APP003", "upstream", depth=3)
+    assert names(subgraph) == ["Billing", "Orders", "Portal"]
+    assert len(subgraph["edges"]) == 3
+
+
+def test_edge_rows_keep_the_reflink(application_graph):
+    rows = edge_rows(traverse(application_graph, "APP001", "both", depth=1))
+    reflinks = {(row["n"]["name"], row["m"]["name"]): row["r"][3]["reflink"] for row in rows}
+    assert reflinks == {("Portal", "Orders"): "https://wiki/portal-orders", ("Portal", "Billing"): None}
+
+
+def test_uploaded_diagram_nodes_are_traversed_too():
+    graph = FakeGraph()
+    gateway = graph.node("Node", id="GW", diagram_id="DIAGRAM_1", name="Gateway")
+    service = graph.node("Node", id="SVC", diagram_id="DIAGRAM_1", name="Service")
+    graph.rel(gateway, service, "HTTPS", interface_type="HTTPS")
+    assert names(traverse(graph, "GW", "downstream")) == ["Gateway", "Service"]
+
+
+def test_node_caps_truncate(application_graph):
+    subgraph = traverse(application_graph, "APP001", "downstream", depth=3, max_nodes=2)
+    assert len(subgraph["nodes"]) == 2
+    assert subgraph["truncated"] == "nodes"
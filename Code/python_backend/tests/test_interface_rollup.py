@@ -0,0 +1,91 @@
+# Run from Code/python_backend: python -m pytest tests
+import re
+import sqlite3
+
+import pytest
+
+from fake_neo4j import FakeGraph
+from utilities import interface_rollup
+
+
+class SqliteCursor:
+    """psycopg2-style cursor over SQLite, enough for the rollup rebuild and read statements."""
+
+    def __init__(self, conn):
+        self.cur = conn.cursor()
+
+    def execute(self, sql, params=()):
+        if "pg_advisory_xact_lock" in sql:
+            return
+        self.cur.execute(re.sub(r"%\((\w+)\)s", r":\1", sql).replace("%s", "?"), params)
+
+    def fetchone(self):
+        return self.cur.fetchone()
+
+    def fetchall(self):
+        return self.cur.fetchall()
+
+
+def execute_values(cur, sql, rows):
+    cur.cur.executemany(sql.replace("VALUES %s", f"VALUES ({', '.join('?' * len(rows[0]))})"), rows)
+
+
+@pytest.fixture
+def cur(monkeypatch):
+    monkeypatch.setattr(interface_rollup, "execute_values", execute_values)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE assets (asset_id TEXT PRIMARY KEY, asset_domain TEXT, asset_capability TEXT)")
+    conn.executemany("INSERT INTO assets VALUES (?, ?, ?)", [
+        ("APP001", "Sales", "CRM"),
+        ("APP002", "Finance", "Billing"),
+        ("APP003", "Finance", "Ledger"),
+    ])
+    cursor = SqliteCursor(conn)
+    interface_rollup.migrate(cursor)
+    yield cursor
+    conn.close()
+
+
+@pytest.fixture
+def application_graph():
+    # Shaped like load_neo4j_data.py: :Application nodes without a diagram_id
+    graph = FakeGraph()
+    crm = graph.node("Application", id="APP001", name="CRM")
+    billing = graph.node("Application", id="APP002", name="Billing")
+    ledger = graph.node("Application", id="APP003", name="Ledger")
+    graph.rel(crm, billing, "REST", interface_type="REST")
+    graph.rel(crm, ledger, "REST", interface_type="REST")
+    graph.rel(crm, ledger, "MQ", interface_type="MQ")
+    graph.rel(billing, ledger, "REST", interface_type="REST")
+    graph.rel(billing, ledger, "OWNS")
+    # The same CRM -> Billing edge drawn again in an uploaded diagram
+    crm_node = graph.node("Node", id="APP001", diagram_id="DIAGRAM_1")
+    billing_node = graph.node("Node", id="APP002", diagram_id="DIAGRAM_1")
+    graph.rel(crm_node, billing_node, "REST", interface_type="REST")
+    return graph
+
+
+def rebuild(cur, graph):
+    loaded = interface_rollup.sync_edges_from_graph(cur, graph)
+    interface_rollup.rebuild_rollup(cur)
+    return loaded
+
+
+def test_rebuild_counts_application_graph(cur, application_graph):
+    assert rebuild(cur, application_graph) == 5
+    assert interface_rollup.interface_counts(cur, "Sales", "CRM") == [{"MQ": 1}, {"REST": 2}]
+    assert interface_rollup.interface_counts(cur, "Finance", "Billing") == [{"REST": 1}]
+    assert interface_rollup.interface_counts(cur, "Finance", "Ledger") == []
+
+
+def test_application_edges_get_the_graph_diagram_id(cur, application_graph):
+    rebuild(cur, application_graph)
+    cur.execute("SELECT DISTINCT diagram_id FROM interface_edges ORDER BY diagram_id")
+    assert cur.fetchall() == [(interface_rollup.GRAPH_DIAGRAM_ID,), ("DIAGRAM_1",)]
+
+
+def test_domain_edits_apply_without_a_rebuild(cur, application_graph):
+    rebuild(cur, application_graph)
+    cur.execute("UPDATE assets SET asset_domain = 'Sales', asset_capability = 'CRM' WHERE asset_id = 'APP002'")
+    assert interface_rollup.interface_counts(cur, "Sales", "CRM") == [{"MQ": 1}, {"REST": 3}]
+    assert interface_rollup.interface_counts(cur, "Finance", "Billing") == []
@@ -0,0 +1,123 @@
+# Run from Code/python_backend: python -m pytest tests
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from utilities.llm_gateway import LLMGateway
+from utilities.sse import until_disconnected
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, lines, delay):
+        self.lines = lines
+        self.delay = delay
+        self.closed = False
+
+    def iter_lines(self, decode_unicode=True):
+        for line in self.lines:
+            time.sleep(self.delay)
+            yield line
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, chunks=5, delay=0.0):
+        self.lines = [f"data: {json.dumps({'candidates': [{'content': {'parts': [{'text': str(i)}]}}]})}"
+                      for i in range(chunks)]
+        self.delay = delay
+        self.responses = []
+
+    def post(self, url, **kwargs):
+        response = FakeResponse(self.lines, self.delay)
+        self.responses.append(response)
+        return response
+
+
+@pytest.fixture
+def gateway():
+    gateway = LLMGateway("key", max_concurrency=1)
+    gateway.session = FakeSession()
+    return gateway
+
+
+def in_flight(gateway):
+    return gateway.stats()["chat"]["in_flight"]
+
+
+def first_chunk_within(gateway, timeout=2):
+    """Starts another stream on a thread; with max_concurrency=1 it only gets going if the slot is free."""
+    got = []
+    thread = threading.Thread(target=lambda: got.append(next(gateway.stream("chat", "model", {}))), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return bool(got)
+
+
+def test_abandoned_stream_releases_its_slot(gateway):
+    chunks = gateway.stream("chat", "model", {})
+    next(chunks)
+    assert in_flight(gateway) == 1
+    chunks.close()
+    assert in_flight(gateway) == 0
+    assert gateway.session.responses[0].closed
+    assert first_chunk_within(gateway)
+
+
+class Request:
+    """Reports the client gone after `after` checks, like a Starlette Request."""
+
+    def __init__(self, after):
+        self.after = after
+
+    async def is_disconnected(self):
+        self.after -= 1
+        return self.after < 0
+
+
+# The tests keep a reference to the upstream generator, so only an explicit close (not garbage
+# collection) can release its slot while they check
+
+def test_disconnected_sse_client_releases_the_slot(gateway):
+    chunks = gateway.stream("chat", "model", {})
+
+    async def consume():
+        return [item async for item in until_disconnected(Request(after=2), chunks)]
+
+    assert len(asyncio.run(consume())) == 2
+    assert in_flight(gateway) == 0
+    assert first_chunk_within(gateway)
+
+
+def test_response_cancelled_mid_chunk_releases_the_slot():
+    gateway = LLMGateway("key", max_concurrency=1)
+    gateway.session = FakeSession(chunks=50, delay=0.05)
+    chunks = gateway.stream("chat", "model", {})
+
+    async def cancel_while_reading():
+        async def consume():
+            async for _ in until_disconnected(Request(after=100), chunks):
+                pass
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.12)  # the third chunk is being read on the worker thread
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.2)  # the deferred close runs once that chunk is in
+
+    asyncio.run(cancel_while_reading())
+    assert in_flight(gateway) == 0
+    assert gateway.session.responses[0].closed
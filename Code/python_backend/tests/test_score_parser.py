@@ -0,0 +1,50 @@
+# Run from Code/python_backend: python -m pytest tests
+from utilities.score_parser import extract_score
+
+
+def assessment(body, reasoning="The diagram shows a gateway, three services and a shared database."):
+    return f"### Reasoning\n{reasoning}\n### Assessment (Score and Brief explanation)\n{body}"
+
+
+def test_overall_sentence_with_rating_uses_labelled_score():
+    assert extract_score("Overall, the architecture scores 4 out of 5 on security. Score: 82") == 82
+
+
+def test_digits_after_overall_are_not_a_score():
+    assert extract_score("The overall architecture is 2-tier. Score 90") == 90
+
+
+def test_out_of_ten_is_scaled():
+    assert extract_score("Alignment Score: 8.5/10") == 85
+
+
+def test_out_of_hundred():
+    assert extract_score("Score: 64/100 - modular, but no CI/CD") == 64
+
+
+def test_stated_range_is_skipped():
+    assert extract_score(assessment("Score (0-100): 75. Good modularity, weak observability.")) == 75
+
+
+def test_overall_score_wins_over_goal_scores():
+    body = "- Improve Modularity score: 60\n- Enable CI/CD score: 30\n- Overall score: 55"
+    assert extract_score(assessment(body)) == 55
+
+
+def test_goal_fractions_are_averaged():
+    body = "* **Improve Modularity (80/100):** clear boundaries\n* **Add Observability (6/10):** basic logging only"
+    assert extract_score(assessment(body)) == 70
+
+
+def test_only_the_assessment_section_is_read():
+    text = assessment("Score: 40 - monolith", reasoning="A microservice design would score 95.")
+    assert extract_score(text) == 40
+
+
+def test_percentages():
+    assert extract_score(assessment("Meets about 78% of the goals.")) == 78
+
+
+def test_no_score_means_full_planning():
+    assert extract_score(assessment("Not enough detail to assess.")) == 0
+    assert extract_score(None) == 0
@@ -0,0 +1,67 @@
+# Run from Code/python_backend: python -m pytest tests
+import threading
+import time
+
+import pytest
+
+from utilities.store_fanout import FanOut, FanOutError, StoreWriter
+
+
+class Store:
+    def __init__(self, name, fail=False, delay=0.0):
+        self.name = name
+        self.fail = fail
+        self.delay = delay
+        self.written = threading.Event()
+        self.rolled_back = False
+
+    def write(self):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        self.written.set()
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def writer(self, timeout=5):
+        return StoreWriter(self.name, self.write, self.rollback, timeout=timeout)
+
+
+def test_a_started_write_runs_before_join():
+    neo4j, postgres = Store("neo4j"), Store("postgres")
+    stores = FanOut()
+    stores.start(neo4j.writer())
+    # e.g. the mermaid section is in, the rest of the response is still streaming
+    assert neo4j.written.wait(2)
+    stores.start(postgres.writer())
+    assert set(stores.join()) == {"neo4j", "postgres"}
+
+
+def test_a_failed_write_compensates_every_store():
+    neo4j, postgres = Store("neo4j"), Store("postgres", fail=True)
+    stores = FanOut(context={"diagram_id": "DIAGRAM_1"})
+    stores.start(neo4j.writer())
+    stores.start(postgres.writer())
+    with pytest.raises(FanOutError) as e:
+        stores.join()
+    assert e.value.failures == {"postgres": "postgres is down"}
+    assert neo4j.rolled_back and postgres.rolled_back
+
+
+def test_abort_undoes_writes_started_before_the_input_failed():
+    neo4j = Store("neo4j")
+    stores = FanOut()
+    stores.start(neo4j.writer())
+    assert neo4j.written.wait(2)
+    assert [record["status"] for record in stores.abort()] == ["rolled_back"]
+    assert neo4j.rolled_back
+
+
+def test_the_timeout_runs_from_each_writes_own_start():
+    early, late = Store("neo4j"), Store("postgres", delay=0.2)
+    stores = FanOut()
+    stores.start(early.writer(timeout=0.3))
+    time.sleep(0.4)  # longer than either timeout, but the early write has long finished
+    stores.start(late.writer(timeout=0.3))
+    assert set(stores.join()) == {"neo4j", "postgres"}
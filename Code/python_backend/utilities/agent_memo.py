@@ -0,0 +1,117 @@
+import hashlib
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from utilities.response_cache import prompt_version
+
+
+def step_version(fn, *parts):
+    """Version of a graph step: changes whenever the step's code (and so its prompt) changes."""
+    try:
+        source = inspect.getsource(fn)
+    except (OSError, TypeError):
+        source = getattr(fn, "__qualname__", repr(fn))
+    return prompt_version(f"{fn.__module__}.{fn.__qualname__}", source, *parts)
+
+
+def input_hash(state):
+    """Hash of the state a step sees, ignoring the reasoning text of earlier steps."""
+    data = state.model_dump() if hasattr(state, "model_dump") else dict(state)
+    data.pop("thoughts", None)
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class AgentMemo:
+    """
+    Persistent memo of agent step outputs in a local SQLite file, keyed by step version + input hash,
+    so an unchanged diagram replays its reasoning without calling the LLM. namespace (e.g. the
+    model name) is part of every key. Entries expire after ttl_seconds; beyond max_entries the
+    least recently used are evicted.
+    """
+
+    def __init__(self, db_path, namespace="", max_entries=5000, ttl_seconds=7 * 24 * 3600):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._lock, self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS agent_steps (
+                    memo_key TEXT PRIMARY KEY,
+                    step TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_agent_steps_last_access ON agent_steps (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        # Commits (or rolls back) like sqlite3's own context manager, then closes the connection
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def key(self, version, state):
+        return f"{self.namespace}:{version}:{input_hash(state)}"
+
+    def get(self, memo_key):
+        """Returns (found, output)."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT output, created_at FROM agent_steps WHERE memo_key = ?", (memo_key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return False, None
+            conn.execute("UPDATE agent_steps SET last_access = ? WHERE memo_key = ?", (now, memo_key))
+            self.hits += 1
+            return True, json.loads(row[0])
+
+    def put(self, memo_key, step, output):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO agent_steps (memo_key, step, output, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (memo_key, step, json.dumps(output), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM agent_steps WHERE created_at < ?", (now - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM agent_steps WHERE memo_key IN "
+            "(SELECT memo_key FROM agent_steps ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM agent_steps")
+
+    def stats(self):
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM agent_steps").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
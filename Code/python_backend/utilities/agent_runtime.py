@@ -0,0 +1,181 @@
+import contextvars
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from utilities.agent_memo import step_version
+
+# Execution layer for the LangGraph agents. One AgentRun spans an HTTP request: every agent
+# graph in it runs on its own thread, identical prompts are sent to the LLM once (single
+# flight), each node reports latency and token usage as it finishes, and with a memo store
+# (utilities.agent_memo) unchanged steps replay their stored output.
+
+_run = contextvars.ContextVar("agent_run", default=None)
+_node_usage = contextvars.ContextVar("agent_node_usage", default=None)
+_node_metrics = contextvars.ContextVar("agent_node_metrics", default=None)
+_node_step = contextvars.ContextVar("agent_node_step", default=None)
+_deltas = contextvars.ContextVar("agent_deltas", default=None)
+
+_DONE = object()
+
+
+class AgentCancelled(Exception):
+    """Raised inside a graph when its request went away (e.g. the SSE client disconnected)."""
+
+
+class AgentRun:
+    def __init__(self, memo=None, refresh=False):
+        self.memo = memo
+        self.refresh = refresh  # skip memo lookups, but still store the new outputs
+        self.cancelled = False
+        self._prompts = {}  # prompt hash -> Future[(text, usage)]
+        self._lock = threading.Lock()
+
+    def call(self, prompt, generate):
+        """Returns (text, usage, deduped); concurrent and repeated identical prompts share one call."""
+        if self.cancelled:
+            raise AgentCancelled()
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            future = self._prompts.get(key)
+            owner = future is None
+            if owner:
+                future = self._prompts[key] = Future()
+        if not owner:
+            text, usage = future.result()
+            return text, usage, True
+        try:
+            result = generate(prompt)
+        except BaseException as e:
+            future.set_exception(e)
+            with self._lock:
+                self._prompts.pop(key, None)  # let a later caller retry
+            raise
+        future.set_result(result)
+        return result[0], result[1], False
+
+
+def current_step():
+    """Name of the instrumented step running in this context, if any."""
+    return _node_step.get()
+
+
+def call_llm(prompt, generate, generate_streaming=None):
+    """
+    Entry point used by the LLM wrappers. generate(prompt) -> (text, usage dict with
+    prompt_tokens/output_tokens). Outside an AgentRun this just calls generate.
+    generate_streaming(prompt, on_delta) returns the same but reports text chunks as they
+    arrive; it is used when a stream is listening for the current step's tokens.
+    """
+    sink, step = _deltas.get(), _node_step.get()
+    if generate_streaming and sink and step:
+        generate = lambda p: generate_streaming(p, lambda text: sink(step, text))
+
+    run = _run.get()
+    if run is None:
+        text, usage = generate(prompt)
+        deduped = False
+    else:
+        text, usage, deduped = run.call(prompt, generate)
+
+    totals = _node_usage.get()
+    if totals is not None:
+        totals["llm_calls"] += 1
+        totals["deduped"] += int(deduped)
+        if not deduped:
+            totals["prompt_tokens"] += usage.get("prompt_tokens") or 0
+            totals["output_tokens"] += usage.get("output_tokens") or 0
+    return text
+
+
+def instrumented(step, fn):
+    """
+    Wraps a graph node (or router) so its latency and LLM usage are reported as a metrics event,
+    and its output is memoised when the run has a memo store.
+    """
+    version = step_version(fn)
+
+    def wrapper(state):
+        totals = {"llm_calls": 0, "deduped": 0, "prompt_tokens": 0, "output_tokens": 0, "cached": False}
+        token = _node_usage.set(totals)
+        step_token = _node_step.set(step)
+        start = time.perf_counter()
+        sink = _deltas.get()
+        if sink:
+            sink(step, "")  # step started
+        try:
+            run = _run.get()
+            memo = run.memo if run else None
+            memo_key = memo.key(version, state) if memo else None
+            if memo and not run.refresh:
+                found, output = memo.get(memo_key)
+                if found:
+                    totals["cached"] = True
+                    return output
+            output = fn(state)
+            if memo:
+                memo.put(memo_key, step, output)
+            return output
+        finally:
+            _node_usage.reset(token)
+            _node_step.reset(step_token)
+            metrics = _node_metrics.get()
+            if metrics is not None:
+                metrics.append({"step": step, "latency_ms": round(1000 * (time.perf_counter() - start), 1), **totals})
+    wrapper.__name__ = getattr(fn, "__name__", step)
+    return wrapper
+
+
+def stream_agents(agents, run=None):
+    """
+    Runs several compiled graphs concurrently and yields (agent, kind, payload) as events arrive:
+    kind "event" carries a graph.stream() update, "delta" {step, delta} LLM text as it is
+    generated (an empty delta when a step starts), "metrics" a finished node's metrics and
+    "error" an exception message. agents = {name: (graph, input)}. Closing the generator
+    cancels the graphs' remaining LLM calls.
+    """
+    run = run or AgentRun()
+    events = queue.Queue()
+
+    def worker(name, graph, graph_input):
+        _run.set(run)
+        metrics = []
+        _node_metrics.set(metrics)
+
+        def on_delta(step, text):
+            # Raising here stops the LLM stream in progress, releasing its gateway slot
+            if run.cancelled:
+                raise AgentCancelled()
+            events.put((name, "delta", {"step": step, "delta": text}))
+
+        _deltas.set(on_delta)
+        try:
+            for event in graph.stream(graph_input):
+                while metrics:
+                    events.put((name, "metrics", metrics.pop(0)))
+                events.put((name, "event", event))
+            while metrics:
+                events.put((name, "metrics", metrics.pop(0)))
+        except AgentCancelled:
+            pass
+        except Exception as e:
+            events.put((name, "error", str(e)))
+        finally:
+            events.put((name, _DONE, None))
+
+    for name, (graph, graph_input) in agents.items():
+        # Fresh context per thread; LangGraph copies it into the threads it runs nodes on
+        threading.Thread(target=contextvars.Context().run, args=(worker, name, graph, graph_input), daemon=True).start()
+
+    pending = len(agents)
+    try:
+        while pending:
+            name, kind, payload = events.get()
+            if kind is _DONE:
+                pending -= 1
+                continue
+            yield name, kind, payload
+    finally:
+        run.cancelled = True
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import OrderedDict
+
+from psycopg2.extras import Json, execute_values
+
+# Parsed artefacts are stored once at upload time, so the architecture view is a single lookup
+ARCH_VIEW_MIGRATION = [
+    """
+    CREATE TABLE IF NOT EXISTS diagram_artifacts (
+        diagram_id TEXT PRIMARY KEY,
+        diagram_name TEXT NOT NULL,
+        summary TEXT,
+        description TEXT,
+        pros JSONB NOT NULL DEFAULT '[]',
+        cons JSONB NOT NULL DEFAULT '[]',
+        complexity_table JSONB NOT NULL DEFAULT '[]',
+        nodes JSONB NOT NULL DEFAULT '[]',
+        edges JSONB NOT NULL DEFAULT '[]',
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_diagrams_name_updated ON diagrams (diagram_name, updated_at DESC)",
+]
+
+ARTIFACT_FIELDS = ["summary", "description", "pros", "cons", "complexity_table", "nodes", "edges"]
+
+VIEW_QUERY = """
+SELECT d.diagram_id, d.diagram_mermaid_code, d.diagram_class_code, d.diagram_data_model,
+       a.diagram_id IS NOT NULL, a.summary, a.description, a.pros, a.cons, a.complexity_table, a.nodes, a.edges
+FROM diagrams d
+LEFT JOIN diagram_artifacts a ON a.diagram_id = d.diagram_id
+WHERE d.diagram_name = %s
+ORDER BY d.updated_at DESC
+LIMIT 1
+"""
+
+
+ARTIFACTS_UPSERT = """
+INSERT INTO diagram_artifacts
+    (diagram_id, diagram_name, summary, description, pros, cons, complexity_table, nodes, edges)
+VALUES %s
+ON CONFLICT (diagram_id) DO UPDATE SET
+    diagram_name = EXCLUDED.diagram_name, summary = EXCLUDED.summary, description = EXCLUDED.description,
+    pros = EXCLUDED.pros, cons = EXCLUDED.cons, complexity_table = EXCLUDED.complexity_table,
+    nodes = EXCLUDED.nodes, edges = EXCLUDED.edges
+"""
+
+
+def save_artifacts(cur, diagram_id, diagram_name, artifacts):
+    """Stores the parsed sections for a diagram; runs inside the caller's upload transaction."""
+    save_artifacts_many(cur, [(diagram_id, diagram_name, artifacts)])
+
+
+def save_artifacts_many(cur, rows):
+    """Stores [(diagram_id, diagram_name, artifacts)] in one statement (bulk ingestion batches)."""
+    execute_values(cur, ARTIFACTS_UPSERT, [
+        (
+            diagram_id, diagram_name, artifacts.get("summary", ""), artifacts.get("description", ""),
+            Json(artifacts.get("pros", [])), Json(artifacts.get("cons", [])),
+            Json(artifacts.get("complexity_table", [])), Json(artifacts.get("nodes", [])),
+            Json(artifacts.get("edges", [])),
+        )
+        for diagram_id, diagram_name, artifacts in rows
+    ])
+
+
+class ArchViewStore:
+    """
+    Read path for /get_arch_code with a read-through LRU cache keyed by (diagram name, diagram_id).
+    The latest diagram_id per name is remembered for version_ttl seconds (uploads in this worker
+    update it immediately), so a cached view is served without touching Postgres.
+    legacy_view(arch_name, row) rebuilds views for diagrams uploaded before artefacts were stored;
+    the result is written back so that only happens once per diagram.
+    """
+
+    def __init__(self, pg_pool, legacy_view=None, max_entries=256, version_ttl=30):
+        self.pg_pool = pg_pool
+        self.legacy_view = legacy_view
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self._views = OrderedDict()  # (arch_name, diagram_id) -> view
+        self._versions = {}  # arch_name -> (diagram_id, checked_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.backfilled = 0
+
+    def migrate(self):
+        with self.pg_pool.cursor() as cur:
+            for statement in ARCH_VIEW_MIGRATION:
+                cur.execute(statement)
+
+    def _cached(self, arch_name):
+        with self._lock:
+            version = self._versions.get(arch_name)
+            if not version or time.time() - version[1] > self.version_ttl:
+                return None
+            view = self._views.get((arch_name, version[0]))
+            if view is not None:
+                self._views.move_to_end((arch_name, version[0]))
+            return view
+
+    def _remember(self, arch_name, diagram_id, view):
+        with self._lock:
+            self._versions[arch_name] = (diagram_id, time.time())
+            self._views[(arch_name, diagram_id)] = view
+            self._views.move_to_end((arch_name, diagram_id))
+            while len(self._views) > self.max_entries:
+                self._views.popitem(last=False)
+
+    def get(self, arch_name):
+        """Returns the architecture view dict, or None when no diagram has this name."""
+        view = self._cached(arch_name)
+        if view is not None:
+            self.hits += 1
+            return view
+        self.misses += 1
+
+        with self.pg_pool.cursor() as cur:
+            cur.execute(VIEW_QUERY, (arch_name,))
+            row = cur.fetchone()
+        if not row:
+            return None
+
+        diagram_id, mermaid_code, class_diagram, data_model, stored = row[:5]
+        if stored:
+            artifacts = dict(zip(ARTIFACT_FIELDS, row[5:]))
+        else:
+            artifacts = self.legacy_view(arch_name, mermaid_code)
+            with self.pg_pool.cursor() as cur:
+                save_artifacts(cur, diagram_id, arch_name, artifacts)
+            self.backfilled += 1
+
+        view = {
+            "arch_name": arch_name,
+            "mermaid_code": mermaid_code,
+            "summary": artifacts["summary"],
+            "description": artifacts["description"],
+            "nodes": artifacts["nodes"],
+            "edges": artifacts["edges"],
+            "complexity_table": artifacts["complexity_table"],
+            "pros": artifacts["pros"],
+            "cons": artifacts["cons"],
+            "class_diagram": class_diagram,
+            "data_model": data_model
+        }
+        self._remember(arch_name, diagram_id, view)
+        return view
+
+    def on_upload(self, arch_name, diagram_id):
+        """Called after an upload commits; the next read for arch_name loads the new version."""
+        with self._lock:
+            self._versions[arch_name] = (diagram_id, time.time())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._views),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "backfilled": self.backfilled,
+        }
@@ -0,0 +1,141 @@
+import bisect
+import threading
+import time
+import traceback
+
+# Trigram indexes so the ILIKE 'q%' fallback queries don't sequentially scan assets/diagrams
+AUTOCOMPLETE_MIGRATION = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_diagrams_name_trgm ON diagrams USING gin (diagram_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_assets_id_trgm ON assets USING gin (asset_id gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_assets_domain_trgm ON assets USING gin (asset_domain gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_assets_capability_trgm ON assets USING gin (asset_capability gin_trgm_ops)",
+]
+
+
+class _TrieNode:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.top = []  # best-ranked keys below this node, kept sorted by rank
+
+
+class PrefixIndex:
+    """
+    Case-insensitive prefix trie of distinct names.
+    Every node keeps the top_k best-ranked names beneath it (shortest first, then
+    alphabetical), so a lookup costs O(len(prefix) + limit) regardless of corpus size.
+    """
+
+    def __init__(self, top_k=50):
+        self.top_k = top_k
+        self._root = _TrieNode()
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _rank(key):
+        return (len(key), key.lower(), key)
+
+    def _insert(self, root, key):
+        rank = self._rank(key)
+        node = root
+        for depth in range(len(key) + 1):
+            if depth:
+                node = node.children.setdefault(key[depth - 1].lower(), _TrieNode())
+            if len(node.top) < self.top_k or rank < self._rank(node.top[-1]):
+                bisect.insort(node.top, key, key=self._rank)
+                del node.top[self.top_k:]
+
+    def add(self, key, payload=None):
+        if not key:
+            return
+        with self._lock:
+            if key not in self._payloads:
+                self._insert(self._root, key)
+            self._payloads[key] = payload
+
+    def rebuild(self, items):
+        """Replaces the whole index with items [(key, payload)], swapping it in atomically."""
+        root, payloads = _TrieNode(), {}
+        for key, payload in items:
+            if key and key not in payloads:
+                self._insert(root, key)
+            if key:
+                payloads[key] = payload
+        with self._lock:
+            self._root, self._payloads = root, payloads
+
+    def search(self, prefix, limit=20):
+        node = self._root
+        for ch in prefix.lower():
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return [(key, self._payloads.get(key)) for key in node.top[:limit]]
+
+    def __len__(self):
+        return len(self._payloads)
+
+
+class AutocompleteService:
+    """Prefix indexes behind the autocomplete endpoints, loaded from Postgres and refreshed on upload."""
+
+    LOADERS = {
+        "arch_names": "SELECT DISTINCT diagram_name FROM diagrams WHERE diagram_name IS NOT NULL",
+        "domains": "SELECT DISTINCT asset_domain FROM assets WHERE asset_domain IS NOT NULL",
+        "capabilities": "SELECT DISTINCT asset_capability FROM assets WHERE asset_capability IS NOT NULL",
+        "assets": "SELECT asset_id, asset_domain, asset_capability FROM assets",
+    }
+
+    def __init__(self, pg_pool, refresh_seconds=300, top_k=50):
+        self.pg_pool = pg_pool
+        self.refresh_seconds = refresh_seconds
+        self.indexes = {name: PrefixIndex(top_k) for name in self.LOADERS}
+        self.loaded_at = None
+        self._refreshing = threading.Lock()
+
+    def migrate(self):
+        with self.pg_pool.cursor() as cur:
+            for statement in AUTOCOMPLETE_MIGRATION:
+                cur.execute(statement)
+
+    def load(self):
+        with self.pg_pool.cursor() as cur:
+            for name, query in self.LOADERS.items():
+                cur.execute(query)
+                rows = cur.fetchall()
+                if name == "assets":
+                    items = [(row[0], {"domain": row[1], "capability": row[2]}) for row in rows]
+                else:
+                    items = [(row[0], None) for row in rows]
+                self.indexes[name].rebuild(items)
+        self.loaded_at = time.time()
+
+    def _refresh(self):
+        try:
+            self.load()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._refreshing.release()
+
+    def ready(self):
+        """True once loaded; kicks off a background reload when the snapshot is older than refresh_seconds."""
+        if self.loaded_at and time.time() - self.loaded_at > self.refresh_seconds:
+            if self._refreshing.acquire(blocking=False):
+                threading.Thread(target=self._refresh, daemon=True).start()
+        return self.loaded_at is not None
+
+    def search(self, name, prefix, limit=20):
+        return self.indexes[name].search(prefix, limit)
+
+    def on_upload(self, diagram_name, asset_id, domain=None, capability=None):
+        """Incrementally adds what an upload just committed."""
+        self.indexes["arch_names"].add(diagram_name)
+        self.indexes["assets"].add(asset_id, {"domain": domain, "capability": capability})
+        if domain:
+            self.indexes["domains"].add(domain)
+        if capability:
+            self.indexes["capabilities"].add(capability)
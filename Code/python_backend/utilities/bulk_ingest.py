@@ -0,0 +1,267 @@
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from uuid import uuid4
+
+from utilities.mermaid_parser import parse_mermaid
+from utilities.section_parser import parse_output_text
+
+# Bulk ingestion: responses are obtained on an extraction thread pool (cached response files are
+# just read, images go through the upload extraction), parsed on a process pool, and written to the
+# stores in batches on a writer thread pool. Finished and failed items are checkpointed per run,
+# so an interrupted run resumes where it stopped and one bad diagram never aborts the rest.
+# Parse workers are spawned rather than forked (the server process has live threads and connection
+# pools); this module stays light so they don't import the backend.
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+ASSET_RE = re.compile(r"APP\d+", re.IGNORECASE)
+
+DONE = "done"
+FAILED = "failed"
+
+
+def within(root, path):
+    """True if path resolves (following symlinks) to root or somewhere below it."""
+    root = os.path.realpath(root)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+
+def discover(source, root=None):
+    """
+    Items to ingest from a directory or a manifest. A manifest is a JSON list or JSONL file of
+    {"diagram_name", "asset_id", "image", "response"} (paths relative to the manifest; one of image
+    or response is required). In a directory, images and .json responses are paired by file stem;
+    the stem is the diagram name and an APPnnn in it the asset id.
+    With root, the source and every file it refers to must resolve under root.
+    """
+    source = os.path.abspath(source)
+    if root and not within(root, source):
+        raise ValueError(f"{source} is outside {root}")
+    if os.path.isdir(source):
+        by_stem = {}
+        for filename in sorted(os.listdir(source)):
+            stem, ext = os.path.splitext(filename)
+            ext = ext.lower()
+            if ext in IMAGE_EXTENSIONS:
+                by_stem.setdefault(stem, {})["image"] = os.path.join(source, filename)
+            elif ext == ".json":
+                by_stem.setdefault(stem, {})["response"] = os.path.join(source, filename)
+        entries = []
+        for stem, paths in by_stem.items():
+            asset = ASSET_RE.search(stem)
+            entries.append({"diagram_name": stem, "asset_id": asset.group(0).upper() if asset else "", **paths})
+        base = source
+    else:
+        with open(source, "r") as f:
+            if source.endswith(".jsonl"):
+                entries = [json.loads(line) for line in f if line.strip()]
+            else:
+                entries = json.load(f)
+        base = os.path.dirname(source)
+
+    items = []
+    for entry in entries:
+        item = {"diagram_name": entry["diagram_name"], "asset_id": entry.get("asset_id", "")}
+        for field in ("image", "response"):
+            if entry.get(field):
+                item[field] = os.path.join(base, entry[field])
+        if "image" not in item and "response" not in item:
+            raise ValueError(f"Manifest entry for {entry['diagram_name']} has neither image nor response")
+        if root and not all(within(root, item[field]) for field in ("image", "response") if field in item):
+            raise ValueError(f"Manifest entry for {entry['diagram_name']} refers to files outside {root}")
+        item["key"] = os.path.relpath(item.get("response") or item["image"], base) + "|" + item["diagram_name"]
+        items.append(item)
+    return items
+
+
+def read_response(path):
+    """Response text from a saved Gemini response (.json with candidates) or a plain text file."""
+    with open(path, "r") as f:
+        if not path.endswith(".json"):
+            return f.read()
+        result = json.load(f)
+    if "candidates" not in result:
+        raise ValueError(f"{path} holds no candidates: {str(result)[:200]}")
+    return result["candidates"][0]["content"]["parts"][0]["text"]
+
+
+def parse_response(text):
+    """Runs in the parse process pool: parsed sections plus the mermaid nodes and edges."""
+    parsed = parse_output_text(text)
+    nodes, edges = parse_mermaid(parsed["mermaid"])
+    return parsed, nodes, edges
+
+
+class BulkCheckpoint:
+    """Per-run item status in a local SQLite file."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._lock, self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bulk_items (
+                    run_id TEXT NOT NULL,
+                    item_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    diagram_id TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, item_key)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        # Commits (or rolls back) like sqlite3's own context manager, then closes the connection
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def done_keys(self, run_id):
+        with self._lock, self._connect() as conn:
+            rows = conn.execute("SELECT item_key FROM bulk_items WHERE run_id = ? AND status = ?", (run_id, DONE))
+            return {row[0] for row in rows}
+
+    def mark(self, run_id, rows):
+        """rows: (item_key, status, diagram_id, error)"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO bulk_items (run_id, item_key, status, diagram_id, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, key, status, diagram_id, error, now) for key, status, diagram_id, error in rows],
+            )
+
+    def reset(self, run_id):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM bulk_items WHERE run_id = ?", (run_id,))
+
+    def summary(self, run_id):
+        with self._lock, self._connect() as conn:
+            counts = dict(conn.execute(
+                "SELECT status, COUNT(*) FROM bulk_items WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall())
+            errors = conn.execute(
+                "SELECT item_key, error FROM bulk_items WHERE run_id = ? AND status = ? ORDER BY updated_at LIMIT 20",
+                (run_id, FAILED),
+            ).fetchall()
+        return {"done": counts.get(DONE, 0), "failed": counts.get(FAILED, 0),
+                "errors": [{"item": key, "error": error} for key, error in errors]}
+
+
+class BulkIngestor:
+    """
+    extract(item) -> response text, for items that only have an image.
+    write_batch(diagrams) writes a list of prepared diagrams to every store (all or nothing);
+    each diagram is {diagram_id, diagram_name, asset_id, parsed, nodes, edges}.
+    """
+
+    def __init__(self, extract, write_batch, checkpoint, batch_size=50, parse_workers=None,
+                 extract_workers=4, write_workers=2):
+        self.extract = extract
+        self.write_batch = write_batch
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.parse_workers = parse_workers or os.cpu_count()
+        self.extract_workers = extract_workers
+        self.write_workers = write_workers
+
+    def _text(self, item):
+        return read_response(item["response"]) if "response" in item else self.extract(item)
+
+    def _write(self, run_id, batch, on_progress):
+        start = time.perf_counter()
+        try:
+            self.write_batch(batch)
+            rows = [(d["item_key"], DONE, d["diagram_id"], None) for d in batch]
+        except Exception as e:
+            rows = [(d["item_key"], FAILED, None, f"write: {e}") for d in batch]
+        self.checkpoint.mark(run_id, rows)
+        if on_progress:
+            on_progress(f"batch_{rows[0][1]}_{len(rows)}", time.perf_counter() - start)
+        return len(rows) if rows[0][1] == DONE else 0
+
+    def run(self, items, run_id, on_progress=None):
+        """Ingests every item not already done in run_id; returns a summary of the run."""
+        started = time.perf_counter()
+        done = self.checkpoint.done_keys(run_id)
+        pending = [item for item in items if item["key"] not in done]
+        if not pending:
+            return self._summary(run_id, items, pending, 0, started)
+        results = queue.Queue()
+
+        with ThreadPoolExecutor(self.extract_workers) as extractors, \
+                ProcessPoolExecutor(self.parse_workers, mp_context=multiprocessing.get_context("spawn")) as parsers, \
+                ThreadPoolExecutor(self.write_workers) as writers:
+
+            def parse(item, text_future):
+                try:
+                    future = parsers.submit(parse_response, text_future.result())
+                except Exception as e:
+                    results.put((item, None, f"extract: {e}"))
+                    return
+                future.add_done_callback(lambda f: results.put((item, f, None)))
+
+            for item in pending:
+                extractors.submit(self._text, item).add_done_callback(lambda f, item=item: parse(item, f))
+
+            batch, writes = [], []
+            for _ in range(len(pending)):
+                item, future, error = results.get()
+                if error is None:
+                    try:
+                        parsed, nodes, edges = future.result()
+                    except Exception as e:
+                        error = f"parse: {e}"
+                if error:
+                    self.checkpoint.mark(run_id, [(item["key"], FAILED, None, error)])
+                    continue
+
+                batch.append({
+                    "item_key": item["key"],
+                    "diagram_id": f"DIAGRAM_{str(uuid4())[:8]}",
+                    "diagram_name": item["diagram_name"],
+                    "asset_id": item["asset_id"].strip() or "APP001",
+                    "parsed": parsed,
+                    "nodes": nodes,
+                    "edges": edges,
+                })
+                if len(batch) >= self.batch_size:
+                    writes.append(writers.submit(self._write, run_id, batch, on_progress))
+                    batch = []
+            if batch:
+                writes.append(writers.submit(self._write, run_id, batch, on_progress))
+            written = sum(future.result() for future in writes)
+
+        return self._summary(run_id, items, pending, written, started)
+
+    def _summary(self, run_id, items, pending, written, started):
+        elapsed = time.perf_counter() - started
+        return {
+            "run_id": run_id,
+            "items": len(items),
+            "skipped": len(items) - len(pending),
+            "written": written,
+            "seconds": round(elapsed, 2),
+            "diagrams_per_sec": round(written / elapsed, 2) if elapsed else 0.0,
+            **self.checkpoint.summary(run_id),
+        }
+
+
+def run_id_for(source):
+    """Stable run id per source, so re-running the same directory or manifest resumes it."""
+    return os.path.abspath(source)
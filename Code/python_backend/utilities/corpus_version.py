@@ -0,0 +1,28 @@
+# A single counter that changes whenever the ingested corpus does (uploads, bulk batches and the
+# cleanup of failed writes). It lives in Postgres so every uvicorn worker sees the same value;
+# caches of derived answers compare it on lookup instead of relying on in-process invalidation.
+CORPUS_VERSION_MIGRATION = [
+    """
+    CREATE TABLE IF NOT EXISTS corpus_version (
+        id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        version BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT INTO corpus_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING",
+]
+
+
+def migrate(cur):
+    for statement in CORPUS_VERSION_MIGRATION:
+        cur.execute(statement)
+
+
+def bump(cur):
+    """Increments the version; run it in the transaction that changed the corpus, or right after it."""
+    cur.execute("UPDATE corpus_version SET version = version + 1 WHERE id = 1")
+
+
+def read(cur):
+    cur.execute("SELECT version FROM corpus_version WHERE id = 1")
+    row = cur.fetchone()
+    return row[0] if row else 0
@@ -1,22 +1,52 @@
-import os
-import google.generativeai as genai
 from langchain.llms.base import LLM
-from typing import ClassVar, List
+from typing import ClassVar, List, Optional
 from dotenv import load_dotenv
 
-# Load API Key from .env
+from utilities.agent_runtime import call_llm, current_step
+from utilities.llm_gateway import text_of, usage_of, text_body
+from utilities.llm_providers import shared_providers
+
+# Load API Key from .env (read by the shared gateway)
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 class GeminiLLM(LLM):
-    model_name: ClassVar[str] = "gemini-2.5-pro"
+    """
+    Agent LLM. Calls go to the provider configured for "agent.<step>" (falling back to "agent"),
+    so e.g. LLM_ROUTES="agent.detect_structure=local" runs only the style classifier on a local model.
+    """
+    # None uses the route provider's model (GEMINI_MODEL for Gemini)
+    model_name: ClassVar[Optional[str]] = None
+    route: ClassVar[str] = "agent"
+
+    def _route(self):
+        step = current_step()
+        return f"{self.route}.{step}" if step else self.route
 
     def _call(self, prompt: str, stop: List[str] = None) -> str:
-        model = genai.GenerativeModel(self.model_name)
-        response = model.generate_content(prompt)
-        return response.text.strip() if hasattr(response, "text") else str(response)
+        return call_llm(prompt, self._complete, self._complete_streaming)
+
+    def _complete(self, prompt):
+        result = shared_providers().generate(self._route(), text_body(prompt), model=self.model_name)
+        return text_of(result).strip(), usage_of(result)
+
+    def _complete_streaming(self, prompt, on_delta):
+        """Same as _complete, passing each text chunk to on_delta as it arrives."""
+        parts, usage = [], {}
+        chunks = shared_providers().stream(self._route(), text_body(prompt), model=self.model_name)
+        try:
+            for chunk in chunks:
+                text = text_of(chunk)
+                if text:
+                    parts.append(text)
+                    on_delta(text)
+                if "usageMetadata" in chunk:
+                    usage = usage_of(chunk)
+        finally:
+            # Also when on_delta raises (run cancelled): closes the upstream stream and frees its slot
+            chunks.close()
+        return "".join(parts).strip(), usage
 
     @property
     def _llm_type(self):
-        return "gemini-custom"
\ No newline at end of file
+        return "gemini-custom"
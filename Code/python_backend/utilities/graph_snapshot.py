@@ -0,0 +1,201 @@
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from utilities.graph_traversal import new_subgraph
+
+# {label} is ":Label", or empty for every node like utilities.graph_traversal
+NODES_QUERY = "MATCH (n{label}) RETURN elementId(n) AS key, properties(n) AS props"
+EDGES_QUERY = """
+MATCH (a{label})-[r]->(b{label})
+RETURN elementId(r) AS key, elementId(a) AS source, elementId(b) AS target, type(r) AS type, properties(r) AS props
+"""
+
+
+def build_csr(rows, cols, node_count):
+    """CSR over edges (rows[i] -> cols[i]): returns (indptr, neighbours, edge index per slot)."""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=node_count), out=indptr[1:])
+    return indptr, cols[order], order
+
+
+def gather(indptr, neighbours, edge_slots, frontier):
+    """All (neighbour, edge) pairs leaving the frontier nodes, without a Python loop over nodes."""
+    starts, ends = indptr[frontier], indptr[frontier + 1]
+    counts = ends - starts
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # positions = concatenation of ranges starts[i]..ends[i]
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    positions = offsets + np.arange(total)
+    return neighbours[positions], edge_slots[positions]
+
+
+class GraphSnapshot:
+    """
+    Read-only in-process copy of the application graph as CSR arrays (outgoing and incoming),
+    answering upstream/downstream/both k-hop queries with NumPy frontier expansion.
+    Nodes are keyed by Neo4j elementId like utilities.graph_traversal, so results have the same shape.
+    The snapshot is stale after mark_stale() (uploads) or max_age seconds; callers fall back to
+    Cypher while a background reload runs. label limits it to nodes with that label (default all).
+    """
+
+    def __init__(self, driver, label=None, max_age=300):
+        self.driver = driver
+        self.label = label
+        self.max_age = max_age
+        self.loaded_at = None
+        self._stale = True
+        self._data = None
+        self._reloading = threading.Lock()
+        # Bumped by every mark_stale(); a load only counts as fresh if none happened while it read
+        self._generation = 0
+        self._state = threading.Lock()
+
+    def load(self):
+        generation = self._generation
+        label = f":{self.label}" if self.label else ""
+        with self.driver.session() as session:
+            nodes = list(session.run(NODES_QUERY.format(label=label)))
+            edges = list(session.run(EDGES_QUERY.format(label=label)))
+
+        keys = [record["key"] for record in nodes]
+        index = {key: i for i, key in enumerate(keys)}
+        by_id = {}
+        for i, record in enumerate(nodes):
+            by_id.setdefault(record["props"].get("id"), []).append(i)
+
+        edges = [record for record in edges if record["source"] in index and record["target"] in index]
+        src = np.fromiter((index[record["source"]] for record in edges), dtype=np.int64, count=len(edges))
+        dst = np.fromiter((index[record["target"]] for record in edges), dtype=np.int64, count=len(edges))
+
+        data = {
+            "keys": keys,
+            "props": [record["props"] for record in nodes],
+            "by_id": by_id,
+            "edges": [(record["key"], record["type"], record["props"]) for record in edges],
+            "src": src,
+            "dst": dst,
+            "out": build_csr(src, dst, len(keys)),
+            "in": build_csr(dst, src, len(keys)),
+        }
+        # Swap in atomically; readers keep using the previous arrays until then
+        self._data = data
+        self.loaded_at = time.time()
+        with self._state:
+            self._stale = generation != self._generation
+
+    def _reload(self):
+        loaded = False
+        try:
+            self.load()
+            loaded = True
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._reloading.release()
+        # The graph changed while it was being read, so that change may be missing: read it again
+        if loaded and self._stale:
+            self._start_reload()
+
+    def _start_reload(self):
+        if self._reloading.acquire(blocking=False):
+            threading.Thread(target=self._reload, daemon=True).start()
+
+    def mark_stale(self):
+        """Called after the graph changes; reloads in the background."""
+        with self._state:
+            self._generation += 1
+            self._stale = True
+        self._start_reload()
+
+    def fresh(self):
+        if self._data is None:
+            return False
+        if not self._stale and time.time() - self.loaded_at > self.max_age:
+            self.mark_stale()
+        return not self._stale
+
+    def stats(self):
+        data = self._data
+        return {
+            "loaded": data is not None,
+            "fresh": self.fresh(),
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            "nodes": len(data["keys"]) if data else 0,
+            "edges": len(data["edges"]) if data else 0,
+        }
+
+    def contains(self, node_id):
+        """False if node_id is not in the snapshot (e.g. outside its label), so callers use Cypher instead."""
+        data = self._data
+        return data is not None and node_id in data["by_id"]
+
+    def traverse(self, node_id, direction="upstream", depth=1, max_nodes=2000, max_edges=10000):
+        """Same contract and result as utilities.graph_traversal.traverse, answered from the snapshot."""
+        data = self._data
+        start = np.asarray(data["by_id"].get(node_id, []), dtype=np.int64)
+        subgraph = new_subgraph(data["keys"][i] for i in start)
+
+        visited = np.zeros(len(data["keys"]), dtype=bool)
+        visited[start] = True
+        node_order = list(start)
+        seen_edges = np.zeros(len(data["edges"]), dtype=bool)
+        edge_order = []
+        adjacency = {"upstream": [data["in"]], "downstream": [data["out"]], "both": [data["out"], data["in"]]}[direction]
+
+        frontier = start
+        for level in range(1, depth + 1):
+            if not len(frontier):
+                break
+            neighbours, edge_ids = [], []
+            for indptr, cols, slots in adjacency:
+                n, e = gather(indptr, cols, slots, frontier)
+                neighbours.append(n)
+                edge_ids.append(e)
+            neighbours, edge_ids = np.concatenate(neighbours), np.concatenate(edge_ids)
+
+            # New nodes in discovery order, capped at max_nodes
+            new_nodes = neighbours[~visited[neighbours]]
+            _, first = np.unique(new_nodes, return_index=True)
+            new_nodes = new_nodes[np.sort(first)]
+            room = max_nodes - len(node_order)
+            if len(new_nodes) > room:
+                new_nodes = new_nodes[:max(room, 0)]
+                subgraph["truncated"] = "nodes"
+            visited[new_nodes] = True
+            node_order.extend(new_nodes.tolist())
+
+            # Edges whose far end made it into the subgraph, each once
+            keep = visited[neighbours] & ~seen_edges[edge_ids]
+            edge_ids = edge_ids[keep]
+            _, first = np.unique(edge_ids, return_index=True)
+            edge_ids = edge_ids[np.sort(first)]
+            room = max_edges - len(edge_order)
+            if len(edge_ids) > room:
+                edge_ids = edge_ids[:max(room, 0)]
+                subgraph["truncated"] = "edges"
+            seen_edges[edge_ids] = True
+            edge_order.extend(edge_ids.tolist())
+
+            subgraph["depth_reached"] = level
+            if subgraph["truncated"]:
+                break
+            frontier = new_nodes
+
+        keys, props = data["keys"], data["props"]
+        for i in node_order:
+            subgraph["nodes"][keys[i]] = props[i]
+        for e in edge_order:
+            key, rel_type, rel_props = data["edges"][e]
+            subgraph["edges"][key] = {
+                "source": keys[data["src"][e]],
+                "target": keys[data["dst"][e]],
+                "type": rel_type,
+                "props": rel_props,
+            }
+        return subgraph
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+
+from neo4j import Query
+
+# One query per BFS level. Nodes are addressed by elementId so the same application in
+# two diagrams stays two nodes, as in the previous path-based query. No labels, like that
+# query: uploaded :Node diagrams and the :Application graph are both traversed.
+START_QUERY = "MATCH (n {id: $node_id}) RETURN elementId(n) AS key, properties(n) AS props"
+
+EXPAND_QUERIES = {
+    "upstream": "MATCH (a)<-[r]-(b) WHERE elementId(a) IN $frontier",
+    "downstream": "MATCH (a)-[r]->(b) WHERE elementId(a) IN $frontier",
+    "both": "MATCH (a)-[r]-(b) WHERE elementId(a) IN $frontier",
+}
+EXPAND_RETURN = """
+RETURN DISTINCT elementId(r) AS rel_key, type(r) AS rel_type, properties(r) AS rel_props,
+       elementId(startNode(r)) AS source, elementId(endNode(r)) AS target,
+       elementId(b) AS key, properties(b) AS props
+LIMIT $limit
+"""
+
+
+def new_subgraph(start_keys=()):
+    return {"start": list(start_keys), "nodes": {}, "edges": {}, "depth_reached": 0, "truncated": None}
+
+
+def traverse(driver, node_id, direction="upstream", depth=1, max_nodes=2000, max_edges=10000, timeout=5.0):
+    """
+    Bounded BFS from every node with id node_id. Returns a subgraph of unique nodes
+    {key: props} and unique edges {key: {source, target, type, props}} in discovery order.
+    Stops at depth, max_nodes, max_edges or timeout seconds; 'truncated' names the cap that was hit.
+    """
+    deadline = time.monotonic() + timeout
+    query = EXPAND_QUERIES[direction] + EXPAND_RETURN
+
+    with driver.session() as session:
+        start = list(session.run(Query(START_QUERY, timeout=timeout), node_id=node_id))
+        subgraph = new_subgraph(record["key"] for record in start)
+        for record in start:
+            subgraph["nodes"][record["key"]] = record["props"]
+
+        frontier = list(subgraph["nodes"])
+        for level in range(1, depth + 1):
+            remaining = deadline - time.monotonic()
+            if not frontier:
+                break
+            if remaining <= 0:
+                subgraph["truncated"] = "time"
+                break
+
+            next_frontier = []
+            try:
+                records = session.run(Query(query, timeout=remaining), frontier=frontier,
+                                      limit=max_edges - len(subgraph["edges"]) + 1)
+                for record in records:
+                    if record["key"] not in subgraph["nodes"]:
+                        if len(subgraph["nodes"]) >= max_nodes:
+                            subgraph["truncated"] = "nodes"
+                            continue
+                        subgraph["nodes"][record["key"]] = record["props"]
+                        next_frontier.append(record["key"])
+                    if record["rel_key"] not in subgraph["edges"]:
+                        if len(subgraph["edges"]) >= max_edges:
+                            subgraph["truncated"] = "edges"
+                            break
+                        subgraph["edges"][record["rel_key"]] = {
+                            "source": record["source"],
+                            "target": record["target"],
+                            "type": record["rel_type"],
+                            "props": record["rel_props"],
+                        }
+            except Exception as e:
+                # Server-side transaction timeout: keep what was collected so far
+                if "timeout" not in str(e).lower() and "terminated" not in str(e).lower():
+                    raise
+                subgraph["truncated"] = "time"
+
+            subgraph["depth_reached"] = level
+            if subgraph["truncated"]:
+                break
+            frontier = next_frontier
+
+    return subgraph
+
+
+def edge_rows(subgraph):
+    """Edges in the /query response shape: {"n": source props, "r": [source, type, target, {reflink}], "m": target props}."""
+    nodes = subgraph["nodes"]
+    rows = []
+    for edge in subgraph["edges"].values():
+        source, target = nodes.get(edge["source"], {}), nodes.get(edge["target"], {})
+        rows.append({
+            "n": source,
+            "r": [source, edge["type"], target, {"reflink": edge["props"].get("reflink")}],
+            "m": target,
+        })
+    return rows
+
+
+class TraversalCache:
+    """Keeps recent traversals for ttl seconds so the explorer can page without re-running them."""
+
+    def __init__(self, max_entries=64, ttl=120):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
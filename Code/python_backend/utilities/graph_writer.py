@@ -0,0 +1,79 @@
+from collections import defaultdict
+
+# Index/constraint bootstrap for the diagram graph. The composite constraint also
+# backs the (id, diagram_id) lookups used by the node and edge MERGEs below.
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT node_id_diagram IF NOT EXISTS FOR (n:Node) REQUIRE (n.id, n.diagram_id) IS UNIQUE",
+    "CREATE INDEX node_id IF NOT EXISTS FOR (n:Node) ON (n.id)",
+]
+
+NODE_QUERY = """
+UNWIND $rows AS row
+MERGE (n:Node {id: row.id, diagram_id: $diagram_id})
+SET n.display_name = row.display_name, n.name = row.name, n.group = row.group
+"""
+
+# Relationship types can't be parameters, so there is one statement per type;
+# each statement text is stable and gets a cached plan.
+EDGE_QUERY = """
+UNWIND $rows AS row
+MATCH (a:Node {id: row.src, diagram_id: $diagram_id}), (b:Node {id: row.tgt, diagram_id: $diagram_id})
+MERGE (a)-[r:`%s`]->(b)
+SET r.interface_type = $interface_type, r.reflink = row.reflink
+"""
+
+
+def ensure_graph_schema(driver):
+    with driver.session() as session:
+        for statement in SCHEMA_STATEMENTS:
+            session.run(statement).consume()
+
+
+def store_graph(tx, diagram_id, nodes, edges):
+    """Writes all nodes in one UNWIND statement and the edges in one UNWIND statement per relationship type."""
+    tx.run(
+        NODE_QUERY,
+        diagram_id=diagram_id,
+        rows=[
+            {
+                "id": node["id"],
+                "display_name": node["display_name"],
+                "name": node.get("name", ""),
+                "group": node.get("group", ""),
+            }
+            for node in nodes
+        ],
+    )
+
+    edges_by_type = defaultdict(list)
+    for edge in edges:
+        edges_by_type[edge["label"].upper()].append(
+            {"src": edge["source"], "tgt": edge["target"], "reflink": edge["reflink"]}
+        )
+
+    for rel_type, rows in edges_by_type.items():
+        tx.run(EDGE_QUERY % rel_type.replace("`", "``"), diagram_id=diagram_id, interface_type=rel_type, rows=rows)
+
+
+def store_graph_rowwise(tx, diagram_id, nodes, edges):
+    """Previous writer (one statement per node and per edge), kept for benchmark_graph_writer.py."""
+    for node in nodes:
+        tx.run(
+            """
+            MERGE (n:Node {id: $id, diagram_id: $diagram_id})
+            SET n.display_name = $display_name, n.name = $name, n.group = $group
+            """,
+            id=node["id"],
+            diagram_id=diagram_id,
+            display_name=node["display_name"],
+            name=node.get("name", ""),
+            group=node.get("group", "")
+        )
+
+    for edge in edges:
+        tx.run(
+            f"MATCH (a:Node {{id: $src, diagram_id: $diagram_id}}), (b:Node {{id: $tgt, diagram_id: $diagram_id}}) "
+            f"MERGE (a)-[r:{edge['label'].upper()}]->(b)"
+            f"SET r.interface_type = $interface_type, r.reflink = $reflink",
+            src=edge["source"], tgt=edge["target"], diagram_id=diagram_id, interface_type=edge['label'].upper(), reflink=edge['reflink']
+        )
@@ -0,0 +1,153 @@
+from psycopg2.extras import execute_values
+
+# interface_edges mirrors the graph's typed edges per diagram; interface_rollup holds
+# (source asset, interface_type) -> number of distinct (source, target, type) edges leaving that asset.
+# Domain/capability are joined from assets when reading, so editing an asset's domain needs no rebuild;
+# the read sums what /get_interface_type_counts used to count in Neo4j.
+INTERFACE_ROLLUP_MIGRATION = [
+    """
+    CREATE TABLE IF NOT EXISTS interface_edges (
+        diagram_id TEXT NOT NULL,
+        source_id TEXT NOT NULL,
+        target_id TEXT NOT NULL,
+        interface_type TEXT NOT NULL,
+        PRIMARY KEY (diagram_id, source_id, target_id, interface_type)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_interface_edges_triple ON interface_edges (source_id, target_id, interface_type)",
+    """
+    CREATE TABLE IF NOT EXISTS interface_rollup (
+        source_id TEXT NOT NULL,
+        interface_type TEXT NOT NULL,
+        edge_count INTEGER NOT NULL,
+        PRIMARY KEY (source_id, interface_type)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_assets_domain_capability ON assets (asset_domain, asset_capability)",
+]
+
+# diagram_id recorded for graph edges that belong to no uploaded diagram, e.g. the :Application
+# graph loaded by load_neo4j_data.py
+GRAPH_DIAGRAM_ID = ""
+
+# Serialises rollup updates so two uploads adding the same new edge don't both count it
+ROLLUP_LOCK = "SELECT pg_advisory_xact_lock(hashtext('interface_rollup'))"
+
+# Edges of one diagram that no other diagram has, grouped by source asset
+DIAGRAM_DELTA = """
+SELECT e.source_id, e.interface_type, COUNT(*)
+FROM interface_edges e
+WHERE e.diagram_id = %(diagram_id)s
+  AND NOT EXISTS (
+      SELECT 1 FROM interface_edges o
+      WHERE o.source_id = e.source_id AND o.target_id = e.target_id
+        AND o.interface_type = e.interface_type AND o.diagram_id <> e.diagram_id
+  )
+GROUP BY 1, 2
+"""
+
+APPLY_DELTA = f"""
+INSERT INTO interface_rollup (source_id, interface_type, edge_count)
+SELECT source_id, interface_type, %(sign)s * edge_count
+FROM ({DIAGRAM_DELTA}) d (source_id, interface_type, edge_count)
+ON CONFLICT (source_id, interface_type)
+DO UPDATE SET edge_count = interface_rollup.edge_count + EXCLUDED.edge_count
+"""
+
+REBUILD = """
+INSERT INTO interface_rollup (source_id, interface_type, edge_count)
+SELECT source_id, interface_type, COUNT(*)
+FROM (SELECT DISTINCT source_id, target_id, interface_type FROM interface_edges) t
+GROUP BY 1, 2
+"""
+
+COUNTS_QUERY = """
+SELECT r.interface_type, SUM(r.edge_count)
+FROM interface_rollup r
+JOIN assets a ON a.asset_id = r.source_id
+WHERE a.asset_domain = %s AND a.asset_capability = %s
+GROUP BY r.interface_type
+ORDER BY r.interface_type
+"""
+
+# No label, like the queries it replaces: uploaded :Node diagrams and the :Application graph both count
+GRAPH_EDGES_QUERY = """
+MATCH (a)-[r]->(b)
+WHERE r.interface_type IS NOT NULL
+RETURN a.diagram_id AS diagram_id, a.id AS source_id, b.id AS target_id, r.interface_type AS interface_type
+"""
+
+
+def migrate(cur):
+    for statement in INTERFACE_ROLLUP_MIGRATION:
+        cur.execute(statement)
+
+
+def _apply(cur, diagram_id, sign):
+    cur.execute(APPLY_DELTA, {"diagram_id": diagram_id, "sign": sign})
+    cur.execute("DELETE FROM interface_rollup WHERE edge_count <= 0")
+
+
+def record_diagram_edges(cur, diagram_id, edges):
+    """Adds an uploaded diagram's edges and its new distinct edges to the rollup (inside the upload transaction)."""
+    rows = {
+        (diagram_id, edge["source"], edge["target"], edge["label"].upper())
+        for edge in edges if edge.get("label")
+    }
+    if not rows:
+        return
+    cur.execute(ROLLUP_LOCK)
+    execute_values(
+        cur,
+        "INSERT INTO interface_edges (diagram_id, source_id, target_id, interface_type) VALUES %s ON CONFLICT DO NOTHING",
+        list(rows),
+    )
+    _apply(cur, diagram_id, 1)
+
+
+def remove_diagram_edges(cur, diagram_id):
+    """Reverses record_diagram_edges, e.g. when an upload is rolled back."""
+    cur.execute(ROLLUP_LOCK)
+    _apply(cur, diagram_id, -1)
+    cur.execute("DELETE FROM interface_edges WHERE diagram_id = %s", (diagram_id,))
+
+
+def rebuild_rollup(cur):
+    """Recomputes every count from interface_edges."""
+    cur.execute(ROLLUP_LOCK)
+    cur.execute("DELETE FROM interface_rollup")
+    cur.execute(REBUILD)
+
+
+def sync_edges_from_graph(cur, driver, batch_size=5000):
+    """Reloads interface_edges from Neo4j, e.g. for diagrams uploaded before the rollup existed."""
+    cur.execute(ROLLUP_LOCK)
+    cur.execute("DELETE FROM interface_edges")
+    total = 0
+    with driver.session() as session:
+        batch = []
+        for record in session.run(GRAPH_EDGES_QUERY):
+            if record["source_id"] is None or record["target_id"] is None:
+                continue
+            batch.append((record["diagram_id"] or GRAPH_DIAGRAM_ID, record["source_id"], record["target_id"],
+                          record["interface_type"]))
+            if len(batch) >= batch_size:
+                total += _insert_edges(cur, batch)
+                batch = []
+        total += _insert_edges(cur, batch)
+    return total
+
+
+def _insert_edges(cur, rows):
+    if rows:
+        execute_values(
+            cur,
+            "INSERT INTO interface_edges (diagram_id, source_id, target_id, interface_type) VALUES %s ON CONFLICT DO NOTHING",
+            rows,
+        )
+    return len(rows)
+
+
+def interface_counts(cur, domain, capability):
+    cur.execute(COUNTS_QUERY, (domain, capability))
+    return [{interface_type: int(count)} for interface_type, count in cur.fetchall()]
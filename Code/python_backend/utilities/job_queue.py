@@ -0,0 +1,135 @@
+import json
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from uuid import uuid4
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Persistent job queue backed by a local SQLite file.
+    Jobs are executed by a bounded thread pool. Queued and running jobs are
+    picked up again on start(), so in-flight uploads survive a restart. A job that was
+    running when the process stopped may have done part of its work; recover(payload)
+    is called before it runs again to clean that up.
+    """
+
+    def __init__(self, db_path, handler, max_workers=2, recover=None):
+        self.db_path = db_path
+        self.handler = handler  # handler(payload, blob, on_stage) -> dict
+        self.recover = recover
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-job")
+        self._lock = threading.Lock()
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        # Commits (or rolls back) like sqlite3's own context manager, then closes the connection
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    blob BLOB,
+                    stages TEXT NOT NULL DEFAULT '[]',
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+
+    def _update(self, job_id, **fields):
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {cols} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def start(self):
+        """Re-submits every job that was queued or running when the process stopped."""
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT job_id, status FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+            conn.execute(
+                "UPDATE jobs SET status = ?, stages = '[]', started_at = NULL WHERE status = ?", (QUEUED, RUNNING)
+            )
+        for row in rows:
+            self.executor.submit(self._run, row["job_id"], row["status"] == RUNNING)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, kind, payload, blob=None):
+        job_id = f"JOB_{uuid4().hex[:12]}"
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, status, payload, blob, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload), blob, time.time()),
+            )
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, kind, status, payload, stages, result, error, created_at, started_at, finished_at "
+                "FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["stages"] = json.loads(job["stages"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def _run(self, job_id, interrupted=False):
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload, blob, status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not row or row["status"] not in (QUEUED, RUNNING):
+            return
+
+        stages = []
+
+        def on_stage(stage, seconds):
+            stages.append({"stage": stage, "seconds": round(seconds, 3)})
+            self._update(job_id, stages=json.dumps(stages))
+
+        self._update(job_id, status=RUNNING, started_at=time.time())
+        try:
+            payload = json.loads(row["payload"])
+            if interrupted and self.recover:
+                self.recover(payload)
+            result = self.handler(payload, row["blob"], on_stage)
+            # Image bytes are no longer needed once the job has been processed
+            self._update(job_id, status=DONE, result=json.dumps(result), blob=None, finished_at=time.time())
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            print(f"[ERROR] job {job_id}:", detail)
+            traceback.print_exc()
+            self._update(job_id, status=FAILED, error=str(detail), blob=None, finished_at=time.time())
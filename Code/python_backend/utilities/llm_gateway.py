@@ -0,0 +1,308 @@
+import json
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Every LLM call (uploads, /chat/, agents) goes through one LLMGateway: a pooled HTTP session,
+# a global and a per-route concurrency limit, a token-bucket rate limit and jittered retries on
+# 429/5xx. base_url can point at a local stub server (llm_stub_server.py) to exercise all of it.
+# Providers other than Gemini (utilities.llm_providers) use post/post_stream with their own URLs.
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000]
+QUEUE_BUCKETS = [0, 1, 2, 4, 8, 16, 32, 64, 128]
+
+
+class LLMError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(f"LLM request failed ({status}): {detail}")
+        self.status = status
+        self.detail = detail
+
+
+class Histogram:
+    """Cumulative-style histogram over fixed upper bounds; the last bucket is +Inf."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def snapshot(self):
+        buckets, running = {}, 0
+        for bound, count in zip(self.bounds + ["+Inf"], self.counts):
+            running += count
+            buckets[str(bound)] = running
+        return {"count": self.total, "sum": round(self.sum, 1), "buckets": buckets}
+
+
+class TokenBucket:
+    """Allows rate requests per second on average with bursts of up to burst; rate <= 0 disables it."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.queue_wait_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.queue_depth = Histogram(QUEUE_BUCKETS)
+
+    def snapshot(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "latency_ms": self.latency_ms.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "queue_depth": self.queue_depth.snapshot(),
+        }
+
+
+class LLMGateway:
+    """
+    route_limits maps a route name ("upload", "chat", "agent", ...) to its own concurrency limit;
+    routes without one are only bounded by max_concurrency.
+    """
+
+    def __init__(self, api_key, base_url=GEMINI_BASE_URL, max_concurrency=8, route_limits=None,
+                 rate_per_second=0.0, burst=10, max_retries=4, backoff_base=0.5, backoff_max=20.0,
+                 timeout=300):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(max_concurrency, 10))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._global = threading.BoundedSemaphore(max_concurrency)
+        self._route_limits = route_limits or {}
+        self._routes = {}
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _route(self, route):
+        with self._lock:
+            if route not in self._stats:
+                self._stats[route] = RouteStats()
+                limit = self._route_limits.get(route)
+                self._routes[route] = threading.BoundedSemaphore(limit) if limit else None
+            return self._routes[route], self._stats[route]
+
+    @contextmanager
+    def _slot(self, route):
+        """Waits for the route and global concurrency limits and the rate limit."""
+        semaphore, stats = self._route(route)
+        with self._lock:
+            stats.queue_depth.observe(stats.queued)
+            stats.queued += 1
+        start = time.perf_counter()
+        acquired = []
+        try:
+            for sem in (semaphore, self._global):
+                if sem is not None:
+                    sem.acquire()
+                    acquired.append(sem)
+            self._bucket.acquire()
+        except BaseException:
+            for sem in reversed(acquired):
+                sem.release()
+            raise
+        finally:
+            with self._lock:
+                stats.queued -= 1
+                stats.queue_wait_ms.observe(1000 * (time.perf_counter() - start))
+
+        with self._lock:
+            stats.in_flight += 1
+        try:
+            yield stats
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+            for sem in reversed(acquired):
+                sem.release()
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # Full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _post(self, route, stats, url, body, headers=None, **kwargs):
+        """POST with retries on connection errors and RETRY_STATUSES; returns a 200 response."""
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.post(url, json=body, timeout=self.timeout,
+                                             headers={"Content-Type": "application/json", **(headers or {})}, **kwargs)
+                if response.status_code == 200:
+                    return response
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise LLMError(response.status_code, response.text)
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise LLMError(None, str(e))
+            if response is not None:
+                response.close()
+            with self._lock:
+                stats.retries += 1
+            time.sleep(self._backoff(attempt, response))
+
+    def _url(self, model, method):
+        return f"{self.base_url}/models/{model}:{method}"
+
+    def post(self, route, url, body, **kwargs):
+        """POST a JSON body to any LLM endpoint under the route's limits; returns the response JSON."""
+        with self._slot(route) as stats:
+            start = time.perf_counter()
+            with self._lock:
+                stats.requests += 1
+            try:
+                return self._post(route, stats, url, body, **kwargs).json()
+            except LLMError:
+                with self._lock:
+                    stats.failures += 1
+                raise
+            finally:
+                with self._lock:
+                    stats.latency_ms.observe(1000 * (time.perf_counter() - start))
+
+    def post_stream(self, route, url, body, **kwargs):
+        """
+        Streaming POST under the route's limits; yields non-empty response lines. Retries only happen
+        before the stream opens. Closing the generator closes the HTTP stream, cancelling generation upstream.
+        """
+        with self._slot(route) as stats:
+            start = time.perf_counter()
+            with self._lock:
+                stats.requests += 1
+            try:
+                response = self._post(route, stats, url, body, stream=True, **kwargs)
+                with response:
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line:
+                            yield line
+            except LLMError:
+                with self._lock:
+                    stats.failures += 1
+                raise
+            finally:
+                with self._lock:
+                    stats.latency_ms.observe(1000 * (time.perf_counter() - start))
+
+    def generate(self, route, model, body):
+        """Gemini generateContent; returns the response JSON."""
+        return self.post(route, self._url(model, "generateContent"), body, params={"key": self.api_key})
+
+    def stream(self, route, model, body):
+        """Gemini streamGenerateContent over SSE; yields each response JSON chunk."""
+        lines = self.post_stream(route, self._url(model, "streamGenerateContent"), body,
+                                 params={"key": self.api_key, "alt": "sse"})
+        try:
+            for line in lines:
+                if line.startswith("data:"):
+                    yield json.loads(line[len("data:"):])
+        finally:
+            # Closing this generator must release the slot now, not whenever lines is collected
+            lines.close()
+
+    def stats(self):
+        with self._lock:
+            return {route: stats.snapshot() for route, stats in self._stats.items()}
+
+
+def text_of(result):
+    """Text of the first candidate of a generateContent response (or stream chunk)."""
+    if "candidates" not in result:
+        raise LLMError(None, result)
+    return "".join(part.get("text", "") for part in result["candidates"][0].get("content", {}).get("parts", []))
+
+
+def usage_of(result):
+    usage = result.get("usageMetadata", {})
+    return {"prompt_tokens": usage.get("promptTokenCount", 0), "output_tokens": usage.get("candidatesTokenCount", 0)}
+
+
+def text_body(prompt):
+    return {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+
+
+def _route_limits(value):
+    """"upload=2,chat=4,agent=4" -> {"upload": 2, "chat": 4, "agent": 4}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, limit = item.partition("=")
+        limits[route.strip()] = int(limit)
+    return limits
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_gateway():
+    """The process-wide gateway, configured from the environment on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LLMGateway(
+                api_key=os.getenv("GEMINI_API_KEY"),
+                base_url=os.getenv("GEMINI_BASE_URL", GEMINI_BASE_URL),
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                route_limits=_route_limits(os.getenv("LLM_ROUTE_LIMITS", "upload=4,chat=4,agent=4")),
+                rate_per_second=float(os.getenv("LLM_RATE_PER_SECOND", "0")),
+                burst=int(os.getenv("LLM_RATE_BURST", "10")),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+                backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+                backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "20")),
+                timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "300")),
+            )
+        return _shared
@@ -0,0 +1,266 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+
+from utilities.llm_gateway import LLMError, shared_gateway, text_of, usage_of
+
+# Providers take and return Gemini-shaped payloads ({"contents": [...]} in, {"candidates": [...],
+# "usageMetadata": {...}} out), so call sites stay the same whichever backend serves a route.
+# Routes are "upload", "chat", "agent" or a finer "agent.<step>"; LLM_ROUTES picks a provider per
+# route, e.g. LLM_ROUTES="agent.detect_structure=local,chat=replay", falling back to LLM_DEFAULT_PROVIDER.
+
+
+def gemini_response(text, usage=None):
+    result = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+    if usage:
+        result["usageMetadata"] = {
+            "promptTokenCount": usage.get("prompt_tokens", 0),
+            "candidatesTokenCount": usage.get("output_tokens", 0),
+        }
+    return result
+
+
+def request_hash(body):
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+
+class GeminiProvider:
+    def __init__(self, gateway, model="gemini-2.5-pro"):
+        self.gateway = gateway
+        self.model = model
+
+    def describe(self, model=None):
+        # Just the model name, so caches keyed on it before providers existed stay valid
+        return model or self.model
+
+    def generate(self, route, body, model=None):
+        return self.gateway.generate(route, model or self.model, body)
+
+    def stream(self, route, body, model=None):
+        yield from self.gateway.stream(route, model or self.model, body)
+
+
+class LocalProvider:
+    """
+    Local model behind an OpenAI-compatible chat completions API: llama.cpp's llama-server
+    (http://localhost:8080/v1) or Ollama (http://localhost:11434/v1). Images are passed as
+    data URIs, which multimodal models (e.g. llava, llama3.2-vision) accept.
+    """
+
+    def __init__(self, gateway, base_url, model):
+        self.gateway = gateway
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+
+    def describe(self, model=None):
+        return f"local:{self.model}"
+
+    @staticmethod
+    def messages(body):
+        messages = []
+        for content in body.get("contents", []):
+            parts = []
+            for part in content.get("parts", []):
+                if "text" in part:
+                    parts.append({"type": "text", "text": part["text"]})
+                elif "inline_data" in part:
+                    data = part["inline_data"]
+                    parts.append({"type": "image_url",
+                                  "image_url": {"url": f"data:{data['mime_type']};base64,{data['data']}"}})
+            if all(part["type"] == "text" for part in parts):
+                parts = "\n".join(part["text"] for part in parts)
+            messages.append({"role": "assistant" if content.get("role") == "model" else "user", "content": parts})
+        return messages
+
+    def generate(self, route, body, model=None):
+        result = self.gateway.post(route, f"{self.base_url}/chat/completions",
+                                   {"model": self.model, "messages": self.messages(body), "stream": False})
+        usage = result.get("usage", {})
+        return gemini_response(result["choices"][0]["message"].get("content") or "",
+                               {"prompt_tokens": usage.get("prompt_tokens", 0),
+                                "output_tokens": usage.get("completion_tokens", 0)})
+
+    def stream(self, route, body, model=None):
+        request = {"model": self.model, "messages": self.messages(body), "stream": True,
+                   "stream_options": {"include_usage": True}}
+        lines = self.gateway.post_stream(route, f"{self.base_url}/chat/completions", request)
+        try:
+            for line in lines:
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                text = "".join((choice.get("delta") or {}).get("content") or "" for choice in chunk.get("choices", []))
+                usage = chunk.get("usage")
+                if text or usage:
+                    yield gemini_response(text, usage and {"prompt_tokens": usage.get("prompt_tokens", 0),
+                                                           "output_tokens": usage.get("completion_tokens", 0)})
+        finally:
+            lines.close()
+
+
+class ReplayProvider:
+    """
+    Deterministic responses from recorded files, for offline and load-test runs. path is a directory
+    or glob of JSON files: either {"route", "request_hash", "response"} written by RecordingProvider
+    (replayed for that exact request) or a raw Gemini response such as new_test_response_core_asset_*.json,
+    which are diagram extractions and so belong to the "upload" route.
+    Requests without an exact recording get one of the responses recorded for the same route, chosen
+    by request hash; a route with none raises LLMError(404) rather than answering with another route's.
+    """
+
+    def __init__(self, path, stream_chunk=256):
+        self.path = path
+        self.stream_chunk = stream_chunk
+        self.recorded = {}  # (route, request hash) -> response
+        self.pools = {}  # route -> responses
+        pattern = os.path.join(path, "*.json") if os.path.isdir(path) else path
+        for filename in sorted(glob.glob(pattern)):
+            with open(filename, "r") as f:
+                data = json.load(f)
+            if "request_hash" in data:
+                self.recorded[(data["route"], data["request_hash"])] = data["response"]
+                self.pools.setdefault(data["route"], []).append(data["response"])
+            elif "candidates" in data:
+                self.pools.setdefault("upload", []).append(data)
+        self.hits = 0
+        self.fallbacks = 0
+
+    def describe(self, model=None):
+        return f"replay:{self.path}"
+
+    def generate(self, route, body, model=None):
+        key = request_hash(body)
+        if (route, key) in self.recorded:
+            self.hits += 1
+            return self.recorded[(route, key)]
+        pool = self.pools.get(route)
+        if not pool:
+            raise LLMError(404, f"No recorded {route} response for request {key[:16]} in {self.path}")
+        self.fallbacks += 1
+        return pool[int(key, 16) % len(pool)]
+
+    def stream(self, route, body, model=None):
+        result = self.generate(route, body, model)
+        text = text_of(result)
+        pieces = [text[i:i + self.stream_chunk] for i in range(0, len(text), self.stream_chunk)] or [""]
+        for i, piece in enumerate(pieces):
+            yield gemini_response(piece, usage_of(result) if i == len(pieces) - 1 else None)
+
+
+class RecordingProvider:
+    """Wraps a provider and saves every response as a ReplayProvider recording in directory."""
+
+    def __init__(self, inner, directory):
+        self.inner = inner
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def describe(self, model=None):
+        return self.inner.describe(model)
+
+    def _save(self, route, body, response):
+        key = request_hash(body)
+        with open(os.path.join(self.directory, f"{route}_{key[:16]}.json"), "w") as f:
+            json.dump({"route": route, "request_hash": key, "response": response}, f)
+
+    def generate(self, route, body, model=None):
+        response = self.inner.generate(route, body, model)
+        self._save(route, body, response)
+        return response
+
+    def stream(self, route, body, model=None):
+        parts, usage = [], {}
+        for chunk in self.inner.stream(route, body, model):
+            parts.append(text_of(chunk))
+            usage = usage_of(chunk) if "usageMetadata" in chunk else usage
+            yield chunk
+        self._save(route, body, gemini_response("".join(parts), usage))
+
+
+class LLMProviders:
+    """
+    Picks the provider for a route: an exact entry in routes, then its parent ("agent.extract" ->
+    "agent"), then default. Providers are built on first use from factories (name -> callable).
+    The gateway sees only the top-level route, so per-route concurrency limits still apply.
+    """
+
+    def __init__(self, factories, routes=None, default="gemini"):
+        self.factories = factories
+        self.routes = routes or {}
+        self.default = default
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def provider_name(self, route):
+        while route:
+            if route in self.routes:
+                return self.routes[route]
+            route = route.rpartition(".")[0]
+        return self.default
+
+    def provider(self, name):
+        with self._lock:
+            if name not in self._providers:
+                if name not in self.factories:
+                    raise ValueError(f"Unknown LLM provider '{name}'")
+                self._providers[name] = self.factories[name]()
+            return self._providers[name]
+
+    def for_route(self, route):
+        return self.provider(self.provider_name(route))
+
+    def generate(self, route, body, model=None):
+        return self.for_route(route).generate(route.split(".")[0], body, model)
+
+    def stream(self, route, body, model=None):
+        yield from self.for_route(route).stream(route.split(".")[0], body, model)
+
+    def describe(self, route, model=None):
+        return self.for_route(route).describe(model)
+
+    def fingerprint(self, route, model=None):
+        """Describes route and any finer routes under it, e.g. to namespace caches of its outputs."""
+        finer = sorted(r for r in self.routes if r.startswith(route + "."))
+        return ",".join([self.describe(route, model)] + [f"{r}={self.describe(r, model)}" for r in finer])
+
+    def assignments(self):
+        return {"default": self.default, **self.routes}
+
+
+def _routes(value):
+    """"agent.detect_structure=local,chat=replay" -> {"agent.detect_structure": "local", "chat": "replay"}"""
+    routes = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, name = item.partition("=")
+        routes[route.strip()] = name.strip()
+    return routes
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_providers():
+    """The process-wide provider table, configured from the environment on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            gateway = shared_gateway()
+            factories = {
+                "gemini": lambda: GeminiProvider(gateway, os.getenv("GEMINI_MODEL", "gemini-2.5-pro")),
+                "local": lambda: LocalProvider(gateway, os.getenv("LOCAL_LLM_URL", "http://localhost:11434/v1"),
+                                               os.getenv("LOCAL_LLM_MODEL", "llama3.2:3b")),
+                "replay": lambda: ReplayProvider(os.getenv("LLM_REPLAY_PATH", "llm_recordings")),
+            }
+            record_dir = os.getenv("LLM_RECORD_DIR")
+            if record_dir:
+                factories = {name: (lambda factory=factory: RecordingProvider(factory(), record_dir))
+                             for name, factory in factories.items()}
+            _shared = LLMProviders(factories, _routes(os.getenv("LLM_ROUTES", "")),
+                                   os.getenv("LLM_DEFAULT_PROVIDER", "gemini"))
+        return _shared
@@ -0,0 +1,69 @@
+import re
+
+
+def parse_mermaid(mermaid_code):
+    nodes = []
+    edges = []
+    current_group = None
+
+    for line in mermaid_code.splitlines():
+        line = line.strip()
+
+        # Detect subgraph group
+        if line.lower().startswith("subgraph"):
+            match = re.match(r'subgraph\s+"?(.*?)"?$', line, re.IGNORECASE)
+            if match:
+                current_group = match.group(1).strip()
+
+        # Detect node definitions
+        elif "[" in line and "]" in line:
+            node_match = re.match(r'(\w+)\s*\[\s*(.*?)\s*\]', line)
+            if node_match:
+                node_id = node_match.group(1).strip()
+                label_text = node_match.group(2).strip()
+
+                # Remove system code from label if present, extract clean name
+                name = label_text.replace(node_id, "").strip()
+                display_name = f"{node_id}: {label_text}"
+
+                nodes.append({
+                    "id": node_id,
+                    "name": name,
+                    "display_name": display_name,
+                    "group": current_group or "Unknown"
+                })
+
+        # Detect edges
+        elif "-->" in line:
+            edge_match = re.match(r'(\w+)\s*-->\s*\|\s*(.*?)\s*\|\s*(\w+)', line)
+            if edge_match:
+                src = edge_match.group(1).strip()
+                label = edge_match.group(2).strip()
+                tgt = edge_match.group(3).strip()
+
+                # If label is empty or only spaces, default to 'UNKNOWN'
+                if not label:
+                    label = "UNKNOWN"
+
+                    # Normalize label for checking (case-insensitive)
+                    label_upper = label.upper()
+
+                    # Determine the correct base URL based on label
+                    if label_upper == "API":
+                        base_url = "https://www.api-stargaze-url.com"
+                    elif label_upper == "EVENT":
+                        base_url = "https://www.event-stargaze-url.com"
+                    else:
+                        base_url = "https://www.others-stargaze-url.com"
+
+                    # Build reflink
+                    reflink = f"{base_url}/{src}-{tgt}"
+
+                    edges.append({
+                        "source": src,
+                        "target": tgt,
+                        "label": label,
+                        "reflink": reflink
+                    })
+
+    return nodes, edges
@@ -0,0 +1,126 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+
+
+class PgPool:
+    """
+    Shared Postgres connection pool.
+    Connections are checked out per request and returned afterwards; the transaction is
+    committed on success and rolled back on error, so one failed statement can't leave
+    other requests in an aborted transaction. Checkout blocks (up to checkout_timeout)
+    when the pool is saturated instead of failing straight away.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, statement_timeout_ms=30000, checkout_timeout=10,
+                 health_check_after=30, **connect_kwargs):
+        if statement_timeout_ms:
+            options = connect_kwargs.get("options", "")
+            connect_kwargs["options"] = f"{options} -c statement_timeout={int(statement_timeout_ms)}".strip()
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+
+        # Saturation metrics
+        self.in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.replaced = 0
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.time() - self._last_used.get(id(conn), time.time()) < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._slots.acquire(timeout=self.checkout_timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise pool.PoolError(f"No Postgres connection available within {self.checkout_timeout}s")
+        try:
+            conn = self._pool.getconn()
+            while not self._healthy(conn):
+                self._pool.putconn(conn, close=True)
+                with self._lock:
+                    self.replaced += 1
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds += time.perf_counter() - start
+        return conn
+
+    def _release(self, conn, broken=False):
+        close = broken or bool(conn.closed)
+        if close:
+            self._last_used.pop(id(conn), None)
+        else:
+            self._last_used[id(conn)] = time.time()
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self._checkout()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            raise
+        finally:
+            self._release(conn, broken)
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_size": self.maxconn,
+                "in_use": self.in_use,
+                "utilisation": round(self.in_use / self.maxconn, 3),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "avg_wait_ms": round(1000 * self.wait_seconds / self.checkouts, 3) if self.checkouts else 0.0,
+                "timeouts": self.timeouts,
+                "replaced_connections": self.replaced,
+            }
+
+    def close(self):
+        self._pool.closeall()
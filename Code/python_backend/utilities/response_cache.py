@@ -0,0 +1,97 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+def prompt_version(*parts):
+    """Short hash of the prompt (and model) so a prompt change invalidates old entries."""
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of LLM extraction responses stored in a local SQLite file.
+    Keys are SHA-256(image bytes) + prompt version. Least recently used entries are
+    evicted once the stored text exceeds max_bytes.
+    """
+
+    def __init__(self, db_path, max_bytes=256 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._lock, self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    cache_key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        # Commits (or rolls back) like sqlite3's own context manager, then closes the connection
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def key(image_bytes, version):
+        return f"{hashlib.sha256(image_bytes).hexdigest()}:{version}"
+
+    def get(self, cache_key):
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT response FROM responses WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, cache_key, response):
+        now = time.time()
+        size = len(response.encode())
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (cache_key, response, size, now, now),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for cache_key, size in conn.execute("SELECT cache_key, size FROM responses ORDER BY last_access").fetchall():
+            conn.execute("DELETE FROM responses WHERE cache_key = ?", (cache_key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
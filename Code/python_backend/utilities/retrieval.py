@@ -0,0 +1,264 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utilities.session_store import estimate_tokens
+
+# Candidate depth and number of documents kept per query type
+QUERY_PROFILES = {
+    "specific": {"candidates": 20, "top_k": 6},   # names an APP code or a single component
+    "general": {"candidates": 40, "top_k": 12},
+    "broad": {"candidates": 80, "top_k": 30},     # "list all ...", "which apps ...", comparisons
+}
+
+# How many chunks a single diagram may contribute, per collection
+MAX_PER_DIAGRAM = {
+    "architecture_diagrams": 1,
+    "architecture_applications": 6,
+    "architecture_complexity": 6,
+}
+
+APP_CODE_RE = re.compile(r"\bAPP\d+\b", re.IGNORECASE)
+BROAD_RE = re.compile(r"\b(all|list|which|every|compare|across|how many|overview)\b", re.IGNORECASE)
+
+
+COLLECTIONS = ("architecture_diagrams", "architecture_applications", "architecture_complexity")
+
+# Candidates fetched from each collection by the router, scaled by query type
+ROUTER_K = {
+    "architecture_diagrams": 8,
+    "architecture_applications": 20,
+    "architecture_complexity": 12,
+}
+ROUTER_K_SCALE = {"specific": 0.5, "general": 1.0, "broad": 2.0}
+
+
+def infer_collection(prompt: str) -> str:
+    """Keyword routing to a single collection (the previous /chat/ behaviour)."""
+    prompt_lower = prompt.lower()
+
+    if any(keyword in prompt_lower for keyword in ["complexity", "risk", "rationale", "complex"]):
+        return "architecture_complexity"
+
+    elif any(keyword in prompt_lower for keyword in ["application", "app", "asset", "integration", "relationship", "upstream", "downstream", "connection"]):
+        return "architecture_applications"
+
+    elif any(keyword in prompt_lower for keyword in ["diagram", "cons", "pros", "summary", "description", "architecture", "design"]):
+        return "architecture_diagrams"
+
+    else:
+        return "architecture_diagrams"
+
+
+def classify_query(query):
+    if BROAD_RE.search(query):
+        return "broad"
+    if APP_CODE_RE.search(query):
+        return "specific"
+    return "general"
+
+
+def fetch_candidates(collection, query, n_results, query_embedding=None):
+    """Runs one Chroma query and returns candidates [{id, document, metadata, distance}], nearest first."""
+    if query_embedding is not None:
+        # Reuse an embedding the caller already computed instead of embedding the query again
+        target = {"query_embeddings": [query_embedding]}
+    else:
+        target = {"query_texts": [query]}
+    res = collection.query(n_results=n_results, include=["metadatas", "documents", "distances"], **target)
+    return [
+        {"id": doc_id, "document": doc, "metadata": meta or {}, "distance": distance}
+        for doc_id, doc, meta, distance in zip(res["ids"][0], res["documents"][0],
+                                               res["metadatas"][0], res["distances"][0])
+    ]
+
+
+def dedupe(candidates, max_per_diagram):
+    """Drops repeated documents and caps how many chunks each diagram_id contributes, keeping order."""
+    seen_docs, per_diagram, kept = set(), {}, []
+    for cand in candidates:
+        if cand["document"] in seen_docs:
+            continue
+        diagram_id = cand["metadata"].get("diagram_id")
+        if diagram_id is not None:
+            if per_diagram.get(diagram_id, 0) >= max_per_diagram:
+                continue
+            per_diagram[diagram_id] = per_diagram.get(diagram_id, 0) + 1
+        seen_docs.add(cand["document"])
+        kept.append(cand)
+    return kept
+
+
+def pack(candidates, token_budget):
+    """Greedily takes candidates in rank order while they fit in token_budget; oversized ones are skipped."""
+    packed, used = [], 0
+    for cand in candidates:
+        tokens = estimate_tokens(cand["document"])
+        if used + tokens > token_budget:
+            continue
+        packed.append(cand)
+        used += tokens
+    return packed, used
+
+
+class CrossEncoderReranker:
+    """Local cross-encoder reranker; the model is loaded on first use."""
+
+    def __init__(self, model_name="cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name)
+        return self._model
+
+    def rerank(self, query, candidates):
+        if not candidates:
+            return candidates
+        scores = self._load().predict([(query, cand["document"]) for cand in candidates])
+        for cand, score in zip(candidates, scores):
+            cand["rerank_score"] = float(score)
+        return sorted(candidates, key=lambda cand: cand["rerank_score"], reverse=True)
+
+
+class Retriever:
+    """
+    Retrieval stage for /chat/: query-type top-k, distance threshold, diagram_id dedupe,
+    optional cross-encoder rerank, then greedy packing up to token_budget.
+    """
+
+    def __init__(self, max_distance=1.2, token_budget=6000, reranker=None):
+        self.max_distance = max_distance
+        self.token_budget = token_budget
+        self.reranker = reranker
+
+    def filter(self, collection_name, candidates):
+        """Distance threshold and diagram_id dedupe for one collection's candidates."""
+        close = [cand for cand in candidates if cand["distance"] is None or cand["distance"] <= self.max_distance]
+        return close, dedupe(close, MAX_PER_DIAGRAM.get(collection_name, 1))
+
+    def finish(self, query, candidates, top_k):
+        """Optional rerank, then greedy packing of the top_k candidates; returns (packed, tokens)."""
+        ranked = self.reranker.rerank(query, candidates) if self.reranker else candidates
+        return pack(ranked[:top_k], self.token_budget)
+
+    def select(self, query, collection_name, candidates, query_type=None):
+        """Filters already fetched candidates; returns (packed candidates, stats)."""
+        query_type = query_type or classify_query(query)
+        close, unique = self.filter(collection_name, candidates)
+        packed, tokens = self.finish(query, unique, QUERY_PROFILES[query_type]["top_k"])
+
+        stats = {
+            "query_type": query_type,
+            "candidates": len(candidates),
+            "within_distance": len(close),
+            "after_dedupe": len(unique),
+            "documents_used": len(packed),
+            "context_tokens": tokens,
+            "reranked": self.reranker is not None,
+        }
+        return packed, stats
+
+    def retrieve(self, collection, query, query_embedding=None):
+        query_type = classify_query(query)
+        candidates = fetch_candidates(collection, query, QUERY_PROFILES[query_type]["candidates"], query_embedding)
+        return self.select(query, collection.name, candidates, query_type)
+
+
+def reciprocal_rank_fusion(ranked_lists, k=60):
+    """Merges ranked candidate lists by sum(1 / (k + rank)); candidates are matched on id."""
+    scores, merged = {}, {}
+    for ranked in ranked_lists:
+        for rank, cand in enumerate(ranked, start=1):
+            scores[cand["id"]] = scores.get(cand["id"], 0.0) + 1.0 / (k + rank)
+            merged.setdefault(cand["id"], cand)
+    for cand_id, cand in merged.items():
+        cand["rrf_score"] = scores[cand_id]
+    return sorted(merged.values(), key=lambda cand: cand["rrf_score"], reverse=True)
+
+
+NEIGHBOURHOOD_QUERY = """
+MATCH (a:Node)-[r]-(b:Node)
+WHERE a.id IN $ids
+RETURN a.id AS app, a.display_name AS app_name, a.diagram_id AS diagram_id, type(r) AS rel,
+       startNode(r) = a AS outgoing, b.id AS other, b.display_name AS other_name
+LIMIT $limit
+"""
+
+
+def neighbourhood_documents(driver, app_codes, limit=200):
+    """One candidate per (APP code, diagram) listing its direct Neo4j relationships."""
+    grouped = {}
+    with driver.session() as session:
+        for record in session.run(NEIGHBOURHOOD_QUERY, ids=app_codes, limit=limit):
+            key = (record["app"], record["diagram_id"])
+            if key not in grouped:
+                grouped[key] = [f"Neo4j neighbourhood of {record['app_name'] or record['app']} (diagram {record['diagram_id']}):"]
+            if record["outgoing"]:
+                grouped[key].append(f"{record['app']} -[{record['rel']}]-> {record['other_name'] or record['other']}")
+            else:
+                grouped[key].append(f"{record['other_name'] or record['other']} -[{record['rel']}]-> {record['app']}")
+    return [
+        {"id": f"graph_{app}_{diagram_id}", "document": "\n".join(lines),
+         "metadata": {"diagram_id": diagram_id, "system_code": app, "source": "neo4j"}, "distance": None}
+        for (app, diagram_id), lines in grouped.items()
+    ]
+
+
+class RetrievalRouter:
+    """
+    Queries all collections in parallel (per-collection k), filters each list, merges them
+    with reciprocal-rank fusion and, when the query names APP codes and a Neo4j driver is
+    given, puts their graph neighbourhood ahead of the fused documents.
+    """
+
+    def __init__(self, collections, retriever, driver=None, collection_k=None, max_workers=8):
+        self.collections = collections  # {name: chroma collection}
+        self.retriever = retriever
+        self.driver = driver
+        self.collection_k = collection_k or ROUTER_K
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def retrieve(self, query, query_embedding=None, use_graph=True):
+        query_type = classify_query(query)
+        scale = ROUTER_K_SCALE[query_type]
+
+        futures = {
+            name: self._executor.submit(
+                fetch_candidates, collection, query,
+                max(int(self.collection_k.get(name, 10) * scale), 1), query_embedding
+            )
+            for name, collection in self.collections.items()
+        }
+        app_codes = sorted({code.upper() for code in APP_CODE_RE.findall(query)})
+        graph_future = None
+        if use_graph and self.driver is not None and app_codes:
+            graph_future = self._executor.submit(neighbourhood_documents, self.driver, app_codes)
+
+        per_collection, ranked_lists = {}, []
+        for name, future in futures.items():
+            candidates = future.result()
+            close, unique = self.retriever.filter(name, candidates)
+            per_collection[name] = {"candidates": len(candidates), "within_distance": len(close),
+                                    "after_dedupe": len(unique)}
+            ranked_lists.append(unique)
+
+        fused = reciprocal_rank_fusion(ranked_lists)
+        graph_docs = graph_future.result() if graph_future else []
+        top_k = QUERY_PROFILES[query_type]["top_k"] + len(graph_docs)
+        packed, tokens = self.retriever.finish(query, graph_docs + fused, top_k)
+
+        stats = {
+            "query_type": query_type,
+            "collections": per_collection,
+            "graph_documents": len(graph_docs),
+            "fused": len(fused),
+            "documents_used": len(packed),
+            "context_tokens": tokens,
+            "reranked": self.retriever.reranker is not None,
+        }
+        return packed, stats
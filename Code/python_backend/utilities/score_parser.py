@@ -0,0 +1,51 @@
+import re
+
+# 0-100 scores in LLM assessments, e.g. "Score: 82", "Alignment Score: 8.5/10", "Modularity (60/100)"
+# or "75%". Explicit "score" labels win over bare fractions, which win over percentages; within a
+# kind, a value on an "overall" line wins, otherwise the values are averaged (one per goal).
+NUMBER = r"(\d+(?:\.\d+)?)"
+OUT_OF = r"\s*(?:/|out of)\s*(5|10|100)\b"
+
+# "score" as a word (not "scores"), skipping a stated range like "Score (0-100):"
+SCORE_LABEL_RE = re.compile(
+    r"\bscore\b(?:\s*\(\s*0\s*[-–]\s*10{1,2}\s*\))?[^\d\n]{0,30}?" + NUMBER + f"(?:{OUT_OF})?", re.IGNORECASE
+)
+FRACTION_RE = re.compile(NUMBER + OUT_OF, re.IGNORECASE)
+PERCENT_RE = re.compile(NUMBER + r"\s*%")
+
+
+def section(text, heading):
+    """Body of the markdown section starting with heading, up to the next ### heading; all of text if absent."""
+    start = text.find(heading)
+    if start < 0:
+        return text
+    lines = text[start:].splitlines()[1:]
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith("###"):
+            lines = lines[:i]
+            break
+    return "\n".join(lines)
+
+
+def _scores(pattern, lines):
+    found = []
+    for line in lines:
+        overall = "overall" in line.lower()
+        for match in pattern.finditer(line):
+            value = float(match.group(1))
+            out_of = match.group(2) if pattern.groups >= 2 else None
+            score = value * 100 / float(out_of) if out_of else value
+            if 0 <= score <= 100:
+                found.append((overall, score))
+    return found
+
+
+def extract_score(text, heading="### Assessment"):
+    """The 0-100 score stated in the heading section of text (all of text without one); 0 if none."""
+    lines = section(text or "", heading).splitlines()
+    for pattern in (SCORE_LABEL_RE, FRACTION_RE, PERCENT_RE):
+        found = _scores(pattern, lines)
+        if found:
+            chosen = [score for overall, score in found if overall][:1] or [score for _, score in found]
+            return round(sum(chosen) / len(chosen))
+    return 0
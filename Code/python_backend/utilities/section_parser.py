@@ -0,0 +1,280 @@
+import re
+from collections import namedtuple
+
+# A parsed section of the Gemini upload response.
+# kind is one of SECTION_KINDS, value is the cleaned/parsed content of that section.
+SectionEvent = namedtuple("SectionEvent", ["kind", "value"])
+
+SECTION_KINDS = (
+    "mermaid", "summary", "description", "applications", "complexity_table",
+    "pros", "cons", "class_diagram", "data_model",
+)
+
+# Section headings are **bold** markers on a single line
+HEADING_RE = re.compile(r"\*\*(.*?)\*\*")
+
+
+class SectionParser:
+    """
+    Incremental parser for the structured upload response.
+    Feed it the model output chunk by chunk (e.g. from streamGenerateContent); a SectionEvent
+    is returned for a section as soon as the next heading (or the end of the stream) closes it.
+    Produces the same result as splitting the full text on **heading** markers.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._heading = None  # heading of the section currently being read
+        self._body = []
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        # Headings never span lines, so only complete lines are scanned
+        cut = self._buffer.rfind("\n") + 1
+        if not cut:
+            return []
+        text, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._consume(text)
+
+    def close(self):
+        events = self._consume(self._buffer)
+        self._buffer = ""
+        events.extend(self._finish_section())
+        self._heading = None
+        return events
+
+    def _consume(self, text):
+        events = []
+        pos = 0
+        for match in HEADING_RE.finditer(text):
+            self._body.append(text[pos:match.start()])
+            events.extend(self._finish_section())
+            self._heading = match.group(1)
+            pos = match.end()
+        self._body.append(text[pos:])
+        return events
+
+    def _finish_section(self):
+        heading, body = self._heading, "".join(self._body)
+        self._body = []
+        if heading is None:
+            return []
+        event = parse_section(heading, body)
+        return [event] if event else []
+
+
+def parse_section(heading, body):
+    """Turns one heading/body pair into a SectionEvent, or None for headings we don't use."""
+    name = heading.strip().lower()
+    body = body.strip()
+
+    if name == "mermaid":
+        return SectionEvent("mermaid", clean_mermaid_code(body))
+    elif name == "summary":
+        return SectionEvent("summary", body)
+    elif name == "description":
+        return SectionEvent("description", body)
+    elif name == "applications":
+        return SectionEvent("applications", parse_applications(body))
+    elif "System Complexity Table" in heading:
+        return SectionEvent("complexity_table", parse_complexity_table(body))
+    elif name == "pros":
+        return SectionEvent("pros", parse_bullets(body))
+    elif name == "cons":
+        return SectionEvent("cons", parse_bullets(body))
+    elif name == "class diagram (mermaid)":
+        return SectionEvent("class_diagram", clean_class_diagram(body))
+    elif name == "data model (mermaid erd)":
+        return SectionEvent("data_model", clean_data_model(body))
+    return None
+
+
+def parse_applications(apps_text):
+    applications = []
+    app_blocks = re.split(r"-\s*Title:", apps_text)
+
+    for block in app_blocks[1:]:
+        lines = block.strip().split("\n")
+        title = lines[0].strip()
+        system_code = lines[1].replace("System Code:", "").strip()
+        group = lines[2].replace("Group:", "").strip()
+        relationships = [
+            line.strip("- ").strip()
+            for line in lines[4:]
+            if line.strip().startswith("-")
+        ]
+
+        applications.append({
+            "title": title,
+            "system_code": system_code,
+            "group": group,
+            "relationships": relationships
+        })
+    return applications
+
+
+def parse_complexity_table(table_text):
+    complexity_table = []
+    rows = table_text.splitlines()[2:]  # Skip header lines
+
+    for row in rows:
+        cols = [col.strip() for col in row.split("|") if col.strip()]
+        if len(cols) == 3:
+            complexity_table.append({
+                "component": cols[0],
+                "complexity": cols[1],
+                "reason": cols[2]
+            })
+    return complexity_table
+
+
+def parse_bullets(raw):
+    return [
+        line.lstrip("- ").strip()
+        for line in raw.splitlines()
+        if line.strip().startswith("-")
+    ]
+
+
+def empty_sections():
+    return {
+        "mermaid": "",
+        "summary": "",
+        "description": "",
+        "applications": [],
+        "complexity_table": [],
+        "pros": [],
+        "cons": [],
+        "class_diagram": "",
+        "data_model": "",
+    }
+
+
+def parse_output_text(output_text):
+    """Parses a complete response text into a dict keyed by SECTION_KINDS."""
+    return parse_stream([output_text])
+
+
+def parse_stream(chunks, on_section=None):
+    """Parses an iterable of text chunks; on_section(event) is called as each section closes."""
+    parsed = empty_sections()
+    parser = SectionParser()
+
+    def apply(events):
+        for event in events:
+            parsed[event.kind] = event.value
+            if on_section:
+                on_section(event)
+
+    for chunk in chunks:
+        apply(parser.feed(chunk))
+    apply(parser.close())
+    return parsed
+
+
+# --- Cleaners --- #
+
+def clean_mermaid_code(raw: str) -> str:
+    lines = raw.strip().splitlines()
+    if lines[0].strip().startswith("```"):  # First line is ```mermaid or similar
+        lines = lines[1:]
+    if lines and lines[-1].strip().startswith("```"):  # Last line is ```
+        lines = lines[:-1]
+    return "\n".join(lines).strip()
+
+def clean_class_diagram(raw: str) -> str:
+    """
+    Cleans and extracts the class diagram code from the raw model output.
+    It specifically removes Markdown code fences (```classDiagram and ```)
+    and replaces non-breaking spaces with standard spaces.
+    Ensures 'classDiagram' is the very first line of the output.
+    """
+    lines = raw.strip().splitlines()
+    cleaned_lines = []
+    in_code_block = False
+
+    # Identify the start of the classDiagram code block.
+    # We look for "```classDiagram" or a generic "```mermaid".
+    # The actual "classDiagram" keyword should be the *first line* of the content.
+    start_delimiter_found = False
+
+    for line in lines:
+        stripped_line = line.strip()
+
+        if not in_code_block:
+            # Look for the start of the code block
+            if stripped_line.startswith("```classDiagram"):
+                in_code_block = True
+                start_delimiter_found = True
+                continue  # Skip the fence line
+            elif stripped_line.startswith("```mermaid"):  # Fallback for generic mermaid block
+                # If we detect generic 'mermaid' block, we'll try to find 'classDiagram' inside
+                in_code_block = True
+                continue  # Skip the fence line
+        else:
+            # We are inside a code block
+            if stripped_line == "```":
+                in_code_block = False
+                break  # Found the end of the code block, stop processing
+            else:
+                # Replace non-breaking spaces (\xa0) and ensure ASCII characters
+                clean_line = line.replace('\xa0', ' ').encode('ascii', 'ignore').decode('ascii')
+                cleaned_lines.append(clean_line)
+
+    final_output = "\n".join(cleaned_lines).strip()
+
+    # Ensure 'classDiagram' is the absolute first line of the mermaid content
+    if not final_output.startswith("classDiagram"):
+        # If the model didn't put it on the first line after the fence, add it.
+        # This handles cases where model might output something like:
+        # ```classDiagram
+        #    class MyClass { ... }
+        # where 'classDiagram' is part of the fence and not the first content line.
+        return f"classDiagram\n{final_output}"
+
+    return final_output
+
+
+def clean_data_model(raw: str) -> str:
+    """
+    Cleans and extracts the ER diagram code from the raw model output.
+    It specifically removes Markdown code fences (```erDiagram and ```)
+    and replaces non-breaking spaces with standard spaces.
+    Ensures 'erDiagram' is the very first line of the output.
+    """
+    lines = raw.strip().splitlines()
+    cleaned_lines = []
+    in_code_block = False
+
+    # Identify the start of the erDiagram code block.
+    start_delimiter_found = False
+
+    for line in lines:
+        stripped_line = line.strip()
+
+        if not in_code_block:
+            # Look for the start of the code block
+            if stripped_line.startswith("```erDiagram"):
+                in_code_block = True
+                start_delimiter_found = True
+                continue  # Skip the fence line
+            elif stripped_line.startswith("```mermaid"):  # Fallback for generic mermaid block
+                in_code_block = True
+                continue  # Skip the fence line
+        else:
+            # We are inside a code block
+            if stripped_line == "```":
+                in_code_block = False
+                break  # Found the end of the code block, stop processing
+            else:
+                # Replace non-breaking spaces (\xa0) and ensure ASCII characters
+                clean_line = line.replace('\xa0', ' ').encode('ascii', 'ignore').decode('ascii')
+                cleaned_lines.append(clean_line)
+
+    final_output = "\n".join(cleaned_lines).strip()
+
+    # Ensure 'erDiagram' is the absolute first line of the mermaid content
+    if not final_output.startswith("erDiagram"):
+        return f"erDiagram\n{final_output}"
+
+    return final_output
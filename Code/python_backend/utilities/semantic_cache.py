@@ -0,0 +1,130 @@
+import threading
+import time
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Answer cache for /chat/ keyed on the query embedding.
+    A lookup hits when a previous query in the same collection and corpus version has
+    cosine similarity >= threshold. Entries live in this process only; each worker warms its own
+    cache. version_source() returns the shared corpus version (kept in Postgres, see
+    utilities.corpus_version), so an upload in any worker retires every worker's older entries.
+    The version is re-read at most every version_ttl seconds, so another worker's upload can take
+    that long to show here; refresh_version() makes the next lookup read it right away.
+    """
+
+    def __init__(self, embed, threshold=0.92, max_entries=2000, ttl_seconds=24 * 3600, version_source=None,
+                 version_ttl=2.0):
+        self.embed = embed  # callable(list[str]) -> list[vector], e.g. the Chroma embedder
+        self.version_source = version_source  # callable() -> int; None keeps a fixed version
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_ttl = version_ttl
+        self.corpus_version = 0
+        self._version_read_at = float("-inf")
+        self._entries = {}  # collection -> list of entries
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def embed_query(self, query):
+        vector = np.asarray(self.embed([query])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _live(self, collection):
+        now = time.time()
+        entries = [
+            entry for entry in self._entries.get(collection, [])
+            if entry["version"] == self.corpus_version and now - entry["created"] <= self.ttl_seconds
+        ]
+        self._entries[collection] = entries
+        return entries
+
+    def current_version(self):
+        """
+        Reads the shared corpus version (reusing a read younger than version_ttl) and retires
+        entries from older ones. Returns None if it can't be read, in which case the cache is
+        bypassed rather than risking stale answers.
+        """
+        if self.version_source is None:
+            return self.corpus_version
+        now = time.monotonic()
+        if now - self._version_read_at < self.version_ttl:
+            return self.corpus_version
+        try:
+            version = self.version_source()
+        except Exception as e:
+            print("[ERROR] Corpus version lookup:", e)
+            return None
+        with self._lock:
+            self._version_read_at = now
+            if version > self.corpus_version:
+                self.invalidated += sum(len(items) for items in self._entries.values())
+                self._entries = {}
+                self.corpus_version = version
+        return version
+
+    def refresh_version(self):
+        """Called after this worker bumped the corpus version, so its own next lookup doesn't wait out version_ttl."""
+        self._version_read_at = float("-inf")
+
+    def get(self, collection, vector, version):
+        """
+        Returns {answer, query, similarity, ...} for the closest cached query above threshold, else None.
+        version is current_version() as read for this request.
+        """
+        with self._lock:
+            entries = self._live(collection) if version == self.corpus_version else []
+            best = None
+            if entries:
+                scores = np.stack([entry["vector"] for entry in entries]) @ vector
+                index = int(np.argmax(scores))
+                if scores[index] >= self.threshold:
+                    best = entries[index]
+                    best["last_hit"] = time.time()
+                    similarity = float(scores[index])
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {"answer": best["answer"], "query": best["query"], "similarity": round(similarity, 4),
+                    "extra": best["extra"]}
+
+    def put(self, collection, vector, query, answer, version, extra=None):
+        """version is the corpus version the answer was generated against; older answers aren't kept."""
+        with self._lock:
+            if version != self.corpus_version:
+                return
+            entries = self._live(collection)
+            entries.append({
+                "vector": vector,
+                "query": query,
+                "answer": answer,
+                "extra": extra,
+                "version": self.corpus_version,
+                "created": time.time(),
+                "last_hit": time.time(),
+            })
+            # Least recently hit entries go first
+            total = sum(len(items) for items in self._entries.values())
+            if total > self.max_entries:
+                entries.sort(key=lambda entry: entry["last_hit"], reverse=True)
+                del entries[max(len(entries) - (total - self.max_entries), 0):]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(len(items) for items in self._entries.values()),
+                "corpus_version": self.corpus_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidated": self.invalidated,
+            }
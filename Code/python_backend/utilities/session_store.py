@@ -0,0 +1,206 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def estimate_tokens(text):
+    # Rough estimate (~4 characters per token), good enough for budgeting prompt history
+    return len(text) // 4
+
+
+def question_summarizer(summary, question, answer, max_chars):
+    """Default summariser: keeps the earlier questions as bullet points, dropping the oldest first."""
+    lines = [line for line in summary.splitlines() if line] + [f"- {question.strip()}"]
+    while lines and len("\n".join(lines)) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class SessionStore:
+    """
+    Chat history per session with TTL/LRU eviction and a hard token budget.
+    When a session's history exceeds token_budget, its oldest turns are folded into a
+    running summary (via summarizer(summary, question, answer, max_chars)).
+    Backends implement _load, _save, _delete, _update and _evict.
+    """
+
+    def __init__(self, ttl_seconds=24 * 3600, max_sessions=1000, token_budget=1000, summarizer=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self.summarizer = summarizer or question_summarizer
+
+    @staticmethod
+    def _empty():
+        return {"summary": "", "turns": []}
+
+    def create(self, session_id):
+        self._save(session_id, self._empty())
+        self._evict()
+
+    def exists(self, session_id):
+        return self._load(session_id) is not None
+
+    def reset(self, session_id):
+        if not self.exists(session_id):
+            return False
+        self._save(session_id, self._empty())
+        return True
+
+    def delete(self, session_id):
+        self._delete(session_id)
+
+    def history(self, session_id):
+        state = self._load(session_id)
+        return self.render(state) if state else ""
+
+    def append(self, session_id, question, answer):
+        def apply(state):
+            state["turns"].append([question, answer])
+            return self._fit_budget(state)
+        self._update(session_id, apply)
+
+    @staticmethod
+    def render(state):
+        text = f"Summary of earlier conversation:\n{state['summary']}" if state["summary"] else ""
+        return text + "".join(f"\n\nQ: {q}\nA: {a}" for q, a in state["turns"])
+
+    def _fit_budget(self, state):
+        summary_chars = self.token_budget  # summary may use up to a quarter of the budget
+        while len(state["turns"]) > 1 and estimate_tokens(self.render(state)) > self.token_budget:
+            question, answer = state["turns"].pop(0)
+            state["summary"] = self.summarizer(state["summary"], question, answer, summary_chars)
+
+        # A single turn larger than the budget is truncated from the front
+        max_chars = self.token_budget * 4
+        if estimate_tokens(self.render(state)) > self.token_budget and state["turns"]:
+            question, answer = state["turns"][-1]
+            keep = max(max_chars - len(question) - len(state["summary"]) - 64, 0)
+            state["turns"][-1] = [question, "..." + answer[-keep:] if keep else ""]
+        return state
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store; sessions are per worker and lost on restart."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions = OrderedDict()  # session_id -> (state, last_access)
+        self._lock = threading.Lock()
+
+    def _load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            state, last_access = entry
+            if time.time() - last_access > self.ttl_seconds:
+                del self._sessions[session_id]
+                return None
+            self._sessions[session_id] = (state, time.time())
+            self._sessions.move_to_end(session_id)
+            return {"summary": state["summary"], "turns": list(state["turns"])}
+
+    def _save(self, session_id, state):
+        with self._lock:
+            self._sessions[session_id] = (state, time.time())
+            self._sessions.move_to_end(session_id)
+
+    def _delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _update(self, session_id, fn):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            self._sessions[session_id] = (fn(entry[0]), time.time())
+            self._sessions.move_to_end(session_id)
+
+    def _evict(self):
+        now = time.time()
+        with self._lock:
+            for session_id in [s for s, (_, last) in self._sessions.items() if now - last > self.ttl_seconds]:
+                del self._sessions[session_id]
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+
+class SqliteSessionStore(SessionStore):
+    """Store backed by a local SQLite file, so several uvicorn workers can serve the same session."""
+
+    def __init__(self, db_path, **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_access ON chat_sessions (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; transactions are explicit (see _update). Always closed on exit
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _load(self, session_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT state FROM chat_sessions WHERE session_id = ? AND last_access > ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE chat_sessions SET last_access = ? WHERE session_id = ?", (time.time(), session_id))
+            return json.loads(row[0])
+
+    def _save(self, session_id, state):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, state, last_access) VALUES (?, ?, ?)",
+                (session_id, json.dumps(state), time.time()),
+            )
+
+    def _delete(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    def _update(self, session_id, fn):
+        with self._connect() as conn:
+            try:
+                # Write lock up front so concurrent workers can't interleave read-modify-write
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT state FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE chat_sessions SET state = ?, last_access = ? WHERE session_id = ?",
+                        (json.dumps(fn(json.loads(row[0]))), time.time(), session_id),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chat_sessions WHERE last_access <= ?", (time.time() - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM chat_sessions WHERE session_id IN ("
+                "SELECT session_id FROM chat_sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+# StreamingResponse iterates a sync generator on a worker thread and never closes it when the client
+# goes away, so whatever the generator holds (LLM gateway slots, the upstream HTTP stream, agent
+# threads) stays held until garbage collection. SSE endpoints wrap their generators in this instead.
+
+_END = object()
+
+
+async def until_disconnected(request, events):
+    """
+    Yields from the sync generator events until it ends or request (anything with an async
+    is_disconnected(), e.g. a Starlette Request) reports the client gone, then closes events.
+    If the response is cancelled while events is producing an item, it is closed right after.
+    """
+    loop = asyncio.get_running_loop()
+    lock = threading.Lock()  # a generator can't be closed while another thread is running it
+
+    def step():
+        with lock:
+            return next(events, _END)
+
+    def close():
+        with lock:
+            events.close()
+
+    pending = None
+    try:
+        while not await request.is_disconnected():
+            pending = loop.run_in_executor(None, step)
+            item = await pending
+            pending = None
+            if item is _END:
+                return
+            yield item
+    finally:
+        if pending is None or (pending.done() and not pending.cancelled()):
+            close()
+        else:
+            loop.run_in_executor(None, close)
@@ -0,0 +1,121 @@
+import json
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Shared pool for the per-upload store writes (Postgres, Neo4j, Chroma)
+_executor = ThreadPoolExecutor(max_workers=12, thread_name_prefix="store-fanout")
+
+
+class FanOutError(Exception):
+    def __init__(self, failures, rollback):
+        self.failures = failures
+        self.rollback = rollback
+        super().__init__(f"Store fan-out failed: {failures}")
+
+
+class StoreWriter:
+    """One backend write plus the compensating action that undoes it."""
+
+    def __init__(self, name, write, rollback=None, timeout=60):
+        self.name = name
+        self.write = write
+        self.rollback = rollback
+        self.timeout = timeout
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _log_rollback(log_path, record):
+    if not log_path:
+        return
+    try:
+        with open(log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print("[ERROR] could not write rollback record:", e)
+
+
+def _compensate(writer, log_path, context):
+    record = {"backend": writer.name, "at": time.time(), **context}
+    if writer.rollback is None:
+        record["status"] = "no_rollback"
+    else:
+        try:
+            writer.rollback()
+            record["status"] = "rolled_back"
+        except Exception as e:
+            traceback.print_exc()
+            record["status"] = "rollback_failed"
+            record["error"] = str(e)
+    _log_rollback(log_path, record)
+    return record
+
+
+class FanOut:
+    """
+    Store writes that are started one by one, e.g. as the response sections each store needs are
+    parsed, and then joined as a unit. Each write's timeout runs from its own start.
+    """
+
+    def __init__(self, on_stage=None, rollback_log=None, context=None):
+        self.on_stage = on_stage
+        self.rollback_log = rollback_log
+        self.context = context or {}
+        self._started = []  # (writer, future, start time)
+
+    def start(self, writer):
+        self._started.append((writer, _executor.submit(_timed, writer.write), time.perf_counter()))
+
+    def join(self):
+        """
+        Waits for every started write. Returns {backend: seconds}. If any backend fails or times out,
+        every backend is compensated, a rollback record is appended to rollback_log and FanOutError
+        is raised. A write that times out is compensated once it finishes.
+        """
+        timings, failures = {}, {}
+        for w, future, started in self._started:
+            remaining = max(w.timeout - (time.perf_counter() - started), 0)
+            done, _ = wait([future], timeout=remaining)
+            if not done:
+                failures[w.name] = f"timed out after {w.timeout}s"
+                continue
+            try:
+                timings[w.name] = future.result()
+                if self.on_stage:
+                    self.on_stage(w.name, timings[w.name])
+            except Exception as e:
+                traceback.print_exc()
+                failures[w.name] = str(e)
+
+        if not failures:
+            return timings
+        raise FanOutError(failures, self.abort())
+
+    def abort(self):
+        """Compensates every write started so far (for when the input fails part way). Returns the rollback records."""
+        # Failed writes may have landed partially, so every finished backend is compensated
+        rollback = []
+        for w, future, _ in self._started:
+            if future.done():
+                rollback.append(_compensate(w, self.rollback_log, self.context))
+            else:
+                # Still running; undo it as soon as it lands
+                future.add_done_callback(lambda f, w=w: _compensate(w, self.rollback_log, self.context))
+                rollback.append({"backend": w.name, "status": "rollback_pending", **self.context})
+        return rollback
+
+
+def fan_out(writers, on_stage=None, rollback_log=None, context=None):
+    """
+    Runs the writers concurrently, each bounded by its own timeout.
+    Returns {backend: seconds}; on failure every backend is compensated (see FanOut.join).
+    """
+    stores = FanOut(on_stage, rollback_log, context)
+    for w in writers:
+        stores.start(w)
+    return stores.join()
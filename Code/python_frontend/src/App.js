@@ -740,6 +740,33 @@ export default function App() {
 
     /* Handle for Target Planner and Pattern Selector */
 
+    /* Live agent progress: reasoning tokens grow one "Thinking" entry per running step, which is
+       dropped once the step finishes (its metrics arrive just before its result). A failed run sends
+       {"error": ...} as its last event: it replaces the live entries and the caller stops reading. */
+    const handleAgentProgress = (parsed, setResponses) => {
+        if (parsed.error !== undefined) {
+            const content = typeof parsed.error === "object" ? JSON.stringify(parsed.error, null, 2) : String(parsed.error);
+            setResponses(prev => [...prev.filter(item => item.live === undefined), { key: "Error", content, isThought: false }]);
+            return "error";
+        }
+        if (parsed.thinking && parsed.thinking.delta !== undefined) {
+            const { step, delta } = parsed.thinking;
+            setResponses(prev => {
+                const last = prev[prev.length - 1];
+                if (last && last.live === step) {
+                    return [...prev.slice(0, -1), { ...last, content: last.content + delta }];
+                }
+                return [...prev, { key: `Thinking: ${step}`, content: delta, isThought: true, live: step }];
+            });
+            return true;
+        }
+        if (parsed.metrics) {
+            setResponses(prev => prev.filter(item => item.live !== parsed.metrics.step));
+            return true;
+        }
+        return false;
+    };
+
     const handleTargetPlanner = async () => {
           if (!archName) return;
 
@@ -776,6 +803,12 @@ export default function App() {
 
                   try {
                     const parsed = JSON.parse(jsonStr);
+                    const progress = handleAgentProgress(parsed, setTargetStreamResponses);
+                    if (progress === "error") {
+                      await reader.cancel();
+                      return;
+                    }
+                    if (progress) continue;
 
                     for (const stepKey in parsed) {
                       const stepData = parsed[stepKey];
@@ -865,6 +898,12 @@ export default function App() {
 
                 try {
                   const parsed = JSON.parse(jsonStr);
+                  const progress = handleAgentProgress(parsed, setPatternStreamResponses);
+                  if (progress === "error") {
+                    await reader.cancel();
+                    return;
+                  }
+                  if (progress) continue;
 
                   // Always take first key — supports extract, microservices, etc.
                   const [stepKey, stepValue] = Object.entries(parsed)[0];